@@ -18,21 +18,132 @@ class Settings(BaseSettings):
     # 缓存配置
     cache_expire_hours: int = 1
 
-    # LLM配置（预留）
+    # LLM配置（api_key 为空时读取环境变量 DASHSCOPE_API_KEY）
     llm_api_key: Optional[str] = None
     llm_api_url: str = "https://dashscope.aliyuncs.com/api/v1/"
+    llm_model: str = "qwen-plus"
+    # LLM调用：单次超时（秒）、最大重试次数、退避基数（秒）、连接池大小
+    llm_timeout_seconds: float = 60.0
+    llm_max_retries: int = 3
+    llm_retry_base_seconds: float = 1.0
+    llm_max_connections: int = 10
+    # LLM限流：每秒请求数与每分钟token数（与账号额度保持一致），单次调用为输出预留的token数
+    llm_qps: float = 5.0
+    llm_tpm: int = 100000
+    llm_output_token_reserve: int = 500
+    # 批量总结：将多条公告正文合并为一次请求（按正文字数预算与条数上限分批），解析失败时逐条回退；
+    # 默认关闭，开启后同一批次内的公告需等批次装满才开始总结，流式进度也按批次推送
+    llm_batch_enabled: bool = False
+    llm_batch_max_tokens: int = 6000
+    llm_batch_max_items: int = 8
 
     # 公告时间范围（天）与PDF正文截断长度（字）
     announcement_time_range_days: int = 10
     pdf_content_max_chars: int = 500
+    # PDF解析预算：逐页解析收集到该字符数即停止（缓存保存此长度，调整截断长度无需重新下载）
+    pdf_parse_max_chars: int = 5000
+    # PDF下载大小上限（MB）
+    pdf_max_download_mb: int = 30
+    # PDF提取进程池：工作进程数(0为线程模式)、单文档超时(秒)、最多解析页数、单进程处理文档数上限
+    pdf_engine_workers: int = 2
+    pdf_engine_timeout_seconds: float = 60.0
+    pdf_engine_max_pages: int = 50
+    pdf_engine_max_tasks_per_child: int = 50
+    # 公告正文缓存磁盘上限（MB），超出按LRU淘汰
+    content_cache_max_mb: int = 256
+    # 共享HTTP客户端：超时（秒）、连接池大小与是否启用HTTP/2
+    http_timeout_seconds: float = 30.0
+    http_max_connections: int = 20
+    http2_enabled: bool = True
+    # Playwright 浏览器池：实例数、最大并发页面数、单实例服务页面数上限（达到后重建）
+    browser_pool_size: int = 1
+    browser_max_pages: int = 4
+    browser_recycle_pages: int = 200
+    # 关闭浏览器池时等待已借出页面归还的最长时间（秒）
+    browser_close_timeout_seconds: float = 10.0
+    # 公告总结流水线：正文提取与单条LLM总结的并发上限，单条公告各阶段超时（秒）
+    summary_extract_concurrency: int = 4
+    summary_llm_concurrency: int = 4
+    summary_item_timeout_seconds: float = 120.0
+    # 后台总结任务：并发数与已结束任务在内存中的保留时间（秒）
+    summary_job_concurrency: int = 2
+    summary_job_retention_seconds: int = 3600
+    # 流式总结接口：无事件时的SSE心跳间隔（秒）
+    sse_heartbeat_seconds: float = 10.0
     # 订阅定时刷新时间 (HH:MM，北京时间)
     subscription_refresh_time: str = "09:00"
+    # 定时刷新：并发刷新的股票数，最近多少秒内已刷新的股票跳过
+    subscription_refresh_concurrency: int = 4
+    subscription_refresh_fresh_seconds: int = 3600
+    # 定时刷新结果按批写入（每批总结数）
+    subscription_write_batch_size: int = 20
+    # 每个股票保留的历史总结版本数
+    summary_history_keep: int = 10
+    # 订阅服务读缓存（LRU）条目上限：总结正文、更新时间、用户订阅列表各自独立
+    subscription_read_cache_size: int = 2048
+    # 运行时数据目录（各 SQLite 数据库所在目录）；为空时使用仓库下的 data/
+    data_dir: str = ""
+    # SQLite 连接：锁等待超时（秒）、页缓存大小（KB）、预编译语句缓存条数
+    sqlite_busy_timeout_seconds: float = 5.0
+    sqlite_cache_size_kb: int = 8192
+    sqlite_cached_statements: int = 128
+
+    # 盘中公告监听：轮询当天全市场公告的间隔（秒），同一股票两次触发的最小间隔（秒），
+    # 待刷新队列长度与刷新工作协程数
+    notice_watch_enabled: bool = True
+    notice_watch_interval_seconds: int = 300
+    notice_watch_cooldown_seconds: int = 1800
+    notice_watch_queue_size: int = 100
+    notice_watch_workers: int = 2
+
+    # 全市场公告快照缓存：当天数据过期秒数与最多缓存天数（历史日期不过期）
+    notice_snapshot_today_ttl_seconds: int = 300
+    notice_snapshot_max_days: int = 60
+    # 按日期并发抓取公告：最大并发数与单日超时（秒）
+    notice_fetch_concurrency: int = 4
+    notice_fetch_timeout_seconds: float = 20.0
+    # 公告归档后台同步间隔（秒）
+    announcement_ingest_interval_seconds: int = 600
+    # 单日同步失败后的重试退避：基数与上限（秒），退避期内不再请求数据源
+    announcement_sync_backoff_seconds: int = 60
+    announcement_sync_backoff_max_seconds: int = 3600
 
     # 日志配置
     log_level: str = "INFO"
 
     # 微信回调配置
     wechat_token: str = ""  # 微信服务器签名校验用 Token
+    # 回调专用执行器：工作线程数与排队上限（超出即兜底回复）
+    wechat_executor_workers: int = 4
+    wechat_executor_queue_size: int = 32
+    # 回调内单次阻塞操作超时（秒）与整体回复时限（秒，微信5秒未回复会重试）
+    wechat_op_timeout_seconds: float = 3.0
+    wechat_reply_budget_seconds: float = 4.5
+    # 客服消息推送：公众号 AppID/AppSecret 均配置后启用
+    wechat_app_id: str = ""
+    wechat_app_secret: str = ""
+    wechat_push_enabled: bool = True
+    wechat_api_base_url: str = "https://api.weixin.qq.com/cgi-bin/"
+    wechat_push_timeout_seconds: float = 10.0
+    # access_token 提前刷新的余量（秒）
+    wechat_token_refresh_margin_seconds: int = 300
+    # 发件箱：全局QPS、同一用户最小发送间隔（秒）、每批领取条数、空闲轮询间隔（秒）
+    wechat_push_qps: float = 10.0
+    wechat_push_user_interval_seconds: float = 1.0
+    wechat_push_batch_size: int = 10
+    wechat_push_poll_seconds: float = 1.0
+    # 发送失败重试：最多尝试次数与退避基数（秒）；已发送/失败记录保留时长（秒）
+    wechat_push_max_attempts: int = 5
+    wechat_push_retry_base_seconds: float = 5.0
+    wechat_push_retention_seconds: int = 7 * 24 * 3600
+    # 发送中（sending）消息的租约（秒）：超过该时长仍未确认的视为进程中途退出，重新排期
+    wechat_push_lease_seconds: float = 300.0
+    # 单条客服消息最大字符数
+    wechat_push_max_chars: int = 1800
+    # 定时刷新后向订阅用户推送摘要（需启用客服消息推送）：订阅分页大小、摘要中每只股票的最大字符数
+    digest_enabled: bool = True
+    digest_page_size: int = 1000
+    digest_item_max_chars: int = 120
 
     class Config:
         env_file = ".env"
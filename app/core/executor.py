@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorBusyError(RuntimeError):
+    """执行器已满（运行中 + 排队任务达到上限）"""
+
+
+class BoundedExecutor:
+    """有界线程池执行器
+
+    - 独立线程池，阻塞操作不占用默认执行器，也不与其它后台任务争抢线程
+    - 运行中与排队任务总数上限为 max_workers + max_pending，超出立即抛 ExecutorBusyError 而不是无限排队
+    - run 支持单次超时：超时后调用方立即返回，线程中的操作继续执行完毕后才释放名额，
+      因此超时堆积的慢操作同样受上限约束
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = "bounded"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self._inflight -= 1
+            self.completed += 1
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """在线程池中执行 func(*args)；已满抛 ExecutorBusyError，超时抛 asyncio.TimeoutError"""
+        executor = self._get_executor()
+        with self._lock:
+            if self._inflight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise ExecutorBusyError(f"{self.name} 执行器已满")
+            self._inflight += 1
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._inflight -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "inflight": self._inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
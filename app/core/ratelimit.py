@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """异步令牌桶限流器
+
+    rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发量）。
+    acquire 在令牌不足时等待；consume 直接扣减（可为负），用于按实际用量校正预估值。
+    协程间在单个事件循环内共享，无需加锁。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(float(rate), 1e-9)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        # 单次请求超过桶容量时按容量计，避免永远等待
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def consume(self, tokens: float):
+        self._refill()
+        self._tokens -= float(tokens)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
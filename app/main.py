@@ -10,8 +10,17 @@ from contextlib import asynccontextmanager
 from app.routers import announcements, system
 from app.routers import wechat  # 新增：引入微信路由
 from app.core.exceptions import create_exception_handler
-from app.services.subscription_service import subscription_service
 from app.services.announcement_service import announcement_service
+from app.services.subscription_service import subscription_service
+from app.services.browser_pool import browser_pool
+from app.services.http_client import close_http_client
+from app.services.pdf_engine import pdf_engine
+from app.services.llm import llm_client
+from app.services.summary_jobs import summary_job_manager
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.notice_watcher import notice_watcher
+from app.services.wechat_push import wechat_push
+from app.services.digest_notifier import digest_notifier
 from app.core.config import settings  # 新增：引入配置，用于定时任务时间
 
 # 配置日志
@@ -34,6 +43,18 @@ async def _seconds_until_next_config_time() -> float:
         return 24 * 3600
 
 
+def _digest_enabled() -> bool:
+    return settings.digest_enabled and wechat_push.enabled
+
+
+async def _resume_digests():
+    """启动时续推上次进程退出前未完成的订阅摘要"""
+    try:
+        await digest_notifier.resume()
+    except Exception as e:
+        logger.exception(f"续推订阅摘要异常: {e}")
+
+
 async def _run_daily_summaries_loop():
     # 首次等待至下一个配置的时间
     try:
@@ -46,17 +67,9 @@ async def _run_daily_summaries_loop():
     while True:
         try:
             logger.info(f"开始执行定时任务({settings.subscription_refresh_time})：汇总订阅股票公告")
-            rows = subscription_service.all_rows()
-            total_codes = 0
-            for _, codes in rows:
-                for code in codes:
-                    try:
-                        result = await announcement_service.summarize_announcements(code)
-                        subscription_service.save_summary(code, result)
-                        total_codes += 1
-                    except Exception as ex:
-                        logger.error(f"生成 {code} 公告总结失败: {ex}")
-            logger.info(f"定时任务完成，更新 {total_codes} 个股票的JSON缓存")
+            report = await refresh_scheduler.run()
+            if _digest_enabled():
+                await digest_notifier.notify_report(report)
         except Exception as e:
             logger.exception(f"定时任务运行异常: {e}")
         # 等待到下一个配置时间
@@ -71,18 +84,47 @@ async def _run_daily_summaries_loop():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # 启动共享浏览器池（公告正文提取）
+    await browser_pool.start()
+    # 启动PDF提取进程池
+    pdf_engine.start()
     # 启动后台定时任务
     task = asyncio.create_task(_run_daily_summaries_loop())
     app.state.daily_task = task
+    # 启动公告归档后台同步
+    ingest_task = asyncio.create_task(announcement_service.run_ingest_loop())
+    app.state.ingest_task = ingest_task
+    background = [task, ingest_task]
+    # 启动盘中公告监听（有新公告的订阅股票即时刷新）
+    if settings.notice_watch_enabled:
+        watch_task = asyncio.create_task(notice_watcher.run())
+        app.state.watch_task = watch_task
+        background.append(watch_task)
+    # 启动客服消息推送（刷新结果异步推送给用户）
+    if wechat_push.enabled:
+        push_task = asyncio.create_task(wechat_push.run())
+        app.state.push_task = push_task
+        background.append(push_task)
+        if _digest_enabled():
+            background.append(asyncio.create_task(_resume_digests()))
     try:
         yield
     finally:
         # 优雅关闭后台任务
-        task.cancel()
-        try:
-            await task
-        except asyncio.CancelledError:
-            pass
+        for t in background:
+            t.cancel()
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+        await summary_job_manager.shutdown()
+        await browser_pool.close()
+        await close_http_client()
+        await llm_client.aclose()
+        pdf_engine.shutdown()
+        wechat.wechat_executor.shutdown()
+        await wechat_push.aclose()
+        subscription_service.close()
 
 
 # 创建FastAPI应用（使用 lifespan 管理生命周期）
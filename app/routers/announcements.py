@@ -1,6 +1,13 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Tuple
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from ..models import BaseResponse
+from ..core.config import settings
 from ..services.announcement_service import announcement_service
+from ..services.summary_jobs import JOB_FAILED, JOB_SUCCEEDED, summary_job_manager
 from ..core.exceptions import StockAPIException
 
 router = APIRouter()
@@ -28,3 +35,86 @@ async def summarize_announcements_by_code(stock_code: str):
         raise HTTPException(status_code=400, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI总结服务异常: {str(e)}")
+
+
+# 任务状态接口不返回总结结果与推送对象（微信 openid）
+_JOB_PRIVATE_FIELDS = {"result", "notify_users"}
+
+
+@router.post("/announcements/{stock_code}/sum/jobs", response_model=BaseResponse, status_code=202)
+async def submit_summary_job(stock_code: str):
+    """提交后台AI总结任务，立即返回任务ID；同一股票已有进行中的任务时返回该任务"""
+    job, created = summary_job_manager.submit(stock_code)
+    return BaseResponse(
+        data=job.model_dump(exclude=_JOB_PRIVATE_FIELDS),
+        message="总结任务已提交" if created else "已有进行中的总结任务",
+    )
+
+
+@router.get("/summary-jobs/{job_id}", response_model=BaseResponse)
+async def get_summary_job(job_id: str):
+    """查询总结任务状态"""
+    job = summary_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return BaseResponse(data=job.model_dump(exclude=_JOB_PRIVATE_FIELDS), message="查询任务成功")
+
+
+@router.get("/summary-jobs/{job_id}/result", response_model=BaseResponse)
+async def get_summary_job_result(job_id: str):
+    """获取总结任务结果；未完成返回409，失败返回500"""
+    job = summary_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"AI总结服务异常: {job.error}")
+    if job.status != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成: {job.status}")
+    return BaseResponse(data=job.result, message="AI总结完成")
+
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_stream(events: AsyncIterator[Tuple[str, Dict]]) -> AsyncIterator[str]:
+    """将 (事件名, 数据) 转为SSE文本；长时间无事件时发送注释心跳，避免代理判定空闲超时"""
+    heartbeat = max(0.1, float(settings.sse_heartbeat_seconds))
+    iterator = events.__aiter__()
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat)
+            if not done:
+                yield ": ping\n\n"
+                continue
+            task, pending = pending, None
+            try:
+                event, data = task.result()
+            except StopAsyncIteration:
+                break
+            except StockAPIException as e:
+                yield _sse_event("error", {"code": e.code, "message": e.message})
+                break
+            except Exception as e:
+                yield _sse_event("error", {"code": "INTERNAL_ERROR", "message": f"AI总结服务异常: {str(e)}"})
+                break
+            yield _sse_event(event, data)
+    finally:
+        # 客户端断开时先等待进行中的 __anext__ 取消完成，否则 aclose 会因生成器仍在运行而报错
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await iterator.aclose()
+
+
+@router.post("/announcements/{stock_code}/sum/stream")
+async def summarize_announcements_stream(stock_code: str):
+    """AI智能总结公告（SSE流式）：progress/item/token 事件实时推送，done 事件为最终结果"""
+    return StreamingResponse(
+        _sse_stream(announcement_service.summarize_announcements_stream(stock_code)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
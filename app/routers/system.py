@@ -3,6 +3,16 @@ from datetime import datetime
 
 from ..models import BaseResponse
 from ..core.config import settings
+from ..services.notice_resolver import notice_resolver
+from ..services.pdf_engine import pdf_engine
+from ..services.llm import llm_client
+from ..services.summary_jobs import summary_job_manager
+from ..services.refresh_scheduler import refresh_scheduler
+from ..services.notice_watcher import notice_watcher
+from ..services.subscription_service import subscription_service
+from ..services.wechat_push import wechat_push
+from ..services.digest_notifier import digest_notifier
+from .wechat import wechat_executor
 
 router = APIRouter()
 
@@ -19,6 +29,16 @@ async def health_check():
                 "service": settings.app_name,
                 "version": settings.version,
                 "akshare_status": akshare_status,
+                "notice_resolver": notice_resolver.stats(),
+                "pdf_engine": pdf_engine.stats(),
+                "llm": llm_client.stats(),
+                "summary_jobs": summary_job_manager.stats(),
+                "last_refresh": refresh_scheduler.stats(),
+                "notice_watcher": notice_watcher.stats(),
+                "subscription_cache": subscription_service.cache_stats(),
+                "wechat_executor": wechat_executor.stats(),
+                "wechat_push": wechat_push.stats(),
+                "digest": digest_notifier.stats(),
                 "timestamp": datetime.now().isoformat(),
                 "uptime": "系统运行正常"
             },
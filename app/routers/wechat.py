@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Query, HTTPException, Response, Request
 from typing import Optional
+import asyncio
 import hashlib
 import time
 import re
@@ -14,13 +15,21 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from ..core.config import settings
-from ..services.announcement_service import announcement_service
-from ..services.subscription_service import subscription_service  # 新增：订阅服务
+from ..core.executor import BoundedExecutor, ExecutorBusyError
+from ..services.summary_jobs import summary_job_manager
+from ..services.wechat_push import wechat_push
 from .commands import handle_add, handle_del, handle_subscribe, handle_query
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 回调专用的有界执行器：SQLite 读写等阻塞操作不在事件循环上执行，也不与其它后台任务共用默认线程池
+wechat_executor = BoundedExecutor(
+    settings.wechat_executor_workers, settings.wechat_executor_queue_size, name="wechat"
+)
+# 执行器已满或超出回复时限时的兜底回复
+BUSY_REPLY = "系统繁忙，请稍后再试"
+
 
 def _sign(token: str, timestamp: str, nonce: str) -> str:
     """按微信规则计算签名：将 token、timestamp、nonce 字典序排序后拼接，做 SHA1。"""
@@ -64,6 +73,11 @@ def _build_text_reply(to_user: str, from_user: str, content: str) -> str:
     )
 
 
+async def _run_blocking(func, *args):
+    """订阅相关命令涉及SQLite读写，放到回调专用执行器中执行，单次操作超时 wechat_op_timeout_seconds"""
+    return await wechat_executor.run(func, *args, timeout=settings.wechat_op_timeout_seconds)
+
+
 def _fmt_utc_iso_to_cst_min(ts: str) -> str:
     """将UTC ISO时间转换为北京时间 YYYY-MM-DD HH:MM；若无效返回“尚未刷新”。"""
     if not ts:
@@ -117,13 +131,29 @@ async def wechat_message(
     to_user = data.get("ToUserName") or ""
     msg_type = data.get("MsgType") or ""
     content = (data.get("Content") or "").strip()
+
+    # 3) 命令分发：整体受 wechat_reply_budget_seconds 约束（微信5秒内未收到回复会重试），超时或繁忙时兜底回复
+    try:
+        reply = await asyncio.wait_for(
+            _dispatch(data, from_user, to_user, msg_type, content),
+            timeout=settings.wechat_reply_budget_seconds,
+        )
+    except (asyncio.TimeoutError, ExecutorBusyError) as ex:
+        logger.warning(f"微信回调处理超时或繁忙({type(ex).__name__})，返回兜底回复: {content}")
+        reply = BUSY_REPLY
+    xml = _build_text_reply(from_user, to_user, reply)
+    logger.info("Reply XML: %s", xml)
+    return Response(content=xml, media_type="application/xml; charset=utf-8")
+
+
+async def _dispatch(data: dict, from_user: str, to_user: str, msg_type: str, content: str) -> str:
+    """按消息内容分发命令，返回回复文本"""
     event = data.get("Event") or ""
     msg_id = data.get("MsgId") or ""
     msg_data_id = data.get("MsgDataId") or ""
 
     if msg_type.lower() != "text":
-        xml = _build_text_reply(from_user, to_user, "暂仅支持文本消息，请发送6位A股代码，如 000001")
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return "暂仅支持文本消息，请发送6位A股代码，如 000001"
 
     if content == "admin":
         reply = (
@@ -134,8 +164,7 @@ async def wechat_message(
             f"Msg Data ID: {msg_data_id}\n"
             f"Version: {settings.version}\n"
         )
-        xml = _build_text_reply(from_user, to_user, reply)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return reply
 
     # 帮助
     if content == "帮助" or content == "help":
@@ -147,28 +176,21 @@ async def wechat_message(
             "4) subscribe 查看订阅列表\n"
             "5) refreshXXX 立即刷新公告总结 (例 refresh600000)"
         )
-        xml = _build_text_reply(from_user, to_user, reply)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return reply
 
     # subscribe / list / my 查询订阅列表（任务8 + 任务9：带更新时间显示）
     if content.lower() in ("subscribe", "list", "my"):
-        reply = handle_subscribe(from_user)
-        xml = _build_text_reply(from_user, to_user, reply)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return await _run_blocking(handle_subscribe, from_user)
 
     # 订阅添加
     m_add = re.match(r"^add(\d{6})$", content)
     if m_add:
-        msg = handle_add(from_user, content)
-        xml = _build_text_reply(from_user, to_user, msg)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return await _run_blocking(handle_add, from_user, content)
 
     # 订阅删除
     m_del = re.match(r"^del(\d{6})$", content)
     if m_del:
-        msg = handle_del(from_user, content)
-        xml = _build_text_reply(from_user, to_user, msg)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return await _run_blocking(handle_del, from_user, content)
 
     # refresh 命令：即时刷新指定股票公告总结（^refresh\d{6}$）
     m_refresh = re.match(r"^refresh(\d{6})$", content)
@@ -178,26 +200,24 @@ async def wechat_message(
         last_ts = _last_refresh_ts[code]
         if now_sec - last_ts < REFRESH_INTERVAL_SECONDS:
             remain = int(REFRESH_INTERVAL_SECONDS - (now_sec - last_ts))
-            reply = f"{code} 刷新过于频繁，请 {remain}s 后再试"
-            xml = _build_text_reply(from_user, to_user, reply)
-            return Response(content=xml, media_type="application/xml; charset=utf-8")
+            return f"{code} 刷新过于频繁，请 {remain}s 后再试"
+        # 微信被动回复需在5秒内返回：提交后台任务后立即回复，结果写入缓存供后续查询；
+        # 启用客服消息推送时，任务完成后主动推送最新总结
+        push = wechat_push.enabled
         try:
-            result = await announcement_service.summarize_announcements(code)
-            subscription_service.save_summary(code, result)
+            job, created = summary_job_manager.submit(code, notify_user=from_user if push else None)
             _last_refresh_ts[code] = now_sec
-            # 根据提案更新：不直接返回总结内容，仅返回已刷新提示 + 北京时间
-            refreshed_at = datetime.fromtimestamp(now_sec, tz=ZoneInfo("Asia/Shanghai")).strftime("%Y-%m-%d %H:%M")
-            reply = f"{code} 已刷新，{refreshed_at}"  # 仍然后台保存内容供后续查询
+            follow_up = "完成后将推送最新总结" if push else f"稍后发送 {code} 查看最新总结"
+            if created:
+                reply = f"{code} 已加入刷新队列，{follow_up}"
+            else:
+                reply = f"{code} 正在刷新中，{follow_up}"
         except Exception as ex:
             reply = f"刷新失败: {ex}"[:1800]
-        xml = _build_text_reply(from_user, to_user, reply)
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return reply
 
     # 直接查询股票代码（模块化处理）
-    q = handle_query(from_user, content)
+    q = await _run_blocking(handle_query, from_user, content)
     if q is None:
-        xml = _build_text_reply(from_user, to_user, "请输入6位A股代码，如 000001")
-        return Response(content=xml, media_type="application/xml; charset=utf-8")
-    xml = _build_text_reply(from_user, to_user, q[:1800])
-    logger.info("Reply XML: %s", xml)
-    return Response(content=xml, media_type="application/xml; charset=utf-8")
+        return "请输入6位A股代码，如 000001"
+    return q[:1800]
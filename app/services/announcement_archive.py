@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set
+
+from ..core.config import settings
+from ..models import Announcement
+
+DATA_DIR = settings.data_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "data")
+ANNOUNCEMENT_DB_PATH = os.path.abspath(os.path.join(DATA_DIR, "announcements.db"))
+
+
+class AnnouncementArchive:
+    """基于SQLite的全市场公告归档
+
+    - announcements：公告明细，(stock_code, publish_date) 与 URL 建索引
+    - announcement_days：按日期记录入库状态；已收盘日期冻结后不再抓取
+    独立于 subscriptions.db，避免批量入库写锁影响订阅读写。
+    """
+
+    def __init__(self, db_path: str = ANNOUNCEMENT_DB_PATH):
+        self.db_path = db_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _init_db(self):
+        """首次访问时建表；导入模块与创建实例时不触碰数据库文件"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS announcements (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        announcement_id TEXT NOT NULL,
+                        stock_code TEXT NOT NULL,
+                        stock_name TEXT NOT NULL DEFAULT '',
+                        title TEXT NOT NULL DEFAULT '',
+                        publish_date TEXT NOT NULL,
+                        category TEXT NOT NULL DEFAULT '',
+                        url TEXT NOT NULL DEFAULT '',
+                        notice_date TEXT NOT NULL,
+                        seq INTEGER NOT NULL DEFAULT 0,
+                        ingested_datetime TEXT
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_announcements_code_date ON announcements(stock_code, publish_date)"
+                )
+                # 股票代码+URL+标题唯一，与 _remove_duplicates 按股票去重的口径一致；当天增量入库依赖此约束
+                # （旧版全市场范围的 (url, title) 唯一索引会误合并多只股票的同一公告，予以替换）
+                conn.execute("DROP INDEX IF EXISTS idx_announcements_url")
+                conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_announcements_code_url ON announcements(stock_code, url, title)"
+                )
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS announcement_days (
+                        notice_date TEXT PRIMARY KEY,
+                        frozen INTEGER NOT NULL DEFAULT 0,
+                        row_count INTEGER NOT NULL DEFAULT 0,
+                        updated_ts REAL NOT NULL DEFAULT 0,
+                        updated_datetime TEXT
+                    )
+                    """
+                )
+                conn.commit()
+            self._initialized = True
+
+    @contextmanager
+    def _conn(self):
+        self._init_db()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def ingest_day(self, notice_date: str, announcements: Iterable[Announcement], frozen: bool) -> int:
+        """写入某日(YYYYMMDD)全市场公告，返回新增/更新条数
+
+        同一股票的同一公告（URL+标题）出现在多个日期时保留最近日期，与 _remove_duplicates 保留首条（最近）一致。
+        """
+        now_iso = self._now_iso()
+        params = [
+            (a.id, a.stock_code, a.stock_name, a.title, a.publish_date, a.category, a.url or "",
+             notice_date, seq, now_iso)
+            for seq, a in enumerate(announcements)
+        ]
+        with self._conn() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO announcements(announcement_id, stock_code, stock_name, title, publish_date, category, url, notice_date, seq, ingested_datetime)\n                 VALUES(?,?,?,?,?,?,?,?,?,?)\n                 ON CONFLICT(stock_code, url, title) DO UPDATE SET announcement_id=excluded.announcement_id, publish_date=excluded.publish_date,\n                 notice_date=excluded.notice_date, seq=excluded.seq\n                 WHERE excluded.publish_date > announcements.publish_date",
+                params,
+            )
+            changed = conn.total_changes - before
+            conn.execute(
+                "INSERT INTO announcement_days(notice_date, frozen, row_count, updated_ts, updated_datetime) VALUES(?,?,?,?,?)\n                 ON CONFLICT(notice_date) DO UPDATE SET frozen=excluded.frozen, row_count=excluded.row_count, updated_ts=excluded.updated_ts, updated_datetime=excluded.updated_datetime",
+                (notice_date, 1 if frozen else 0, len(params), time.time(), now_iso),
+            )
+            conn.commit()
+            return changed
+
+    def fresh_days(self, notice_dates: List[str], today: str, today_ttl_seconds: float) -> Set[str]:
+        """返回无需重新抓取的日期：已冻结的历史日期，或在TTL内更新过的当天"""
+        if not notice_dates:
+            return set()
+        placeholders = ",".join(["?"] * len(notice_dates))
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                f"SELECT notice_date, frozen, updated_ts FROM announcement_days WHERE notice_date IN ({placeholders})",
+                notice_dates,
+            )
+            fresh = set()
+            for notice_date, frozen, updated_ts in cur.fetchall():
+                if frozen:
+                    fresh.add(notice_date)
+                elif notice_date >= today and now - (updated_ts or 0) < today_ttl_seconds:
+                    fresh.add(notice_date)
+            return fresh
+
+    def query(self, stock_code: str, start_date: str, end_date: str) -> List[Announcement]:
+        """按代码与公告日期区间(YYYY-MM-DD，含端点)查询，按日期由近及远、当日原表顺序返回"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "SELECT announcement_id, stock_code, stock_name, title, publish_date, category, url FROM announcements\n                 WHERE stock_code=? AND publish_date BETWEEN ? AND ? ORDER BY publish_date DESC, seq ASC",
+                (stock_code, start_date, end_date),
+            )
+            return [
+                Announcement(
+                    id=aid, stock_code=sc, stock_name=name, title=title,
+                    publish_date=pd_, category=cat, url=url,
+                )
+                for aid, sc, name, title, pd_, cat, url in cur.fetchall()
+            ]
+
+    def day_status(self) -> Dict[str, Dict]:
+        with self._conn() as conn:
+            cur = conn.execute("SELECT notice_date, frozen, row_count, updated_datetime FROM announcement_days")
+            return {
+                d: {"frozen": bool(f), "row_count": n, "updated_datetime": ts}
+                for d, f, n, ts in cur.fetchall()
+            }
+
+
+announcement_archive = AnnouncementArchive()
@@ -1,18 +1,24 @@
-import akshare as ak
 import pandas as pd
-from typing import List
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from functools import partial
 from datetime import datetime, timedelta
 import logging
 import asyncio
-import httpx
-import pdfplumber
-from io import BytesIO
-from playwright.async_api import async_playwright
-import re
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from ..models import Announcement, AnnouncementList
 from ..core.exceptions import StockAPIException
-from .llm import llm_by_api
+from .llm import llm_client, PROMPT_VERSION, BATCH_PROMPT_VERSION, BATCH_SYSTEM_PROMPT, build_batch_prompt, parse_batch_summaries
+from .notice_cache import notice_snapshot_cache
+from .announcement_archive import AnnouncementArchive, announcement_archive
+from .content_cache import CachedContent, ContentCache, content_cache
+from .summary_cache import SummaryCache, summary_cache
+from .browser_pool import browser_pool
+from .notice_resolver import notice_resolver
+from .http_client import get_http_client
+from .pdf_engine import pdf_engine
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -20,8 +26,27 @@ logger = logging.getLogger(__name__)
 class AnnouncementService:
     """公告数据服务"""
 
-    def __init__(self):
-        pass  # 不需要持久化存储，每次实时获取
+    def __init__(
+        self,
+        archive: Optional[AnnouncementArchive] = None,
+        contents: Optional[ContentCache] = None,
+        summaries: Optional[SummaryCache] = None,
+    ):
+        # 本地公告归档（SQLite），查询走本地索引，AKShare 仅用于按日期入库
+        self._archive = archive or announcement_archive
+        # 公告正文缓存（截断前全文），同一公告只下载解析一次
+        self._content_cache = contents or content_cache
+        # 单条公告LLM总结缓存，刷新时只为新公告调用LLM
+        self._summary_cache = summaries or summary_cache
+        # 按日期并发抓取公告的有界线程池（全市场快照下载为阻塞IO）
+        self._fetch_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(settings.notice_fetch_concurrency)),
+            thread_name_prefix="notice-fetch",
+        )
+        # 同步失败的日期：{日期: (连续失败次数, 下次允许重试的 monotonic 时间)}
+        self._sync_failures: Dict[str, Tuple[int, float]] = {}
+        # 查询触发的后台补齐任务（同一时刻最多一个）
+        self._gap_fill_task: Optional[asyncio.Task] = None
 
     async def get_announcements(
         self,
@@ -32,83 +57,190 @@ class AnnouncementService:
             days = max(1, int(settings.announcement_time_range_days))
             logger.info(f"获取股票公告: {stock_code}, 时间范围: 过去{days}天")
 
-            # 使用akshare获取过去N天的公告数据 - 在线程池中执行同步操作
-            loop = asyncio.get_event_loop()
-            all_announcements = await loop.run_in_executor(None, self._get_range_announcements, stock_code, days)
-            if not all_announcements:
-                return AnnouncementList(announcements=[], total=0, page=1, size=20)
-
-            # 去重处理（基于URL和标题）
-            unique_announcements = self._remove_duplicates(all_announcements)
-            logger.info(f"成功获取并去重后公告数据: {len(unique_announcements)} 条")
-
-            return AnnouncementList(
-                announcements=unique_announcements,
-                total=len(unique_announcements),
-                page=1,
-                size=len(unique_announcements)
-            )
+            # 只查询本地归档；未入库/已过期的日期交给后台补齐，请求不等待数据源
+            dates = self._window_dates(days)
+            self._schedule_gap_fill(dates)
+            return await self._query_window(stock_code, dates)
 
         except Exception as e:
             logger.error(f"获取公告失败: {stock_code}, 错误: {str(e)}")
             raise StockAPIException(f"获取股票公告失败: {str(e)}", "FETCH_ANNOUNCEMENTS_ERROR")
 
-    def _get_range_announcements(self, stock_code: str, days: int) -> List[Announcement]:
-        """获取过去N天的股票公告数据（同步方法，在线程池中执行）"""
-        all_announcements = []
+    async def get_window_announcements(self, stock_code: str) -> Tuple[AnnouncementList, bool]:
+        """先同步公告窗口再查询，返回 (公告列表, 窗口是否完整)
 
-        # 获取过去N天的日期（包含今天，向前days-1天）
-        end_date = datetime.now()
-        for i in range(0, days):
-            current_date = end_date - timedelta(days=i)
-            date_str = current_date.strftime('%Y%m%d')
+        供总结与刷新使用：窗口内仍有日期未入库或已过期（数据源失败、退避中）时视为不完整，
+        调用方不应据此记录公告集合指纹。
+        """
+        try:
+            days = max(1, int(settings.announcement_time_range_days))
+            dates = self._window_dates(days)
+            await self.sync_archive(dates)
+            loop = asyncio.get_running_loop()
+            today = datetime.now().strftime('%Y%m%d')
+            fresh = await loop.run_in_executor(
+                None, self._archive.fresh_days, dates, today, float(settings.notice_snapshot_today_ttl_seconds)
+            )
+            complete = all(d in fresh for d in dates)
+            if not complete:
+                logger.warning(f"{stock_code} 公告窗口有 {len(set(dates) - fresh)} 个日期未同步完成")
+            return await self._query_window(stock_code, dates), complete
+        except Exception as e:
+            logger.error(f"获取公告失败: {stock_code}, 错误: {str(e)}")
+            raise StockAPIException(f"获取股票公告失败: {str(e)}", "FETCH_ANNOUNCEMENTS_ERROR")
 
-            try:
-                logger.info(f"获取 {stock_code} 在 {date_str} 的公告")
-                df = self._get_stock_notice_data(stock_code, date_str)
+    async def _query_window(self, stock_code: str, dates: List[str]) -> AnnouncementList:
+        """从本地归档查询窗口内公告并去重"""
+        loop = asyncio.get_running_loop()
+        all_announcements = await loop.run_in_executor(
+            None, self._archive.query, stock_code, self._iso_date(dates[-1]), self._iso_date(dates[0])
+        )
+        if not all_announcements:
+            return AnnouncementList(announcements=[], total=0, page=1, size=20)
+
+        # 去重处理（基于URL和标题）
+        unique_announcements = self._remove_duplicates(all_announcements)
+        logger.info(f"成功获取并去重后公告数据: {len(unique_announcements)} 条")
+
+        return AnnouncementList(
+            announcements=unique_announcements,
+            total=len(unique_announcements),
+            page=1,
+            size=len(unique_announcements)
+        )
 
-                if not df.empty:
-                    # 转换DataFrame为Announcement对象列表
-                    announcements = self._convert_df_to_announcements(df, stock_code)
-                    all_announcements.extend(announcements)
-                    logger.info(f"日期 {date_str}: 获取到 {len(announcements)} 条公告")
-                else:
-                    logger.info(f"日期 {date_str}: 无公告数据")
+    @staticmethod
+    def _window_dates(days: int) -> List[str]:
+        """过去N天的日期列表（包含今天，向前days-1天）"""
+        end_date = datetime.now()
+        return [(end_date - timedelta(days=i)).strftime('%Y%m%d') for i in range(0, days)]
 
-            except Exception as e:
-                logger.error(f"获取 {date_str} 公告失败: {str(e)}")
-                continue
+    @staticmethod
+    def _iso_date(date_str: str) -> str:
+        return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
 
-        return all_announcements
+    def _schedule_gap_fill(self, dates: List[str]):
+        """在后台同步窗口内缺失的日期；已有补齐任务在运行时不重复创建"""
+        if self._gap_fill_task is not None and not self._gap_fill_task.done():
+            return
+        self._gap_fill_task = asyncio.create_task(self._gap_fill(dates))
 
-    @staticmethod
-    def _get_stock_notice_data(stock_code: str, date: str) -> pd.DataFrame:
-        """获取股票公告数据（同步方法，在线程池中执行）"""
+    async def _gap_fill(self, dates: List[str]):
         try:
-            df = ak.stock_notice_report(symbol="全部", date=date)
-            df_filtered = df[df['代码'] == stock_code]
-            return df_filtered
+            await self.sync_archive(dates)
         except Exception as e:
-            logger.error(f"调用 ak.stock_notice_report 失败: {stock_code}, {date}, 错误: {str(e)}")
-            return pd.DataFrame()
-
-    def _convert_df_to_announcements(self, df: pd.DataFrame, stock_code: str) -> List[Announcement]:
-        """将DataFrame转换为Announcement对象列表"""
-        announcements = []
-
-        for _, row in df.iterrows():
-            announcement = Announcement(
-                id=f"{stock_code}_{row.get('序号', len(announcements))}_{row.get('公告日期', '')}",
+            logger.error(f"后台补齐公告归档失败: {str(e)}")
+
+    async def sync_archive(self, dates: List[str]) -> int:
+        """将尚未入库或当天已过期的日期按日期并发同步到本地归档，返回同步的日期数
+
+        最近同步失败、仍在退避期内的日期跳过，数据源不可用时不反复等待超时。
+        """
+        loop = asyncio.get_running_loop()
+        today = datetime.now().strftime('%Y%m%d')
+        fresh = await loop.run_in_executor(
+            None, self._archive.fresh_days, dates, today, float(settings.notice_snapshot_today_ttl_seconds)
+        )
+        now = time.monotonic()
+        pending = [
+            d for d in dates
+            if d not in fresh and self._sync_failures.get(d, (0, 0.0))[1] <= now
+        ]
+        if pending:
+            await asyncio.gather(*(self._sync_date(date_str) for date_str in pending))
+        return len(pending)
+
+    async def _sync_date(self, date_str: str) -> bool:
+        """在有界线程池中入库单日公告；超时或失败只影响该日期"""
+        loop = asyncio.get_running_loop()
+        timeout = float(settings.notice_fetch_timeout_seconds)
+        try:
+            await asyncio.wait_for(
+                loop.run_in_executor(self._fetch_executor, self._ingest_date, date_str),
+                timeout=timeout,
+            )
+            self._sync_failures.pop(date_str, None)
+            return True
+        except asyncio.TimeoutError:
+            logger.error(f"同步 {date_str} 公告超时({timeout:.0f}s)")
+        except Exception as e:
+            logger.error(f"调用 ak.stock_notice_report 失败: {date_str}, 错误: {str(e)}")
+        self._record_sync_failure(date_str)
+        return False
+
+    def _record_sync_failure(self, date_str: str):
+        failures = self._sync_failures.get(date_str, (0, 0.0))[0] + 1
+        delay = min(
+            float(settings.announcement_sync_backoff_max_seconds),
+            float(settings.announcement_sync_backoff_seconds) * (2 ** (failures - 1)),
+        )
+        self._sync_failures[date_str] = (failures, time.monotonic() + delay)
+
+    async def sync_day(self, date_str: str) -> bool:
+        """立即同步单日公告到归档（不检查归档新鲜度），供盘中监听使用
+
+        先清除该日快照缓存，按监听间隔重新抓取，不受快照TTL限制。
+        """
+        notice_snapshot_cache.invalidate(date_str)
+        return await self._sync_date(date_str)
+
+    def day_notice_keys(self, date_str: str) -> Dict[str, Set[str]]:
+        """单日全市场公告标识 {股票代码: {公告URL（缺失时为标题）}}（同步方法，读取快照缓存）"""
+        snapshot = notice_snapshot_cache.get(date_str)
+        return {
+            code: {self._text(row.get('网址'), '') or self._text(row.get('公告标题'), '') for row in snapshot.rows(code)}
+            for code in snapshot.codes()
+        }
+
+    def _ingest_date(self, date_str: str) -> int:
+        """获取单日全市场公告并写入归档（同步方法，在线程池中执行）
+
+        全市场公告表经进程级快照缓存获取；已收盘日期入库后冻结，当天按TTL增量补充。
+        """
+        frozen = date_str < datetime.now().strftime('%Y%m%d')
+        snapshot = notice_snapshot_cache.get(date_str)
+        announcements = [
+            ann
+            for code in snapshot.codes()
+            for ann in self._convert_rows_to_announcements(snapshot.rows(code), code)
+        ]
+        inserted = self._archive.ingest_day(date_str, announcements, frozen)
+        logger.info(f"日期 {date_str}: 全市场公告 {len(announcements)} 条，新增/更新入库 {inserted} 条")
+        return inserted
+
+    async def run_ingest_loop(self):
+        """后台入库任务：定期同步公告窗口，历史日期只抓取一次，当天增量补充"""
+        while True:
+            try:
+                days = max(1, int(settings.announcement_time_range_days))
+                synced = await self.sync_archive(self._window_dates(days))
+                if synced:
+                    logger.info(f"公告归档同步完成: {synced} 个日期")
+            except Exception as e:
+                logger.exception(f"公告归档同步异常: {e}")
+            await asyncio.sleep(max(60, int(settings.announcement_ingest_interval_seconds)))
+
+    def _convert_rows_to_announcements(self, rows: List[Dict], stock_code: str) -> List[Announcement]:
+        """将公告行批量转换为Announcement对象列表"""
+        return [
+            Announcement(
+                id=f"{stock_code}_{row.get('序号', i)}_{row.get('公告日期', '')}",
                 stock_code=stock_code,
-                stock_name=row.get('名称', ''),
-                title=row.get('公告标题', ''),
+                stock_name=self._text(row.get('名称'), ''),
+                title=self._text(row.get('公告标题'), ''),
                 publish_date=self._parse_date(row.get('公告日期')),
-                category=row.get('公告类型', '其他'),
-                url=row.get('网址', '')
+                category=self._text(row.get('公告类型'), '其他'),
+                url=self._text(row.get('网址'), '')
             )
-            announcements.append(announcement)
+            for i, row in enumerate(rows)
+        ]
 
-        return announcements
+    @staticmethod
+    def _text(value, default: str) -> str:
+        """单元格值转字符串，缺失值(NaN/None)使用默认值"""
+        if value is None or (isinstance(value, float) and pd.isna(value)):
+            return default
+        return str(value)
 
     @staticmethod
     def _remove_duplicates(announcements: List[Announcement]) -> List[Announcement]:
@@ -147,52 +279,354 @@ class AnnouncementService:
 
     async def summarize_announcements(self, stock_code: str):
         """AI智能总结公告（正文提取+LLM预留）"""
+        result, _ = await self.summarize_with_fingerprint(stock_code)
+        return result
+
+    async def summarize_with_fingerprint(self, stock_code: str) -> Tuple[Dict, str]:
+        """总结公告并返回 (总结结果, 公告集合指纹)
+
+        指纹仅供内部保存以判断公告集合是否变化，不出现在对外结果中；
+        公告窗口未同步完整、或有公告正文提取/单条总结失败时返回空指纹，下次刷新会重新总结。
+        窗口不完整且查不到公告时抛出异常，避免把“无公告”当作有效总结保存和推送。
+        """
         try:
-            # 1. 获取公告列表
-            announcement_list = await self.get_announcements(stock_code)
+            # 1. 同步窗口后获取公告列表
+            announcement_list, complete = await self.get_window_announcements(stock_code)
             announcements = announcement_list.announcements
             if not announcements:
-                return {
-                    "summary": f"股票{stock_code}近{settings.announcement_time_range_days}天无公告",
-                    "content": "",
-                    "word_count": 0,
-                    "model_info": {
-                        "model": "qwen3",
-                        "provider": "百炼大模型",
-                        "status": "接口预留"
-                    }
-                }
-
-            # 2. 依次访问每个公告URL，提取正文内容
-            single_summary = ""
-            for ann in announcements:
-                content = await self._extract_announcement_content(ann.url)
-                single_summary += llm_by_api(content)+"\n" if content else ""
-                # logger.info(f"single sum: {single_summary}")
-
-            # 3. 预留LLM调用接口，单条总结与最终汇总
-            final_summary = llm_by_api(single_summary)
+                if not complete:
+                    raise StockAPIException("公告归档未同步完成", "ARCHIVE_INCOMPLETE")
+                return self._summary_result(stock_code, None), self.announcement_fingerprint(announcements)
+
+            # 2. 并发提取正文并做单条总结，按公告原顺序拼接
+            singles = await self._summarize_items(announcements)
+            single_summary = "".join(f"{text}\n" for text in singles if text)
+
+            # 3. 单条总结汇总
+            final_summary = await llm_client.complete(single_summary)
             logger.info(final_summary)
-            return {
-                "summary": f"针对股票：{stock_code}的公告总结",
-                "content": final_summary,
-                "word_count": len(final_summary),
-                "model_info": {
-                    "model": "qwen3",
-                    "provider": "百炼大模型",
-                    "status": "接口预留"
-                }
-            }
+            fingerprint = self.announcement_fingerprint(announcements) if complete and all(singles) else ""
+            if not all(singles):
+                failed = sum(1 for text in singles if not text)
+                logger.warning(f"{stock_code} 有 {failed} 条公告总结失败，不记录公告集合指纹")
+            return self._summary_result(stock_code, final_summary), fingerprint
+        except Exception as e:
+            logger.error(f"AI智能总结失败: {stock_code}, 错误: {str(e)}")
+            raise StockAPIException(f"AI智能总结失败: {str(e)}", "SUMMARIZE_ERROR")
+
+    async def summarize_announcements_stream(self, stock_code: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """流式AI总结：依次产出 (事件名, 数据)
+
+        - progress：阶段与进度（公告列表获取完成、每条公告处理完成）
+        - item：单条公告总结，按完成先后产出
+        - token：汇总总结的增量文本
+        - done：与 summarize_announcements 相同结构的最终结果
+        单条公告处理任务异常时抛出 StockAPIException，由路由转为 error 事件
+        """
+        try:
+            announcement_list, _ = await self.get_window_announcements(stock_code)
+            announcements = announcement_list.announcements
+            total = len(announcements)
+            yield "progress", {"stage": "announcements", "done": 0, "total": total}
+            if not announcements:
+                yield "done", self._summary_result(stock_code, None)
+                return
+
+            queue: asyncio.Queue = asyncio.Queue()
+            task = asyncio.create_task(
+                self._summarize_items(announcements, on_item=lambda i, text: queue.put_nowait((i, text)))
+            )
+            try:
+                for done in range(1, total + 1):
+                    i, text = await self._next_item(queue, task)
+                    ann = announcements[i]
+                    if text:
+                        yield "item", {"index": i, "id": ann.id, "title": ann.title, "url": ann.url, "summary": text}
+                    yield "progress", {"stage": "summarize", "done": done, "total": total}
+                singles = await task
+            finally:
+                task.cancel()
+
+            single_summary = "".join(f"{text}\n" for text in singles if text)
+            yield "progress", {"stage": "rollup", "done": total, "total": total}
+            parts = []
+            async for delta in llm_client.stream(single_summary):
+                parts.append(delta)
+                yield "token", {"text": delta}
+            yield "done", self._summary_result(stock_code, "".join(parts))
         except Exception as e:
             logger.error(f"AI智能总结失败: {stock_code}, 错误: {str(e)}")
             raise StockAPIException(f"AI智能总结失败: {str(e)}", "SUMMARIZE_ERROR")
 
+    @staticmethod
+    async def _next_item(queue: asyncio.Queue, producer: asyncio.Task) -> Tuple[int, str]:
+        """取下一条完成的公告；生产任务异常退出时抛出其异常，而不是一直等待队列"""
+        while queue.empty():
+            if producer.done():
+                producer.result()
+                raise RuntimeError("公告总结任务提前结束")
+            getter = asyncio.ensure_future(queue.get())
+            try:
+                await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if getter.done() and not getter.cancelled():
+                return getter.result()
+        return queue.get_nowait()
+
+    @classmethod
+    def announcement_fingerprint(cls, announcements: List[Announcement]) -> str:
+        """公告集合指纹：窗口内公告标识（URL，缺失时用ID）去重排序后的哈希，与顺序无关"""
+        keys = sorted({cls._announcement_key(ann) for ann in announcements})
+        return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _summary_result(stock_code: str, final_summary: Optional[str]) -> Dict:
+        """总结结果；final_summary 为 None 表示窗口内无公告"""
+        if final_summary is None:
+            summary, final_summary = f"股票{stock_code}近{settings.announcement_time_range_days}天无公告", ""
+        else:
+            summary = f"针对股票：{stock_code}的公告总结"
+        return {
+            "summary": summary,
+            "content": final_summary,
+            "word_count": len(final_summary),
+            "model_info": {
+                "model": llm_client.model,
+                "provider": "百炼大模型",
+                "status": "接口预留"
+            },
+        }
+
+    async def _summarize_items(
+        self, announcements: List[Announcement], on_item: Optional[Callable[[int, str], None]] = None
+    ) -> List[str]:
+        """并发提取正文并做单条总结（两个阶段各自限流），结果按公告原顺序返回
+
+        on_item(序号, 总结) 在每条公告处理完成时回调（失败为空串），供流式接口推送进度。
+        """
+        extract_sem = asyncio.Semaphore(max(1, int(settings.summary_extract_concurrency)))
+        llm_sem = asyncio.Semaphore(max(1, int(settings.summary_llm_concurrency)))
+        if settings.llm_batch_enabled:
+            return await self._summarize_in_batches(announcements, extract_sem, llm_sem, on_item)
+
+        async def run(i, ann):
+            text = await self._process_announcement(ann, extract_sem, llm_sem)
+            if on_item:
+                on_item(i, text)
+            return text
+
+        return list(await asyncio.gather(*(run(i, ann) for i, ann in enumerate(announcements))))
+
+    async def _process_announcement(
+        self, ann: Announcement, extract_sem: asyncio.Semaphore, llm_sem: asyncio.Semaphore
+    ) -> str:
+        """单条公告流水线：正文提取 -> 单条总结；失败或超时只跳过该公告"""
+        content = await self._extract_for_summary(ann, extract_sem)
+        if not content:
+            return ""
+        timeout = float(settings.summary_item_timeout_seconds)
+        try:
+            async with llm_sem:
+                return await asyncio.wait_for(self._summarize_single(ann, content), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"公告处理超时({timeout:.0f}s): {ann.url}")
+        except Exception as e:
+            logger.error(f"公告处理失败: {ann.url}, 错误: {str(e)}")
+        return ""
+
+    async def _extract_for_summary(self, ann: Announcement, extract_sem: asyncio.Semaphore) -> str:
+        """限流并限时提取正文；失败或超时返回空串"""
+        timeout = float(settings.summary_item_timeout_seconds)
+        try:
+            async with extract_sem:
+                return await asyncio.wait_for(self._extract_announcement_content(ann.url), timeout=timeout) or ""
+        except asyncio.TimeoutError:
+            logger.error(f"公告处理超时({timeout:.0f}s): {ann.url}")
+        except Exception as e:
+            logger.error(f"公告处理失败: {ann.url}, 错误: {str(e)}")
+        return ""
+
+    async def _summarize_in_batches(
+        self,
+        announcements: List[Announcement],
+        extract_sem: asyncio.Semaphore,
+        llm_sem: asyncio.Semaphore,
+        on_item: Optional[Callable[[int, str], None]] = None,
+    ) -> List[str]:
+        """批量总结：正文提取完成即查缓存并装入当前批次，批次装满立即发出请求，结果按公告原顺序返回
+
+        按正文字数预算与条数上限分批，超出预算的单条公告独占一批；全部提取结束后发出最后一个未装满的批次。
+        """
+        loop = asyncio.get_running_loop()
+        model = llm_client.model
+        budget = max(1, int(settings.llm_batch_max_tokens))
+        max_items = max(1, int(settings.llm_batch_max_items))
+        results = [""] * len(announcements)
+        batch_tasks = []
+        current, size = [], 0
+
+        def emit(i, text):
+            results[i] = text
+            if on_item:
+                on_item(i, text)
+
+        async def run(batch):
+            summaries = await self._summarize_batch(batch, llm_sem)
+            for i, _, _ in batch:
+                emit(i, summaries.get(i, ""))
+
+        def flush():
+            nonlocal current, size
+            if current:
+                # 批内按公告原顺序编号，与提取完成先后无关
+                batch_tasks.append(asyncio.create_task(run(sorted(current, key=lambda item: item[0]))))
+            current, size = [], 0
+
+        async def prepare(i, ann):
+            nonlocal size
+            content = await self._extract_for_summary(ann, extract_sem)
+            if not content:
+                emit(i, "")
+                return
+            cached = await loop.run_in_executor(
+                None, self._cached_summary, self._announcement_key(ann),
+                self._summary_cache.content_hash(content), model
+            )
+            if cached is not None:
+                emit(i, cached)
+                return
+            if current and size + len(content) > budget:
+                flush()
+            current.append((i, ann, content))
+            size += len(content)
+            if len(current) >= max_items or size >= budget:
+                flush()
+
+        try:
+            await asyncio.gather(*(prepare(i, ann) for i, ann in enumerate(announcements)))
+            flush()
+            await asyncio.gather(*batch_tasks)
+        finally:
+            for task in batch_tasks:
+                task.cancel()
+        return results
+
+    def _cached_summary(self, key: str, content_hash: str, model: str) -> Optional[str]:
+        """批量模式的缓存查询：批量与单条提示词生成的总结均可复用"""
+        for version in (BATCH_PROMPT_VERSION, PROMPT_VERSION):
+            cached = self._summary_cache.get(key, content_hash, model, version)
+            if cached is not None:
+                return cached
+        return None
+
+    async def _summarize_batch(self, batch: List, llm_sem: asyncio.Semaphore) -> Dict[int, str]:
+        """一次请求总结一批公告并逐条写入缓存；解析失败或缺失的公告回退为单条调用"""
+        timeout = float(settings.summary_item_timeout_seconds)
+        summaries: Dict[int, str] = {}
+        if len(batch) > 1:
+            items = [(n, ann.title, content) for n, (_, ann, content) in enumerate(batch, start=1)]
+            try:
+                async with llm_sem:
+                    text, _ = await asyncio.wait_for(llm_client.chat([
+                        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                        {"role": "user", "content": build_batch_prompt(items)},
+                    ]), timeout=timeout)
+                parsed = parse_batch_summaries(text, [n for n, _, _ in items])
+                if parsed is None:
+                    logger.warning(f"批量总结结果解析失败，逐条回退: {len(batch)}条")
+                    parsed = {}
+            except asyncio.TimeoutError:
+                logger.error(f"批量总结超时({timeout:.0f}s)，逐条回退: {len(batch)}条")
+                parsed = {}
+            except Exception as e:
+                logger.error(f"批量总结失败，逐条回退: {str(e)}")
+                parsed = {}
+            loop = asyncio.get_running_loop()
+            model = llm_client.model
+            for n, (i, ann, content) in enumerate(batch, start=1):
+                if n in parsed:
+                    summaries[i] = parsed[n]
+                    await loop.run_in_executor(
+                        None, self._summary_cache.put, self._announcement_key(ann),
+                        self._summary_cache.content_hash(content), model, BATCH_PROMPT_VERSION, parsed[n]
+                    )
+
+        async def fallback(i, ann, content):
+            try:
+                async with llm_sem:
+                    summaries[i] = await asyncio.wait_for(self._summarize_single(ann, content), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"公告处理超时({timeout:.0f}s): {ann.url}")
+            except Exception as e:
+                logger.error(f"公告处理失败: {ann.url}, 错误: {str(e)}")
+
+        await asyncio.gather(*(fallback(*item) for item in batch if item[0] not in summaries))
+        return summaries
+
+    @staticmethod
+    def _announcement_key(ann: Announcement) -> str:
+        """公告稳定标识：优先使用URL（当天公告的序号会随新公告到达而变化）"""
+        return ann.url or ann.id
+
+    async def _summarize_single(self, ann: Announcement, content: str) -> str:
+        """单条公告总结，按 (公告, 正文哈希, 模型, 提示词版本) 复用历史结果"""
+        loop = asyncio.get_running_loop()
+        key = self._announcement_key(ann)
+        content_hash = self._summary_cache.content_hash(content)
+        model = llm_client.model
+        cached = await loop.run_in_executor(
+            None, self._summary_cache.get, key, content_hash, model, PROMPT_VERSION
+        )
+        if cached is not None:
+            return cached
+        summary = await llm_client.complete(content)
+        if summary:
+            await loop.run_in_executor(
+                None, self._summary_cache.put, key, content_hash, model, PROMPT_VERSION, summary
+            )
+        return summary
+
     async def _extract_announcement_content(self, url: str) -> str:
-        """提取公告正文内容，优先从PDF中获取"""
+        """提取公告正文内容，优先从PDF中获取；同一公告只下载解析一次"""
+        entry = await self._get_content_entry(url)
+        return self._present_content(entry) if entry else ""
+
+    async def _get_content_entry(self, url: str) -> Optional[CachedContent]:
+        """读取正文缓存，未命中时提取并写入缓存"""
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self._content_cache.get, url)
+        if cached is not None and self._covers_requested_length(cached):
+            return cached
+        return await self._fetch_content_entry(url)
+
+    @staticmethod
+    def _present_content(entry: CachedContent) -> str:
+        """缓存保存截断前全文，PDF正文在读取时按配置截断"""
+        if entry.kind == "pdf":
+            max_chars = max(1, int(settings.pdf_content_max_chars))
+            return entry.content[:max_chars]
+        return entry.content
+
+    async def _fetch_content_entry(self, url: str) -> Optional[CachedContent]:
+        """提取公告正文：先走纯HTTP快速路径，页面需要JavaScript渲染时才使用浏览器"""
+        resolved = await notice_resolver.resolve(url)
+        if resolved is not None:
+            if resolved.pdf_url:
+                logger.info(f"发现PDF链接: {resolved.pdf_url}")
+                return await self._get_pdf_entry(url, resolved.pdf_url)
+            return await self._put_content(url, "html", resolved.text)
+        return await self._fetch_content_entry_by_browser(url)
+
+    async def _put_content(self, url: str, kind: str, content: str) -> CachedContent:
+        """在线程池中写入正文缓存，避免 SQLite 写入阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._content_cache.put, url, kind, content)
+
+    async def _fetch_content_entry_by_browser(self, url: str) -> Optional[CachedContent]:
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                page = await browser.new_page()
+            async with browser_pool.page() as page:
                 await page.goto(url, timeout=30000)
 
                 # 尝试获取PDF链接
@@ -202,50 +636,75 @@ class AnnouncementService:
                     if pdf_url and pdf_url.endswith('.pdf'):
                         pdf_url = pdf_url.split('?')[0]  # 移除查询参数
                         logger.info(f"发现PDF链接: {pdf_url}")
-                        await browser.close()
-                        return self._extract_pdf_content(pdf_url)
+                        return await self._get_pdf_entry(url, pdf_url)
 
                 # 如果没有PDF链接，回退到网页正文提取
                 content_div = await page.query_selector('#notice_content')
                 if content_div:
-                    content = await content_div.inner_text()
-                    await browser.close()
-                    return content.strip()
+                    content = (await content_div.inner_text()).strip()
+                    return await self._put_content(url, "html", content) if content else None
 
                 logger.warning(f"未找到公告正文内容: {url}")
-                await browser.close()
-                return ""
+                return None
 
         except Exception as e:
             logger.error(f"提取公告内容失败: {url}, 错误: {str(e)}")
-            return ""
+            return None
+
+    async def _get_pdf_entry(self, url: str, pdf_url: str) -> Optional[CachedContent]:
+        """PDF 可能被多条公告引用，先按PDF地址查缓存再下载"""
+        pdf_url = pdf_url.split('?')[0]  # 移除查询参数
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self._content_cache.get, pdf_url)
+        if cached is not None and self._covers_requested_length(cached):
+            return cached
+        pdf_bytes = await self._download_pdf(pdf_url)
+        if pdf_bytes is None:
+            return None
+        try:
+            result = await pdf_engine.extract(pdf_bytes, self._pdf_parse_budget())
+        except asyncio.TimeoutError:
+            logger.error(f"提取PDF内容超时: {pdf_url}")
+            return None
+        except Exception as e:
+            logger.error(f"提取PDF内容失败: {pdf_url}, 错误: {str(e)}")
+            return None
+        logger.info(
+            f"PDF解析完成: {pdf_url}, {result.pages_parsed}/{result.total_pages} 页, "
+            f"解析 {result.parse_ms:.0f}ms, 总耗时 {result.elapsed_ms:.0f}ms"
+        )
+        return await loop.run_in_executor(
+            None,
+            partial(self._content_cache.put, url, "pdf", result.text, source_url=pdf_url, complete=result.complete),
+        )
 
     @staticmethod
-    def _extract_pdf_content(pdf_url: str) -> str:
-        """提取PDF文件的正文内容，并按配置仅返回清洗后的前N个字符"""
-        try:
-            # 修复示例链接的处理逻辑，确保支持带有查询参数的PDF链接
-            pdf_url = pdf_url.split('?')[0]  # 移除查询参数
-
-            response = httpx.get(pdf_url, timeout=30)
-            response.raise_for_status()
-
-            with pdfplumber.open(BytesIO(response.content)) as pdf:
-                # 聚合所有页面文本
-                text = ''.join(page.extract_text() for page in pdf.pages if page.extract_text())
-                if not text:
-                    return ""
-                # 文本清洗：去除多余空白和换行，避免影响字数统计
-                # 1) 将所有空白统一为单个空格，再去掉空格
-                normalized = re.sub(r"\s+", " ", text).strip()
-                cleaned = normalized.replace(" ", "")
-                # 截断长度由配置控制
-                max_chars = max(1, int(settings.pdf_content_max_chars))
-                return cleaned[:max_chars]
+    def _pdf_parse_budget() -> int:
+        """解析PDF时最多收集的清洗后字符数（不小于截断长度），超出即停止解析后续页面"""
+        return max(int(settings.pdf_parse_max_chars), int(settings.pdf_content_max_chars), 1)
+
+    @staticmethod
+    def _covers_requested_length(entry: CachedContent) -> bool:
+        """提前终止解析的缓存若短于当前截断长度，需要重新解析"""
+        return entry.complete or len(entry.content) >= max(1, int(settings.pdf_content_max_chars))
 
+    @staticmethod
+    async def _download_pdf(pdf_url: str) -> Optional[bytes]:
+        """通过共享异步客户端流式下载PDF；超过大小上限或失败返回None"""
+        max_bytes = max(1, int(settings.pdf_max_download_mb)) * 1024 * 1024
+        try:
+            async with get_http_client().stream("GET", pdf_url) as response:
+                response.raise_for_status()
+                buf = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buf.extend(chunk)
+                    if len(buf) > max_bytes:
+                        logger.warning(f"PDF超过下载上限 {settings.pdf_max_download_mb}MB，放弃: {pdf_url}")
+                        return None
+                return bytes(buf)
         except Exception as e:
-            logger.error(f"提取PDF内容失败: {pdf_url}, 错误: {str(e)}")
-            return ""
+            logger.error(f"下载PDF失败: {pdf_url}, 错误: {str(e)}")
+            return None
 
 # 创建服务实例
 announcement_service = AnnouncementService()
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _BrowserSlot:
+    """池中的一个浏览器实例及其使用计数"""
+    __slots__ = ("browser", "served")
+
+    def __init__(self):
+        self.browser = None
+        self.served = 0
+
+
+class BrowserPool:
+    """共享的长生命周期 Playwright 浏览器池
+
+    - 随 FastAPI lifespan 启动/关闭，常驻一个或少量 Chromium 实例
+    - 每次借出独立的 context + page，借出数量受 browser_max_pages 限制
+    - 浏览器累计服务 browser_recycle_pages 个页面或崩溃断开后重建；
+      仍有页面在用的旧实例待其归还后再关闭
+    - 关闭时先拒绝新的借出，再等待已借出页面归还（最长 browser_close_timeout_seconds）
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        recycle_pages: Optional[int] = None,
+        launch: Optional[Callable[[], Awaitable]] = None,
+    ):
+        self.size = max(1, int(size if size is not None else settings.browser_pool_size))
+        self.max_pages = max(1, int(max_pages if max_pages is not None else settings.browser_max_pages))
+        self.recycle_pages = max(1, int(recycle_pages if recycle_pages is not None else settings.browser_recycle_pages))
+        self._launch = launch
+        self._playwright = None
+        self._slots: List[_BrowserSlot] = []
+        self._active: Dict[object, int] = {}
+        self._retired: List[object] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._cursor = 0
+        self._borrowed = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._closing = False
+        self.launched = 0
+
+    @property
+    def started(self) -> bool:
+        return self._semaphore is not None
+
+    async def start(self):
+        """启动 Playwright 并预热浏览器；预热失败不影响服务启动，首次使用时重试"""
+        if self.started:
+            return
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        self._lock = asyncio.Lock()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+        self._slots = [_BrowserSlot() for _ in range(self.size)]
+        try:
+            async with self._lock:
+                for slot in self._slots:
+                    await self._relaunch(slot)
+            logger.info(f"浏览器池已启动: {self.size} 个实例，最大并发页面 {self.max_pages}")
+        except Exception as e:
+            logger.warning(f"浏览器池预热失败，将在首次使用时重试: {e}")
+
+    async def close(self, timeout: Optional[float] = None):
+        """拒绝新的借出，等待已借出页面归还后关闭全部浏览器与 Playwright"""
+        if not self.started or self._closing:
+            return
+        self._closing = True
+        timeout = settings.browser_close_timeout_seconds if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"等待借出页面归还超时，仍有 {self._borrowed} 个页面在用，强制关闭浏览器")
+        browsers = [slot.browser for slot in self._slots if slot.browser is not None] + self._retired
+        for browser in browsers:
+            await self._close_browser(browser)
+        self._slots, self._retired = [], []
+        self._active.clear()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.warning(f"停止 Playwright 失败: {e}")
+            self._playwright = None
+            self._launch = None
+        self._semaphore = None
+        self._lock = None
+        self._idle = None
+        self._closing = False
+        logger.info("浏览器池已关闭")
+
+    @asynccontextmanager
+    async def page(self):
+        """借出一个独立 context 中的页面，退出时关闭 context 并归还；池关闭中抛 RuntimeError"""
+        if self._closing:
+            raise RuntimeError("浏览器池正在关闭")
+        if not self.started:
+            await self.start()
+        async with self._semaphore:
+            # 排队期间池可能已开始或完成关闭
+            if self._closing or not self.started:
+                raise RuntimeError("浏览器池正在关闭")
+            self._borrowed += 1
+            self._idle.clear()
+            browser = None
+            context = None
+            try:
+                browser = await self._acquire()
+                context = await browser.new_context()
+                page = await context.new_page()
+                yield page
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.debug(f"关闭浏览器 context 失败: {e}")
+                if browser is not None:
+                    await self._release(browser)
+                self._borrowed -= 1
+                if self._borrowed == 0 and self._idle is not None:
+                    self._idle.set()
+
+    async def _acquire(self):
+        async with self._lock:
+            slot = self._slots[self._cursor % len(self._slots)]
+            self._cursor += 1
+            browser = slot.browser
+            if browser is None or not browser.is_connected():
+                if browser is not None:
+                    logger.warning("浏览器实例已断开，重新启动")
+                await self._relaunch(slot)
+            elif slot.served >= self.recycle_pages:
+                logger.info(f"浏览器实例已服务 {slot.served} 个页面，回收重建")
+                await self._relaunch(slot)
+            slot.served += 1
+            browser = slot.browser
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _release(self, browser):
+        lock = self._lock
+        if lock is None:
+            # 关闭等待超时后浏览器已全部关闭，无需再归还
+            return
+        async with lock:
+            remaining = self._active.get(browser, 1) - 1
+            if remaining > 0:
+                self._active[browser] = remaining
+                return
+            self._active.pop(browser, None)
+            if browser not in self._retired:
+                return
+            self._retired.remove(browser)
+        await self._close_browser(browser)
+
+    async def _relaunch(self, slot: _BrowserSlot):
+        """为槽位启动新实例；旧实例无在用页面则立即关闭，否则待归还后关闭"""
+        if self._launch is None:
+            self._playwright = await async_playwright().start()
+            self._launch = self._playwright.chromium.launch
+        old = slot.browser
+        slot.browser = await self._launch()
+        slot.served = 0
+        self.launched += 1
+        if old is None:
+            return
+        if self._active.get(old):
+            self._retired.append(old)
+        else:
+            await self._close_browser(old)
+
+    @staticmethod
+    async def _close_browser(browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.debug(f"关闭浏览器失败: {e}")
+
+
+browser_pool = BrowserPool()
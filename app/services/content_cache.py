@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..core.config import settings
+from .announcement_archive import ANNOUNCEMENT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class CachedContent(BaseModel):
+    """已提取的公告正文（清洗后、截断前的全文）"""
+    cache_key: str
+    kind: str  # pdf / html
+    source_url: str = ""
+    content_hash: str
+    content: str
+    # PDF 解析在收集到足够字符后提前终止时为 False
+    complete: bool = True
+
+
+class ContentCache:
+    """公告正文/PDF文本的持久化缓存
+
+    以公告URL为键，同时按解析出的PDF地址(source_url)建索引，
+    保存截断前的全文与内容哈希；磁盘占用超过上限时按最近访问时间(LRU)淘汰。
+    总大小在内存中累计（首次写入时统计一次），写入时无需全表求和。
+    """
+
+    def __init__(self, db_path: str = ANNOUNCEMENT_DB_PATH, max_bytes: Optional[int] = None):
+        self.db_path = db_path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return max(1, int(settings.content_cache_max_mb)) * 1024 * 1024
+
+    def _init_db(self):
+        """首次访问时建表；导入模块与创建实例时不触碰数据库文件"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS announcement_contents (
+                        cache_key TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        source_url TEXT NOT NULL DEFAULT '',
+                        content_hash TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        complete INTEGER NOT NULL DEFAULT 1,
+                        created_datetime TEXT,
+                        accessed_ts REAL NOT NULL
+                    )
+                    """
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(announcement_contents)")}
+                if "complete" not in columns:
+                    conn.execute("ALTER TABLE announcement_contents ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_contents_source_url ON announcement_contents(source_url)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_contents_accessed ON announcement_contents(accessed_ts)"
+                )
+                conn.commit()
+            self._initialized = True
+
+    @contextmanager
+    def _conn(self):
+        self._init_db()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedContent]:
+        """按公告URL或PDF地址查询缓存，命中时刷新访问时间"""
+        if not key:
+            return None
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT cache_key, kind, source_url, content_hash, content, complete FROM announcement_contents\n                 WHERE cache_key=? OR source_url=? LIMIT 1",
+                (key, key),
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE announcement_contents SET accessed_ts=? WHERE cache_key=?",
+                (time.time(), row[0]),
+            )
+            conn.commit()
+        cache_key, kind, source_url, content_hash, content, complete = row
+        return CachedContent(
+            cache_key=cache_key, kind=kind, source_url=source_url,
+            content_hash=content_hash, content=content, complete=bool(complete),
+        )
+
+    def put(self, key: str, kind: str, content: str, source_url: str = "", complete: bool = True) -> CachedContent:
+        entry = CachedContent(
+            cache_key=key, kind=kind, source_url=source_url or "",
+            content_hash=self.content_hash(content), content=content, complete=complete,
+        )
+        size = len(content.encode("utf-8"))
+        with self._lock, self._conn() as conn:
+            if self._total_bytes is None:
+                self._total_bytes = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM announcement_contents"
+                ).fetchone()[0]
+            old = conn.execute("SELECT size FROM announcement_contents WHERE cache_key=?", (key,)).fetchone()
+            conn.execute(
+                "INSERT INTO announcement_contents(cache_key, kind, source_url, content_hash, content, size, complete, created_datetime, accessed_ts)\n                 VALUES(?,?,?,?,?,?,?,?,?)\n                 ON CONFLICT(cache_key) DO UPDATE SET kind=excluded.kind, source_url=excluded.source_url, content_hash=excluded.content_hash,\n                 content=excluded.content, size=excluded.size, complete=excluded.complete, accessed_ts=excluded.accessed_ts",
+                (key, kind, entry.source_url, entry.content_hash, content, size, 1 if complete else 0,
+                 datetime.now(timezone.utc).isoformat(), time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+        return entry
+
+    def _evict(self, conn: sqlite3.Connection):
+        """总大小超过上限时按最久未访问优先淘汰（调用方持有 _lock）"""
+        total = self._total_bytes
+        limit = self.max_bytes
+        cur = conn.execute("SELECT cache_key, size FROM announcement_contents ORDER BY accessed_ts ASC")
+        victims = []
+        for cache_key, size in cur.fetchall():
+            if total <= limit:
+                break
+            victims.append((cache_key,))
+            total -= size
+        conn.executemany("DELETE FROM announcement_contents WHERE cache_key=?", victims)
+        self._total_bytes = total
+        logger.info(f"正文缓存超出上限，淘汰 {len(victims)} 条")
+
+
+content_cache = ContentCache()
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from .refresh_scheduler import REFRESH_OK, RefreshReport
+from .subscription_service import subscription_service
+from .wechat_push import WeChatPushService, wechat_push
+
+logger = logging.getLogger(__name__)
+
+DIGEST_RUNNING = "running"
+DIGEST_DONE = "done"
+
+
+class DigestNotifier:
+    """定时刷新后的订阅摘要推送
+
+    - 每个用户一条摘要消息，汇总其订阅中本次有更新的全部股票
+    - 按 (用户, 代码) 键集分页读取订阅，内存占用与订阅总量无关
+    - 每页的摘要消息与进度游标在发件箱数据库的同一事务中写入：进程崩溃后从游标处继续，
+      已写入的消息不会重复生成；dedupe_key（运行ID+用户）再兜底一次
+    - 实际发送由 WeChatPushService 发件箱完成，并发、全局QPS与用户频控均沿用其配置
+    """
+
+    def __init__(self, push: Optional[WeChatPushService] = None, page_size: Optional[int] = None):
+        self.push = push or wechat_push
+        self.page_size = max(1, int(page_size if page_size is not None else settings.digest_page_size))
+        self._initialized = False
+        self.runs = 0
+        self.messages = 0
+
+    def _init_db(self):
+        if self._initialized:
+            return
+        with self.push.transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS digest_runs (
+                    run_id TEXT PRIMARY KEY,
+                    stock_codes TEXT NOT NULL,
+                    cursor_user TEXT NOT NULL DEFAULT '',
+                    cursor_code TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'running',
+                    messages INTEGER NOT NULL DEFAULT 0,
+                    created_datetime TEXT NOT NULL,
+                    updated_datetime TEXT NOT NULL
+                )
+                """
+            )
+        self._initialized = True
+
+    @staticmethod
+    def _now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _start_run(self, run_id: str, codes: List[str]):
+        """登记一次推送；同一运行ID已存在时沿用原记录（重复调用即续推）"""
+        self._init_db()
+        now_iso = self._now_iso()
+        with self.push.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO digest_runs(run_id, stock_codes, created_datetime, updated_datetime) VALUES(?,?,?,?)",
+                (run_id, json.dumps(sorted(codes)), now_iso, now_iso),
+            )
+
+    def _load_run(self, run_id: str) -> Optional[Tuple[List[str], Tuple[str, str], str]]:
+        self._init_db()
+        with self.push.transaction() as conn:
+            row = conn.execute(
+                "SELECT stock_codes, cursor_user, cursor_code, status FROM digest_runs WHERE run_id=?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), (row[1], row[2]), row[3]
+
+    def unfinished_runs(self) -> List[str]:
+        self._init_db()
+        with self.push.transaction() as conn:
+            cur = conn.execute(
+                "SELECT run_id FROM digest_runs WHERE status=? ORDER BY created_datetime", (DIGEST_RUNNING,)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def _commit_page(
+        self, run_id: str, messages: List[Tuple[str, str, str]], cursor: Tuple[str, str], done: bool
+    ) -> int:
+        """在同一事务中写入本页摘要消息并推进游标"""
+        with self.push.transaction() as conn:
+            inserted = self.push.insert_messages(conn, messages)
+            conn.execute(
+                "UPDATE digest_runs SET cursor_user=?, cursor_code=?, status=?, messages=messages+?, updated_datetime=? "
+                "WHERE run_id=?",
+                (cursor[0], cursor[1], DIGEST_DONE if done else DIGEST_RUNNING, inserted, self._now_iso(), run_id),
+            )
+            return inserted
+
+    @staticmethod
+    def format_digest(codes: List[str], texts: Dict[str, str]) -> str:
+        """单个用户的摘要消息；超出单条长度时省略其余代码并提示逐个查询"""
+        item_chars = max(20, int(settings.digest_item_max_chars))
+        max_chars = int(settings.wechat_push_max_chars)
+        header = f"订阅公告总结已更新（{len(codes)}只）"
+        parts = [header]
+        length = len(header)
+        for i, code in enumerate(codes):
+            text = texts.get(code, "")
+            if len(text) > item_chars:
+                text = text[:item_chars] + "…"
+            part = f"【{code}】{text}"
+            rest = len(codes) - i
+            tail = f"另有 {rest} 只股票更新，发送代码查看详情"
+            if length + len(part) + 2 > max_chars - len(tail) - 2 and rest > 1:
+                parts.append(tail)
+                break
+            parts.append(part)
+            length += len(part) + 2
+        return "\n\n".join(parts)
+
+    def _load_texts(self, codes: List[str]) -> Dict[str, str]:
+        return {code: subscription_service.load_summary_text(code) for code in codes}
+
+    async def notify(self, run_id: str, codes: List[str]) -> int:
+        """为本次刷新有更新的股票生成摘要推送，返回新写入发件箱的消息数"""
+        if not codes:
+            return 0
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._start_run, run_id, codes)
+        return await self._process(run_id)
+
+    async def notify_report(self, report: RefreshReport) -> int:
+        """按定时刷新报告推送：以本次运行开始时间为运行ID，仅包含重新生成了总结的股票"""
+        codes = [r.stock_code for r in report.results if r.status == REFRESH_OK]
+        return await self.notify(report.started_datetime, codes)
+
+    async def resume(self) -> int:
+        """续推进程退出前未完成的摘要推送"""
+        loop = asyncio.get_running_loop()
+        total = 0
+        for run_id in await loop.run_in_executor(None, self.unfinished_runs):
+            logger.info(f"续推未完成的订阅摘要: {run_id}")
+            total += await self._process(run_id)
+        return total
+
+    async def _process(self, run_id: str) -> int:
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, self._load_run, run_id)
+        if loaded is None or loaded[2] == DIGEST_DONE:
+            return 0
+        codes, cursor, _ = loaded
+        texts = await loop.run_in_executor(None, self._load_texts, codes)
+
+        inserted = 0
+        after = cursor
+        pending_user, pending_codes = "", []
+        while True:
+            rows = await loop.run_in_executor(
+                None, subscription_service.list_subscriptions, after, self.page_size, codes
+            )
+            done = len(rows) < self.page_size
+            messages = []
+            for user, code in rows:
+                if user != pending_user and pending_codes:
+                    messages.append(self._message(run_id, pending_user, pending_codes, texts))
+                    cursor = (pending_user, pending_codes[-1])
+                    pending_codes = []
+                pending_user = user
+                pending_codes.append(code)
+            # 未取满一页时最后一个用户已完整；否则其订阅可能延续到下一页，留待下一页一起生成
+            if done and pending_codes:
+                messages.append(self._message(run_id, pending_user, pending_codes, texts))
+                cursor = (pending_user, pending_codes[-1])
+                pending_codes = []
+            if rows:
+                after = rows[-1]
+            inserted += await loop.run_in_executor(None, self._commit_page, run_id, messages, cursor, done)
+            if done:
+                break
+
+        self.runs += 1
+        self.messages += inserted
+        logger.info(f"订阅摘要推送已入队: run={run_id}, 股票 {len(codes)} 只, 消息 {inserted} 条")
+        return inserted
+
+    def _message(self, run_id: str, user: str, codes: List[str], texts: Dict[str, str]) -> Tuple[str, str, str]:
+        return user, self.format_digest(codes, texts), f"digest:{run_id}:{user}"
+
+    def stats(self) -> Dict[str, int]:
+        return {"runs": self.runs, "messages": self.messages}
+
+
+digest_notifier = DigestNotifier()
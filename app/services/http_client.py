@@ -0,0 +1,55 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 依赖 h2 包（httpx[http2]），缺失时回退 HTTP/1.1 keep-alive"""
+    if not settings.http2_enabled:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("未安装 h2，共享HTTP客户端回退为 HTTP/1.1")
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """进程内共享的 httpx.AsyncClient（连接池复用），首次使用时创建"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=_DEFAULT_HEADERS,
+            timeout=httpx.Timeout(float(settings.http_timeout_seconds)),
+            limits=httpx.Limits(
+                max_connections=max(1, int(settings.http_max_connections)),
+                max_keepalive_connections=max(1, int(settings.http_max_connections)),
+            ),
+            follow_redirects=True,
+            http2=_http2_available(),
+        )
+    return _client
+
+
+async def close_http_client():
+    """关闭共享客户端（lifespan 结束时调用）"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("共享HTTP客户端已关闭")
+    _client = None
@@ -1,23 +1,281 @@
 import os
-from http import HTTPStatus
-from dashscope import Generation
-
-
-def llm_by_api(announcement_contents):
-    # 若使用新加坡地域的模型，请释放下列注释
-    # dashscope.base_http_api_url = "https://dashscope-intl.aliyuncs.com/api/v1"
-    messages = [
-        {"role": "system", "content": "你是一个金融领域的专家，善于总结个股公告内容。请你把公告内容总结成一句话，用词简明，适合非金融专业的读者理解，突出公告的核心信息和影响"},
-        {"role": "user", "content": announcement_contents},
-    ]
-    response = Generation.call(
-        # 若没有配置环境变量，请用阿里云百炼API Key将下行替换为：api_key = "sk-xxx",
-        # 新加坡和北京地域的API Key不同。获取API Key：https://help.aliyun.com/zh/model-studio/get-api-key
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        model="qwen-plus",
-        messages=messages,
-        result_format="message",
-    )
-
-    if response.status_code == HTTPStatus.OK:
-        return response.output.choices[0]["message"]["content"]
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+from ..core.config import settings
+from ..core.exceptions import StockAPIException
+from ..core.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 提示词版本：作为单条公告总结缓存键的一部分，修改提示词时请同步提升版本号
+PROMPT_VERSION = "v1"
+# 批量提示词版本：批量请求产出的单条总结以此版本写入缓存，修改 BATCH_SYSTEM_PROMPT 或批量格式时请同步提升
+BATCH_PROMPT_VERSION = "batch-v1"
+SYSTEM_PROMPT = "你是一个金融领域的专家，善于总结个股公告内容。请你把公告内容总结成一句话，用词简明，适合非金融专业的读者理解，突出公告的核心信息和影响"
+BATCH_SYSTEM_PROMPT = (
+    "你是一个金融领域的专家，善于总结个股公告内容。下面给出多条编号的公告，请把每条公告分别总结成一句话，"
+    "用词简明，适合非金融专业的读者理解，突出公告的核心信息和影响。"
+    "只输出JSON数组，不要输出其他内容，格式为：[{\"id\": 编号, \"summary\": \"总结\"}]，每条公告对应一个元素"
+)
+
+# DashScope 文本生成接口（相对 settings.llm_api_url）
+_GENERATION_PATH = "services/aigc/text-generation/generation"
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(StockAPIException):
+    """LLM调用失败"""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message, "LLM_ERROR")
+
+
+class LLMUsage(BaseModel):
+    """单次调用用量"""
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    attempts: int = 1
+    request_id: str = ""
+
+
+def build_batch_prompt(items: List[Tuple[int, str, str]]) -> str:
+    """将多条公告 (编号, 标题, 正文) 拼成一次批量总结请求"""
+    return "\n\n".join(f"【公告{item_id}】{title}\n{content}" for item_id, title, content in items)
+
+
+def parse_batch_summaries(text: str, expected_ids: List[int]) -> Optional[Dict[int, str]]:
+    """解析批量总结返回的JSON数组，返回 {编号: 总结}；格式不符时返回 None
+
+    容忍 ```json 代码块包裹；缺失或为空的编号不出现在结果中，由调用方逐条回退。
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, list):
+        return None
+    expected = set(expected_ids)
+    result: Dict[int, str] = {}
+    for item in data:
+        if not isinstance(item, dict):
+            return None
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            return None
+        summary = str(item.get("summary") or "").strip()
+        if item_id in expected and summary:
+            result[item_id] = summary
+    return result
+
+
+class LLMClient:
+    """DashScope 异步客户端
+
+    - 复用连接池的 httpx.AsyncClient，不阻塞事件循环
+    - 按配置的 QPS 与 TPM 额度做令牌桶限流（TPM 按输入长度预估、按实际用量校正）
+    - 429/5xx/超时按指数退避+随机抖动重试，单次调用受 llm_timeout_seconds 限制
+    - 累计记录每次调用的 token 用量与耗时
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._qps_bucket = TokenBucket(rate=settings.llm_qps, capacity=max(1.0, settings.llm_qps))
+        self._tpm_bucket = TokenBucket(rate=settings.llm_tpm / 60.0, capacity=settings.llm_tpm)
+        self.calls = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def model(self) -> str:
+        return settings.llm_model
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.llm_api_url,
+                timeout=httpx.Timeout(float(settings.llm_timeout_seconds)),
+                limits=httpx.Limits(
+                    max_connections=max(1, int(settings.llm_max_connections)),
+                    max_keepalive_connections=max(1, int(settings.llm_max_connections)),
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @staticmethod
+    def _api_key() -> str:
+        return settings.llm_api_key or os.getenv("DASHSCOPE_API_KEY") or ""
+
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict]) -> int:
+        # 中文约 1 字 1 token，另为输出预留
+        return sum(len(m.get("content") or "") for m in messages) + int(settings.llm_output_token_reserve)
+
+    async def complete(self, content: str, system_prompt: str = SYSTEM_PROMPT) -> str:
+        """单轮总结，返回模型输出文本"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content},
+        ]
+        text, _ = await self.chat(messages)
+        return text
+
+    async def chat(self, messages: List[Dict]) -> Tuple[str, LLMUsage]:
+        estimate = self._estimate_tokens(messages)
+        start = time.perf_counter()
+        response, attempt = await self._send(self._payload(messages), estimate, stream=False)
+        try:
+            await response.aread()
+            try:
+                data = response.json()
+            except ValueError:
+                # 网关/代理返回的非JSON页面（如HTML错误页）
+                self.failures += 1
+                raise LLMError(f"LLM响应不是JSON: {response.text[:200]}", response.status_code)
+        finally:
+            await response.aclose()
+        try:
+            text = data["output"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            self.failures += 1
+            raise LLMError(f"LLM响应格式异常: {str(data)[:200]}", response.status_code)
+        usage = self._usage(data, start, attempt)
+        self._record(usage, estimate)
+        return text or "", usage
+
+    async def stream(self, content: str, system_prompt: str = SYSTEM_PROMPT) -> AsyncIterator[str]:
+        """流式单轮总结，逐段产出增量文本（DashScope SSE 增量输出）
+
+        仅在收到首个数据前重试；流中断时抛出 LLMError。
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content},
+        ]
+        estimate = self._estimate_tokens(messages)
+        payload = self._payload(messages)
+        payload["parameters"]["incremental_output"] = True
+        start = time.perf_counter()
+        response, attempt = await self._send(payload, estimate, stream=True)
+        data: Dict = {}
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    data = json.loads(line[5:])
+                    delta = data["output"]["choices"][0]["message"]["content"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue
+                if delta:
+                    yield delta
+        except httpx.HTTPError as e:
+            self.failures += 1
+            raise LLMError(f"LLM流式响应中断: {e}")
+        finally:
+            await response.aclose()
+        self._record(self._usage(data, start, attempt), estimate)
+
+    def _payload(self, messages: List[Dict]) -> Dict:
+        return {
+            "model": self.model,
+            "input": {"messages": messages},
+            "parameters": {"result_format": "message"},
+        }
+
+    async def _send(self, payload: Dict, estimate: int, stream: bool) -> Tuple[httpx.Response, int]:
+        """限流后发送请求，429/5xx/超时按退避重试；返回未读取正文的响应与尝试次数"""
+        headers = {"Authorization": f"Bearer {self._api_key()}"}
+        if stream:
+            headers["X-DashScope-SSE"] = "enable"
+        client = self._get_client()
+        max_retries = max(0, int(settings.llm_max_retries))
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._qps_bucket.acquire()
+            await self._tpm_bucket.acquire(estimate)
+            try:
+                request = client.build_request("POST", _GENERATION_PATH, json=payload, headers=headers)
+                response = await client.send(request, stream=True)
+                status = response.status_code
+                if status == 200:
+                    return response, attempt
+                await response.aread()
+                await response.aclose()
+                error = f"HTTP {status}: {response.text[:200]}"
+            except httpx.TimeoutException as e:
+                status, error = None, f"超时: {e}"
+            except httpx.TransportError as e:
+                status, error = None, f"连接错误: {e}"
+
+            retryable = status is None or status in _RETRY_STATUS
+            if not retryable or attempt > max_retries:
+                self.failures += 1
+                logger.error(f"LLM调用失败({attempt}次): {error}")
+                raise LLMError(f"LLM调用失败: {error}", status)
+            delay = self._backoff(attempt)
+            logger.warning(f"LLM调用失败，{delay:.1f}s 后重试({attempt}/{max_retries}): {error}")
+            await asyncio.sleep(delay)
+
+    def _usage(self, data: Dict, start: float, attempt: int) -> LLMUsage:
+        usage_data = data.get("usage") or {}
+        return LLMUsage(
+            model=self.model,
+            prompt_tokens=int(usage_data.get("input_tokens") or 0),
+            completion_tokens=int(usage_data.get("output_tokens") or 0),
+            latency_ms=(time.perf_counter() - start) * 1000,
+            attempts=attempt,
+            request_id=data.get("request_id") or "",
+        )
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        base = float(settings.llm_retry_base_seconds)
+        return random.uniform(0, min(30.0, base * (2 ** (attempt - 1)))) + base / 2
+
+    def _record(self, usage: LLMUsage, estimate: int):
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        # 按实际用量校正 TPM 令牌桶
+        actual = usage.prompt_tokens + usage.completion_tokens
+        if actual > estimate:
+            self._tpm_bucket.consume(actual - estimate)
+        logger.info(
+            f"LLM调用完成: model={usage.model}, prompt={usage.prompt_tokens}, completion={usage.completion_tokens}, "
+            f"latency={usage.latency_ms:.0f}ms, attempts={usage.attempts}"
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+llm_client = LLMClient()
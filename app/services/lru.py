@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+
+class LRUCache:
+    """线程安全的有界LRU缓存（读穿透）
+
+    get_or_load 未命中时调用 loader 并写入缓存；为避免读写竞争把旧值写回，
+    加载期间若有 invalidate，加载结果只返回、不缓存。
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable):
+        value = self._data.get(key, self._MISSING)
+        if value is not self._MISSING:
+            self._data.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def _store(self, key: Hashable, value: Any, generation: int):
+        if self.maxsize == 0 or generation != self._generation:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            generation = self._generation
+        if value is not self._MISSING:
+            return value
+        value = loader()
+        with self._lock:
+            self._store(key, value, generation)
+        return value
+
+    def get_many_or_load(self, keys: Iterable[Hashable], loader: Callable[[list], Dict]) -> Dict:
+        """批量读取；未命中的键一次性交给 loader 加载，loader 需为每个键返回值"""
+        result = {}
+        missing = []
+        with self._lock:
+            generation = self._generation
+            for key in keys:
+                value = self._lookup(key)
+                if value is self._MISSING:
+                    missing.append(key)
+                else:
+                    result[key] = value
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                for key in missing:
+                    result[key] = loaded[key]
+                    self._store(key, loaded[key], generation)
+        return result
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
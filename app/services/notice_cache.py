@@ -0,0 +1,165 @@
+import akshare as ak
+import pandas as pd
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NoticeDaySnapshot:
+    """单日全市场公告的列式索引
+
+    加载时按股票代码分组一次，按代码查询仅需 O(该代码公告条数)，
+    不再对整张全市场 DataFrame 做过滤扫描。
+    """
+
+    CODE_COLUMN = '代码'
+
+    def __init__(self, date: str, df: pd.DataFrame):
+        self.date = date
+        self.total = len(df)
+        self._columns: Dict[str, list] = {col: df[col].tolist() for col in df.columns}
+        self._index: Dict[str, List[int]] = {}
+        if self.total and self.CODE_COLUMN in df.columns:
+            grouped = df.groupby(self.CODE_COLUMN, sort=False).indices
+            self._index = {str(code): positions.tolist() for code, positions in grouped.items()}
+
+    def codes(self) -> List[str]:
+        return list(self._index.keys())
+
+    def rows(self, stock_code: str) -> List[Dict]:
+        """返回指定代码当天的公告行（保持原表顺序）"""
+        positions = self._index.get(stock_code)
+        if not positions:
+            return []
+        columns = self._columns
+        return [{col: values[i] for col, values in columns.items()} for i in positions]
+
+    def __len__(self) -> int:
+        return self.total
+
+
+def _fetch_market_notices(date: str) -> NoticeDaySnapshot:
+    """下载指定日期全市场公告表并建立索引（同步，耗时操作）"""
+    df = ak.stock_notice_report(symbol="全部", date=date)
+    return NoticeDaySnapshot(date, df)
+
+
+class _SnapshotEntry:
+    __slots__ = ("data", "fetched_at", "final")
+
+    def __init__(self, data, fetched_at: float, final: bool):
+        self.data = data
+        self.fetched_at = fetched_at
+        # 抓取时该日期已结束（早于今天），数据视为不可变
+        self.final = final
+
+
+class NoticeSnapshotCache:
+    """进程级全市场公告快照缓存（按日期）
+
+    - 历史日期：抓取后永不过期（仅受容量上限淘汰）
+    - 当天：按 notice_snapshot_today_ttl_seconds 过期后重新抓取
+    - 并发调用同一日期时共享同一次抓取，避免重复下载全市场数据
+    线程安全，可在线程池中调用。
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[str], NoticeDaySnapshot] = _fetch_market_notices,
+        today_ttl_seconds: Optional[int] = None,
+        max_days: Optional[int] = None,
+    ):
+        self._fetcher = fetcher
+        self._today_ttl_seconds = today_ttl_seconds
+        self._max_days = max_days
+        self._entries: "OrderedDict[str, _SnapshotEntry]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def today_ttl_seconds(self) -> int:
+        if self._today_ttl_seconds is not None:
+            return self._today_ttl_seconds
+        return max(0, int(settings.notice_snapshot_today_ttl_seconds))
+
+    @property
+    def max_days(self) -> int:
+        if self._max_days is not None:
+            return self._max_days
+        return max(1, int(settings.notice_snapshot_max_days))
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now().strftime('%Y%m%d')
+
+    def _is_fresh(self, date: str, entry: _SnapshotEntry, now: float) -> bool:
+        if entry.final:
+            return True
+        if date < self._today():
+            # 抓取时为当天、现已收盘的日期：需要再抓取一次得到完整数据
+            return False
+        return now - entry.fetched_at < self.today_ttl_seconds
+
+    def get(self, date: str) -> NoticeDaySnapshot:
+        """获取指定日期(YYYYMMDD)的全市场公告快照，命中缓存则直接返回"""
+        with self._lock:
+            entry = self._entries.get(date)
+            if entry is not None and self._is_fresh(date, entry, time.monotonic()):
+                self._entries.move_to_end(date)
+                self.hits += 1
+                return entry.data
+            future = self._inflight.get(date)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[date] = future
+                self.misses += 1
+
+        if not owner:
+            # 其他调用方正在抓取同一日期，等待其结果
+            return future.result()
+
+        try:
+            final = date < self._today()
+            data = self._fetcher(date)
+            with self._lock:
+                self._entries[date] = _SnapshotEntry(data, time.monotonic(), final)
+                self._entries.move_to_end(date)
+                while len(self._entries) > self.max_days:
+                    evicted, _ = self._entries.popitem(last=False)
+                    logger.info(f"公告快照缓存淘汰日期: {evicted}")
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            # 抓取失败不缓存，等待中的调用方同样收到异常
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(date, None)
+
+    def invalidate(self, date: Optional[str] = None):
+        """清除指定日期（或全部）的快照"""
+        with self._lock:
+            if date is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(date, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# 进程级共享实例
+notice_snapshot_cache = NoticeSnapshotCache()
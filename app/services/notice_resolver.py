@@ -0,0 +1,111 @@
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from pydantic import BaseModel
+
+from .http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class ResolvedNotice(BaseModel):
+    """纯HTTP解析公告页面的结果：PDF地址或网页正文二选一"""
+    pdf_url: str = ""
+    text: str = ""
+
+
+class _NoticePageParser(HTMLParser):
+    """提取 a.pdf-link 的 href 与 #notice_content 的文本（与浏览器路径选择器一致）"""
+
+    _VOID_TAGS = {"br", "img", "hr", "input", "meta", "link", "area", "base", "col", "embed", "source", "wbr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pdf_href: Optional[str] = None
+        self._content_depth = 0
+        self._content_parts: List[str] = []
+        self.content_found = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and self.pdf_href is None and "pdf-link" in (attrs.get("class") or "").split():
+            self.pdf_href = attrs.get("href") or None
+        if self._content_depth:
+            if tag not in self._VOID_TAGS:
+                self._content_depth += 1
+            if tag in ("br", "p", "div"):
+                self._content_parts.append("\n")
+        elif attrs.get("id") == "notice_content" and tag not in self._VOID_TAGS:
+            self._content_depth = 1
+            self.content_found = True
+
+    def handle_endtag(self, tag):
+        if self._content_depth and tag not in self._VOID_TAGS:
+            self._content_depth -= 1
+
+    def handle_data(self, data):
+        if self._content_depth:
+            self._content_parts.append(data)
+
+    @property
+    def content_text(self) -> str:
+        text = "".join(self._content_parts)
+        return re.sub(r"[ \t\r\f\v]+", " ", re.sub(r"\n\s*\n+", "\n", text)).strip()
+
+
+class NoticeHttpResolver:
+    """不启动浏览器，直接请求公告页面并解析PDF链接或正文
+
+    页面依赖JavaScript渲染（静态HTML中两者都没有）时返回None，由调用方回退到 Playwright。
+    统计命中/未命中/异常次数以观察快速路径覆盖率。
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def resolve(self, url: str) -> Optional[ResolvedNotice]:
+        try:
+            response = await get_http_client().get(url)
+            response.raise_for_status()
+            result = self.parse(response.text, str(response.url))
+        except Exception as e:
+            self.errors += 1
+            logger.info(f"HTTP解析公告页面失败，回退浏览器: {url}, 错误: {str(e)}")
+            return None
+        if result is None:
+            self.misses += 1
+            logger.info(f"静态页面未找到PDF链接或正文，回退浏览器: {url}")
+            return None
+        self.hits += 1
+        return result
+
+    @staticmethod
+    def parse(html: str, base_url: str) -> Optional[ResolvedNotice]:
+        parser = _NoticePageParser()
+        parser.feed(html)
+        parser.close()
+        if parser.pdf_href:
+            pdf_url = urljoin(base_url, parser.pdf_href.strip()).split('?')[0]  # 移除查询参数
+            if pdf_url.endswith('.pdf'):
+                return ResolvedNotice(pdf_url=pdf_url)
+        text = parser.content_text if parser.content_found else ""
+        if text:
+            return ResolvedNotice(text=text)
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses + self.errors
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+notice_resolver = NoticeHttpResolver()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from ..core.config import settings
+from .announcement_service import announcement_service
+from .subscription_service import subscription_service
+from .summary_jobs import summary_job_manager
+
+logger = logging.getLogger(__name__)
+
+
+class NoticeWatcher:
+    """盘中公告监听
+
+    定期拉取当天全市场公告，与已见过的公告比对，仅为有新公告的已订阅股票提交总结任务。
+    - 有界队列 + 固定数量工作协程提供背压：队列满或处于冷却期的股票留待下轮轮询
+    - 同一股票两次触发间隔不少于 notice_watch_cooldown_seconds
+    - 公告集合指纹与已保存总结一致时（如已被定时任务或手动刷新覆盖）不提交任务
+    """
+
+    def __init__(
+        self,
+        interval_seconds: Optional[float] = None,
+        cooldown_seconds: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        self.interval_seconds = float(
+            interval_seconds if interval_seconds is not None else settings.notice_watch_interval_seconds
+        )
+        self.cooldown_seconds = float(
+            cooldown_seconds if cooldown_seconds is not None else settings.notice_watch_cooldown_seconds
+        )
+        self.queue_size = max(1, int(queue_size if queue_size is not None else settings.notice_watch_queue_size))
+        self.workers = max(1, int(workers if workers is not None else settings.notice_watch_workers))
+        self._queue: Optional[asyncio.Queue] = None
+        self._day = ""
+        self._seen: Dict[str, Set[str]] = {}
+        self._deferred: Set[str] = set()
+        self._queued: Set[str] = set()
+        self._last_triggered: Dict[str, float] = {}
+        self.polls = 0
+        self.triggered = 0
+        self.unchanged = 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now().strftime('%Y%m%d')
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    async def poll_once(self) -> List[str]:
+        """轮询一次当天公告，返回本轮加入刷新队列的股票代码"""
+        loop = asyncio.get_running_loop()
+        today = self._today()
+        if today != self._day:
+            self._day, self._seen = today, {}
+
+        # 先入库再比对，保证后续总结能读到新公告；同步失败时本轮不比对，下轮重试
+        if not await announcement_service.sync_day(today):
+            logger.warning(f"盘中公告监听：同步 {today} 公告失败，跳过本轮")
+            return []
+        keys = await loop.run_in_executor(None, announcement_service.day_notice_keys, today)
+        changed = set()
+        for code, notice_keys in keys.items():
+            if notice_keys - self._seen.get(code, set()):
+                changed.add(code)
+            self._seen[code] = set(notice_keys)
+
+        subscribed = await loop.run_in_executor(None, subscription_service.subscriber_counts, sorted(changed))
+        candidates = sorted((set(subscribed) | self._deferred) - self._queued)
+        self.polls += 1
+
+        queue = self._get_queue()
+        now = time.monotonic()
+        enqueued = []
+        deferred = set()
+        for code in candidates:
+            last = self._last_triggered.get(code)
+            if (last is not None and now - last < self.cooldown_seconds) or queue.full():
+                deferred.add(code)
+                continue
+            queue.put_nowait(code)
+            self._queued.add(code)
+            self._last_triggered[code] = now
+            enqueued.append(code)
+        self._deferred = deferred
+        if enqueued or deferred:
+            logger.info(f"盘中公告监听：{len(enqueued)} 个股票加入刷新队列，{len(deferred)} 个延后")
+        return enqueued
+
+    async def _worker(self):
+        queue = self._get_queue()
+        while True:
+            code = await queue.get()
+            try:
+                await self._refresh(code)
+            except Exception as e:
+                logger.error(f"盘中刷新 {code} 失败: {str(e)}")
+            finally:
+                self._queued.discard(code)
+                queue.task_done()
+
+    async def _refresh(self, code: str):
+        loop = asyncio.get_running_loop()
+        announcements, complete = await announcement_service.get_window_announcements(code)
+        fingerprint = announcement_service.announcement_fingerprint(announcements.announcements)
+        stored = await loop.run_in_executor(None, subscription_service.get_summary_fingerprint, code)
+        if complete and stored == fingerprint:
+            self.unchanged += 1
+            return
+        job, _ = summary_job_manager.submit(code)
+        self.triggered += 1
+        # 等待任务结束，使工作协程数成为实际刷新并发上限
+        await summary_job_manager.wait(job.job_id)
+
+    async def run(self):
+        """后台监听任务：工作协程消费刷新队列，主循环按间隔轮询"""
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            while True:
+                try:
+                    await self.poll_once()
+                except Exception as e:
+                    logger.exception(f"盘中公告监听异常: {e}")
+                await asyncio.sleep(max(10.0, self.interval_seconds))
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "polls": self.polls,
+            "triggered": self.triggered,
+            "unchanged": self.unchanged,
+            "queued": len(self._queued),
+            "deferred": len(self._deferred),
+        }
+
+
+notice_watcher = NoticeWatcher()
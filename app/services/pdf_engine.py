@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import multiprocessing
+import re
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Optional, Set
+
+import pdfplumber
+from pydantic import BaseModel
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PdfExtractionResult(BaseModel):
+    """PDF正文提取结果与耗时统计"""
+    text: str = ""
+    complete: bool = True
+    pages_parsed: int = 0
+    total_pages: int = 0
+    parse_ms: float = 0.0
+    elapsed_ms: float = 0.0
+
+
+def extract_pdf_text(pdf_bytes: bytes, max_chars: int, max_pages: int) -> Dict:
+    """逐页解析PDF并清洗文本（在工作进程中执行）
+
+    收集到 max_chars 个字符或解析满 max_pages 页即停止。
+    清洗：去除所有空白，避免影响字数统计。
+    """
+    start = time.perf_counter()
+    parts = []
+    collected = 0
+    pages_parsed = 0
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        total_pages = len(pdf.pages)
+        for page in pdf.pages[:max_pages]:
+            text = page.extract_text()
+            page.close()  # 释放页面缓存的解析对象
+            pages_parsed += 1
+            if text:
+                cleaned = re.sub(r"\s+", "", text)
+                parts.append(cleaned)
+                collected += len(cleaned)
+                if collected >= max_chars:
+                    break
+    return {
+        "text": "".join(parts),
+        "complete": pages_parsed >= total_pages,
+        "pages_parsed": pages_parsed,
+        "total_pages": total_pages,
+        "parse_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+class PdfExtractionEngine:
+    """独立进程池的PDF正文提取引擎
+
+    pdfplumber 解析为纯Python的CPU密集操作，放到进程池中避免与事件循环及其他提取争用GIL。
+    - pdf_engine_workers：工作进程数（0 表示退化为线程池，便于调试）
+    - pdf_engine_timeout_seconds：单文档超时，超时后换用新进程池；旧进程池不再接收任务，
+      待其中仍在进行的提取完成（最多再等一个超时周期）后终止，以回收卡住的工作进程
+    - pdf_engine_max_pages：单文档最多解析页数
+    - pdf_engine_max_tasks_per_child：工作进程处理该数量文档后重启，抑制 pdfminer 内存增长
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        max_pages: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None,
+    ):
+        self.workers = max(0, int(workers if workers is not None else settings.pdf_engine_workers))
+        self.timeout_seconds = float(timeout_seconds if timeout_seconds is not None else settings.pdf_engine_timeout_seconds)
+        self.max_pages = max(1, int(max_pages if max_pages is not None else settings.pdf_engine_max_pages))
+        self.max_tasks_per_child = max(1, int(
+            max_tasks_per_child if max_tasks_per_child is not None else settings.pdf_engine_max_tasks_per_child
+        ))
+        self._executor: Optional[Executor] = None
+        # 各进程池中尚未完成的任务，退役时据此等待健康任务完成
+        self._pending: Dict[Executor, Set[Future]] = {}
+        self._retiring: Dict[Executor, asyncio.Task] = {}
+        self.documents = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_parse_ms = 0.0
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.workers == 0:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-engine")
+        else:
+            # max_tasks_per_child 需要 spawn 启动方式
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        logger.info(f"PDF提取引擎已启动: workers={self.workers}")
+
+    def shutdown(self, kill: bool = False):
+        """关闭当前及退役中的进程池；kill=True 时直接终止工作进程"""
+        executor, self._executor = self._executor, None
+        retiring, self._retiring = self._retiring, {}
+        for task in retiring.values():
+            task.cancel()
+        for old in retiring:
+            self._stop_executor(old, kill=True)
+        if executor is not None:
+            self._stop_executor(executor, kill=kill)
+
+    def _stop_executor(self, executor: Executor, kill: bool):
+        self._pending.pop(executor, None)
+        if kill and isinstance(executor, ProcessPoolExecutor):
+            # 卡住的工作进程无法被取消，只能终止
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=not kill, cancel_futures=True)
+
+    def _retire(self, executor: Executor):
+        """换用新进程池；旧进程池中仍在进行的提取继续完成，之后再终止卡住的工作进程"""
+        if self._executor is executor:
+            self._executor = None
+        if executor in self._retiring:
+            return
+        executor.shutdown(wait=False, cancel_futures=False)
+        self._retiring[executor] = asyncio.get_running_loop().create_task(self._reap(executor))
+
+    async def _reap(self, executor: Executor):
+        pending = [asyncio.wrap_future(f) for f in self._pending.get(executor, ()) if not f.done()]
+        if pending:
+            # 健康任务各自受单文档超时约束，多等一个超时周期即可；剩余的即为卡住的任务
+            await asyncio.wait(pending, timeout=self.timeout_seconds)
+        self._retiring.pop(executor, None)
+        self._stop_executor(executor, kill=True)
+
+    async def extract(self, pdf_bytes: bytes, max_chars: int) -> PdfExtractionResult:
+        """提交PDF字节到引擎，返回正文与耗时统计；超时抛出 asyncio.TimeoutError"""
+        self.start()
+        executor = self._executor
+        start = time.perf_counter()
+        try:
+            future = executor.submit(extract_pdf_text, pdf_bytes, max_chars, self.max_pages)
+            pending = self._pending.setdefault(executor, set())
+            pending.add(future)
+            future.add_done_callback(pending.discard)
+            data = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(f"PDF解析超时({self.timeout_seconds:.0f}s)，重建进程池")
+            self._retire(executor)
+            raise
+        except BrokenProcessPool:
+            self.failures += 1
+            logger.error("PDF提取进程池异常退出，重建进程池")
+            self._retire(executor)
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        result = PdfExtractionResult(**data, elapsed_ms=(time.perf_counter() - start) * 1000)
+        self.documents += 1
+        self.total_parse_ms += result.parse_ms
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.workers,
+            "documents": self.documents,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_parse_ms": round(self.total_parse_ms / self.documents, 1) if self.documents else 0.0,
+        }
+
+
+pdf_engine = PdfExtractionEngine()
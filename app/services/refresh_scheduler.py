@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from ..core.config import settings
+from .announcement_service import announcement_service
+from .subscription_service import subscription_service
+
+logger = logging.getLogger(__name__)
+
+REFRESH_OK = "refreshed"
+REFRESH_UNCHANGED = "unchanged"
+REFRESH_SKIPPED = "skipped"
+REFRESH_FAILED = "failed"
+
+
+class CodeRefreshResult(BaseModel):
+    """单个股票代码的刷新结果"""
+    stock_code: str
+    subscribers: int
+    status: str
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class RefreshReport(BaseModel):
+    """一次定时刷新的汇总报告"""
+    started_datetime: str
+    finished_datetime: str = ""
+    wall_ms: float = 0.0
+    total: int = 0
+    refreshed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    failed: int = 0
+    results: List[CodeRefreshResult] = Field(default_factory=list)
+
+
+class _PendingWrites:
+    """一次刷新中待写入的总结与时间戳更新，攒满 subscription_write_batch_size 条后在单个事务中写入"""
+
+    def __init__(self):
+        self.saves: List[Tuple[CodeRefreshResult, Dict, str]] = []
+        self.touches: List[CodeRefreshResult] = []
+
+    async def flush(self, force: bool = False):
+        batch_size = max(1, int(settings.subscription_write_batch_size))
+        loop = asyncio.get_running_loop()
+        if self.saves and (force or len(self.saves) >= batch_size):
+            saves, self.saves = self.saves, []
+            await self._write(
+                loop, [r for r, _, _ in saves],
+                subscription_service.save_summaries, [(r.stock_code, data, fp) for r, data, fp in saves],
+            )
+        if self.touches and (force or len(self.touches) >= batch_size):
+            touches, self.touches = self.touches, []
+            await self._write(loop, touches, subscription_service.touch_summaries, [r.stock_code for r in touches])
+
+    @staticmethod
+    async def _write(loop, results: List[CodeRefreshResult], func, items):
+        try:
+            await loop.run_in_executor(None, func, items)
+        except Exception as e:
+            logger.error(f"批量写入总结失败({len(items)}条): {str(e)}")
+            for r in results:
+                r.status, r.error = REFRESH_FAILED, f"写入失败: {str(e)}"
+
+
+class RefreshScheduler:
+    """订阅总结定时刷新
+
+    - 按订阅反向索引聚合出去重的股票代码，每个代码只总结一次
+    - 按订阅人数降序处理，由 subscription_refresh_concurrency 个工作协程并发执行
+    - 最近 subscription_refresh_fresh_seconds 秒内已刷新的代码跳过
+    - 公告集合指纹与上次总结一致时不调用LLM，仅更新刷新时间
+    - 刷新结果分批写入，减少逐条提交的事务开销
+    - 每次运行结束输出各代码耗时、失败与总耗时报告
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, fresh_seconds: Optional[float] = None):
+        self.concurrency = max(1, int(
+            concurrency if concurrency is not None else settings.subscription_refresh_concurrency
+        ))
+        self.fresh_seconds = float(
+            fresh_seconds if fresh_seconds is not None else settings.subscription_refresh_fresh_seconds
+        )
+        self.last_report: Optional[RefreshReport] = None
+
+    @staticmethod
+    def plan(counts: Dict[str, int]) -> List[Tuple[str, int]]:
+        """(股票代码, 订阅人数)，按订阅人数降序、代码升序"""
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def _is_fresh(self, timestamp: str, now: datetime) -> bool:
+        if not timestamp or self.fresh_seconds <= 0:
+            return False
+        try:
+            updated = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return False
+        if not updated.tzinfo:
+            updated = updated.replace(tzinfo=timezone.utc)
+        return now - updated < timedelta(seconds=self.fresh_seconds)
+
+    async def run(self) -> RefreshReport:
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        report = RefreshReport(started_datetime=now.isoformat())
+        loop = asyncio.get_running_loop()
+        counts = await loop.run_in_executor(None, subscription_service.subscriber_counts)
+        work = self.plan(counts)
+        timestamps = await loop.run_in_executor(
+            None, subscription_service.get_summary_timestamps, [code for code, _ in work]
+        )
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for code, subscribers in work:
+            if self._is_fresh(timestamps.get(code, ""), now):
+                report.results.append(CodeRefreshResult(stock_code=code, subscribers=subscribers, status=REFRESH_SKIPPED))
+            else:
+                queue.put_nowait((code, subscribers))
+
+        writes = _PendingWrites()
+
+        async def worker():
+            while True:
+                try:
+                    code, subscribers = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                report.results.append(await self._refresh_code(code, subscribers, writes))
+                await writes.flush()
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, queue.qsize()))))
+        await writes.flush(force=True)
+
+        report.total = len(work)
+        report.refreshed = sum(1 for r in report.results if r.status == REFRESH_OK)
+        report.unchanged = sum(1 for r in report.results if r.status == REFRESH_UNCHANGED)
+        report.skipped = sum(1 for r in report.results if r.status == REFRESH_SKIPPED)
+        report.failed = sum(1 for r in report.results if r.status == REFRESH_FAILED)
+        report.wall_ms = (time.perf_counter() - start) * 1000
+        report.finished_datetime = datetime.now(timezone.utc).isoformat()
+        self.last_report = report
+        self._log_report(report)
+        return report
+
+    async def _refresh_code(self, code: str, subscribers: int, writes: "_PendingWrites") -> CodeRefreshResult:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        result = CodeRefreshResult(stock_code=code, subscribers=subscribers, status=REFRESH_OK)
+        try:
+            # 增量刷新：公告窗口完整且集合未变化则沿用已有总结
+            announcements, complete = await announcement_service.get_window_announcements(code)
+            fingerprint = announcement_service.announcement_fingerprint(announcements.announcements)
+            stored = await loop.run_in_executor(None, subscription_service.get_summary_fingerprint, code)
+            if complete and stored == fingerprint:
+                result.status = REFRESH_UNCHANGED
+                writes.touches.append(result)
+            else:
+                summary, fingerprint = await announcement_service.summarize_with_fingerprint(code)
+                writes.saves.append((result, summary, fingerprint))
+        except Exception as e:
+            result.status, result.error = REFRESH_FAILED, getattr(e, "message", None) or str(e)
+            logger.error(f"生成 {code} 公告总结失败: {result.error}")
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    @staticmethod
+    def _log_report(report: RefreshReport):
+        for r in sorted(report.results, key=lambda r: -r.duration_ms):
+            if r.status in (REFRESH_OK, REFRESH_FAILED):
+                logger.info(
+                    f"刷新 {r.stock_code}: {r.status}, 订阅 {r.subscribers} 人, 耗时 {r.duration_ms:.0f}ms"
+                    + (f", 错误: {r.error}" if r.error else "")
+                )
+        logger.info(
+            f"定时刷新完成：共 {report.total} 个代码，刷新 {report.refreshed}，无新公告 {report.unchanged}，"
+            f"跳过 {report.skipped}，失败 {report.failed}，总耗时 {report.wall_ms / 1000:.1f}s"
+        )
+
+    def stats(self) -> Dict:
+        if self.last_report is None:
+            return {}
+        return self.last_report.model_dump(exclude={"results"})
+
+
+refresh_scheduler = RefreshScheduler()
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from ..core.config import settings
+
+
+class SQLiteConnectionPool:
+    """线程本地复用的SQLite连接
+
+    - 每个线程（事件循环线程与各执行器线程）持有一条长连接，避免每次调用重新打开数据库
+    - WAL 日志模式：读不阻塞写，执行器线程并发读写安全
+    - synchronous=NORMAL（WAL 下仍保证一致性）、可配置的页缓存与语句缓存（预编译语句复用）
+    - busy_timeout：写锁竞争时等待而不是立即报错
+    - setup：首次取得连接时执行一次的建表/迁移回调，导入模块与创建实例时不触碰数据库文件
+    """
+
+    def __init__(self, db_path: str, setup: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_path = db_path
+        self._setup = setup
+        self._ready = setup is None
+        self._setup_lock = threading.Lock()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=float(settings.sqlite_busy_timeout_seconds),
+            check_same_thread=False,
+            cached_statements=max(0, int(settings.sqlite_cached_statements)),
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{max(0, int(settings.sqlite_cache_size_kb))}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        if not self._ready:
+            self._run_setup(conn)
+        return conn
+
+    def _run_setup(self, conn: sqlite3.Connection):
+        with self._setup_lock:
+            if self._ready:
+                return
+            try:
+                self._setup(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            self._ready = True
+
+    @contextmanager
+    def connect(self):
+        """取得当前线程的连接；退出时回滚未提交的事务（异常或遗漏提交），避免复用的连接持有写锁
+
+        同一线程嵌套使用时只在最外层退出时回滚遗留事务。
+        """
+        conn = self.connection()
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            if depth == 0 and conn.in_transaction:
+                conn.rollback()
+        finally:
+            self._local.depth = depth
+
+    @contextmanager
+    def transaction(self):
+        """在单个事务中执行多条写入，成功提交、异常回滚"""
+        with self.connect() as conn:
+            yield conn
+            conn.commit()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
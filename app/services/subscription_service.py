@@ -4,14 +4,18 @@ import json
 import sqlite3
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import List, Tuple, Set, Dict
+from typing import List, Tuple, Dict, Optional
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "data")
+from ..core.config import settings
+from .lru import LRUCache
+from .sqlite_pool import SQLiteConnectionPool
+
+DATA_DIR = settings.data_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "data")
 DB_PATH = os.path.abspath(os.path.join(DATA_DIR, "subscriptions.db"))
+# 旧版按代码存放的总结JSON目录，仅用于迁移到数据库
 SUMMARY_DIR = os.path.abspath(os.path.join(DATA_DIR, "summaries"))
-
-os.makedirs(os.path.abspath(DATA_DIR), exist_ok=True)
-os.makedirs(SUMMARY_DIR, exist_ok=True)
+# 旧版总结结果中携带的公告集合指纹字段（现仅存于表字段）
+FINGERPRINT_FIELD = "announcement_fingerprint"
 
 
 class SubscriptionService:
@@ -19,40 +23,136 @@ class SubscriptionService:
 
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
-        # 任务11：若数据库文件已存在则跳过初始化
-        if not os.path.exists(self.db_path):
-            self._init_db()
+        # 线程本地长连接（WAL），各方法可在执行器线程中安全调用；首次访问数据库时才建表与迁移
+        self._db = SQLiteConnectionPool(self.db_path, setup=self._setup)
+        # 微信查询热点读缓存（LRU）：总结正文、总结更新时间、用户订阅列表；写入时按键精确失效
+        self._text_cache = LRUCache(settings.subscription_read_cache_size)
+        self._timestamp_cache = LRUCache(settings.subscription_read_cache_size)
+        self._user_codes_cache = LRUCache(settings.subscription_read_cache_size)
 
-    def _init_db(self):
-        with self._conn() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS subscriptions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    from_user TEXT NOT NULL UNIQUE,
-                    stock_code_list TEXT NOT NULL DEFAULT '[]',
-                    updated_datetime TEXT
-                )
-                """
+    def _setup(self, conn: sqlite3.Connection):
+        # 任务11：若数据库已初始化则跳过建表
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='subscriptions'").fetchone():
+            self._init_db(conn)
+        self._migrate(conn)
+
+    def _init_db(self, conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_user TEXT NOT NULL UNIQUE,
+                stock_code_list TEXT NOT NULL DEFAULT '[]',
+                updated_datetime TEXT
             )
-            # 新增：每个股票代码对应的最近 summary 更新时间（全局，不按用户区分）
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS subscription_summaries (
-                    stock_code TEXT PRIMARY KEY,
-                    summary_updated_datetime TEXT
-                )
-                """
+            """
+        )
+        # 新增：每个股票代码对应的最近 summary 更新时间（全局，不按用户区分）
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscription_summaries (
+                stock_code TEXT PRIMARY KEY,
+                summary_updated_datetime TEXT,
+                announcement_fingerprint TEXT
             )
-            conn.commit()
+            """
+        )
+        conn.commit()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """按 PRAGMA user_version 顺序执行未应用的结构迁移（原地升级已有数据库）"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, step in enumerate(self._MIGRATIONS, start=1):
+            if version < target:
+                step(self, conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+
+    def _migrate_v1(self, conn: sqlite3.Connection):
+        # 生成当前总结所依据的公告集合指纹，用于增量刷新
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(subscription_summaries)")}
+        if "announcement_fingerprint" not in columns:
+            conn.execute("ALTER TABLE subscription_summaries ADD COLUMN announcement_fingerprint TEXT")
+
+    def _migrate_v2(self, conn: sqlite3.Connection):
+        # 订阅关系拆为 (用户, 股票代码) 行：主键覆盖 用户->代码，反向索引覆盖 代码->用户
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscription_codes (
+                from_user TEXT NOT NULL,
+                stock_code TEXT NOT NULL,
+                created_datetime TEXT,
+                PRIMARY KEY (from_user, stock_code)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_subscription_codes_code ON subscription_codes(stock_code, from_user)"
+        )
+        # 将 stock_code_list JSON 迁入新表，之后该列不再使用
+        now = self._now_iso()
+        for from_user, lst in conn.execute("SELECT from_user, stock_code_list FROM subscriptions").fetchall():
+            try:
+                codes = json.loads(lst)
+            except Exception:
+                codes = []
+            if not isinstance(codes, list):
+                continue
+            conn.executemany(
+                "INSERT OR IGNORE INTO subscription_codes(from_user, stock_code, created_datetime) VALUES(?,?,?)",
+                [(from_user, code, now) for code in {self._normalize_code(str(c)) for c in codes} if code],
+            )
+        conn.execute("UPDATE subscriptions SET stock_code_list='[]'")
+
+    def _migrate_v3(self, conn: sqlite3.Connection):
+        # 总结正文入库：summary_versions 保存历史版本，subscription_summaries.latest_version_id 指向当前版本
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summary_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stock_code TEXT NOT NULL,
+                content TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL,
+                announcement_fingerprint TEXT,
+                created_datetime TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_versions_code ON summary_versions(stock_code, id)")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(subscription_summaries)")}
+        if "latest_version_id" not in columns:
+            conn.execute("ALTER TABLE subscription_summaries ADD COLUMN latest_version_id INTEGER")
+        # 迁移旧版 summaries/*.json（保留原文件，确认无误后可手动删除）
+        if not os.path.isdir(SUMMARY_DIR):
+            return
+        timestamps = dict(conn.execute("SELECT stock_code, summary_updated_datetime FROM subscription_summaries"))
+        for fname in sorted(os.listdir(SUMMARY_DIR)):
+            stock_code, ext = os.path.splitext(fname)
+            if ext != ".json":
+                continue
+            path = os.path.join(SUMMARY_DIR, fname)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            if not isinstance(data, dict):
+                continue
+            created = timestamps.get(stock_code) or datetime.fromtimestamp(
+                os.path.getmtime(path), tz=timezone.utc
+            ).isoformat()
+            fingerprint = data.pop(FINGERPRINT_FIELD, None) or ""
+            self._write_version(conn, stock_code, data, fingerprint, created)
+
+    _MIGRATIONS = (_migrate_v1, _migrate_v2, _migrate_v3)
 
     @contextmanager
     def _conn(self):
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._db.connect() as conn:
             yield conn
-        finally:
-            conn.close()
+
+    def close(self):
+        self._db.close_all()
 
     @staticmethod
     def _now_iso() -> str:
@@ -63,122 +163,244 @@ class SubscriptionService:
         code = (code or "").strip()
         return code if len(code) == 6 and code.isdigit() else ""
 
-    def _get_codes(self, conn: sqlite3.Connection, from_user: str) -> Set[str]:
-        cur = conn.execute(
-            "SELECT stock_code_list FROM subscriptions WHERE from_user=?",
-            (from_user,),
+    def _touch_user(self, conn: sqlite3.Connection, from_user: str):
+        conn.execute(
+            "INSERT INTO subscriptions(from_user, updated_datetime) VALUES(?,?)\n             ON CONFLICT(from_user) DO UPDATE SET updated_datetime=excluded.updated_datetime",
+            (from_user, self._now_iso()),
         )
-        row = cur.fetchone()
-        if not row:
-            return set()
-        try:
-            data = json.loads(row[0])
-            return set(data) if isinstance(data, list) else set()
-        except Exception:
-            return set()
 
     def add_code(self, from_user: str, code: str) -> Tuple[bool, str]:
         code = self._normalize_code(code)
         if not code:
             return False, "股票代码格式不正确，应为6位数字"
-        with self._conn() as conn:
-            codes = self._get_codes(conn, from_user)
-            if code in codes:
-                return True, f"{code} 已在订阅列表"
-            codes.add(code)
-            payload = json.dumps(sorted(list(codes)))
-            conn.execute(
-                "INSERT INTO subscriptions(from_user, stock_code_list, updated_datetime) VALUES(?,?,?)\n                 ON CONFLICT(from_user) DO UPDATE SET stock_code_list=excluded.stock_code_list, updated_datetime=excluded.updated_datetime",
-                (from_user, payload, self._now_iso()),
+        # 已订阅时同样提交（空事务），不让复用的连接持有写锁
+        with self._db.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO subscription_codes(from_user, stock_code, created_datetime) VALUES(?,?,?)",
+                (from_user, code, self._now_iso()),
             )
-            conn.commit()
-            return True, f"已订阅 {code}"
+            if cur.rowcount == 0:
+                return True, f"{code} 已在订阅列表"
+            self._touch_user(conn, from_user)
+        self._user_codes_cache.invalidate([from_user])
+        return True, f"已订阅 {code}"
 
     def del_code(self, from_user: str, code: str) -> Tuple[bool, str]:
         code = self._normalize_code(code)
         if not code:
             return False, "股票代码格式不正确，应为6位数字"
-        with self._conn() as conn:
-            codes = self._get_codes(conn, from_user)
-            if code not in codes:
-                return True, f"{code} 不在订阅列表"
-            codes.remove(code)
-            payload = json.dumps(sorted(list(codes)))
-            conn.execute(
-                "INSERT INTO subscriptions(from_user, stock_code_list, updated_datetime) VALUES(?,?,?)\n                 ON CONFLICT(from_user) DO UPDATE SET stock_code_list=excluded.stock_code_list, updated_datetime=excluded.updated_datetime",
-                (from_user, payload, self._now_iso()),
+        with self._db.transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM subscription_codes WHERE from_user=? AND stock_code=?",
+                (from_user, code),
             )
-            conn.commit()
-            return True, f"已取消订阅 {code}"
+            if cur.rowcount == 0:
+                return True, f"{code} 不在订阅列表"
+            self._touch_user(conn, from_user)
+        self._user_codes_cache.invalidate([from_user])
+        return True, f"已取消订阅 {code}"
 
     def list_codes(self, from_user: str) -> List[str]:
+        return list(self._user_codes_cache.get_or_load(from_user, lambda: self._load_codes(from_user)))
+
+    def _load_codes(self, from_user: str) -> Tuple[str, ...]:
         with self._conn() as conn:
-            return sorted(list(self._get_codes(conn, from_user)))
+            cur = conn.execute(
+                "SELECT stock_code FROM subscription_codes WHERE from_user=? ORDER BY stock_code",
+                (from_user,),
+            )
+            return tuple(row[0] for row in cur.fetchall())
 
     def all_rows(self) -> List[Tuple[str, List[str]]]:
+        """全部 (用户, 订阅代码列表)；大量用户时请使用下方按代码聚合/分页的接口"""
+        rows: Dict[str, List[str]] = {}
         with self._conn() as conn:
-            cur = conn.execute("SELECT from_user, stock_code_list FROM subscriptions")
-            rows = []
-            for from_user, lst in cur.fetchall():
-                try:
-                    codes = json.loads(lst)
-                except Exception:
-                    codes = []
-                if isinstance(codes, list):
-                    rows.append((from_user, codes))
-            return rows
+            cur = conn.execute("SELECT from_user, stock_code FROM subscription_codes ORDER BY from_user, stock_code")
+            for from_user, code in cur.fetchall():
+                rows.setdefault(from_user, []).append(code)
+        return list(rows.items())
 
-    def touch(self, from_user: str):
+    def subscriber_counts(self, codes: Optional[List[str]] = None) -> Dict[str, int]:
+        """各股票代码的订阅人数；codes 为空时返回全部被订阅的代码"""
         with self._conn() as conn:
+            if codes is None:
+                cur = conn.execute("SELECT stock_code, COUNT(*) FROM subscription_codes GROUP BY stock_code")
+            elif not codes:
+                return {}
+            else:
+                placeholders = ",".join(["?"] * len(codes))
+                cur = conn.execute(
+                    f"SELECT stock_code, COUNT(*) FROM subscription_codes WHERE stock_code IN ({placeholders}) GROUP BY stock_code",
+                    codes,
+                )
+            return {code: count for code, count in cur.fetchall()}
+
+    def subscribers_of(self, stock_code: str, after: str = "", limit: int = 500) -> List[str]:
+        """订阅某代码的用户，按用户ID键集分页：传入上一页最后一个用户作为 after"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "SELECT from_user FROM subscription_codes WHERE stock_code=? AND from_user>? ORDER BY from_user LIMIT ?",
+                (stock_code, after, limit),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def list_subscriptions(
+        self, after: Tuple[str, str] = ("", ""), limit: int = 500, codes: Optional[List[str]] = None
+    ) -> List[Tuple[str, str]]:
+        """分页列出 (用户, 股票代码)，按 (用户, 代码) 键集分页：传入上一页最后一行作为 after；codes 限定股票范围"""
+        sql = "SELECT from_user, stock_code FROM subscription_codes WHERE (from_user, stock_code) > (?, ?)"
+        params: List = [after[0], after[1]]
+        if codes is not None:
+            if not codes:
+                return []
+            sql += f" AND stock_code IN ({','.join(['?'] * len(codes))})"
+            params.extend(codes)
+        with self._conn() as conn:
+            cur = conn.execute(sql + " ORDER BY from_user, stock_code LIMIT ?", (*params, limit))
+            return [(u, c) for u, c in cur.fetchall()]
+
+    def touch(self, from_user: str):
+        with self._db.transaction() as conn:
             conn.execute(
                 "UPDATE subscriptions SET updated_datetime=? WHERE from_user=?",
                 (self._now_iso(), from_user),
             )
-            conn.commit()
-
-    def summary_path(self, stock_code: str) -> str:
-        fname = f"{stock_code}.json"
-        return os.path.join(SUMMARY_DIR, fname)
-
-    def save_summary(self, stock_code: str, data: Dict):
-        # 保存总结文件
-        path = self.summary_path(stock_code)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        # 更新 summary 更新时间
-        with self._conn() as conn:
-            conn.execute(
-                "INSERT INTO subscription_summaries(stock_code, summary_updated_datetime) VALUES(?,?)\n                 ON CONFLICT(stock_code) DO UPDATE SET summary_updated_datetime=excluded.summary_updated_datetime",
-                (stock_code, self._now_iso()),
+
+    def save_summary(self, stock_code: str, data: Dict, fingerprint: str = ""):
+        self.save_summaries([(stock_code, data, fingerprint)])
+
+    @staticmethod
+    def _summary_text(data: Dict) -> str:
+        # 兼容不同字段名
+        return data.get("content") or data.get("summary") or json.dumps(data, ensure_ascii=False)
+
+    @staticmethod
+    def _load_payload(payload: str) -> Dict:
+        # 早期版本把公告集合指纹写进了总结结果，读取时去掉
+        data = json.loads(payload)
+        data.pop(FINGERPRINT_FIELD, None)
+        return data
+
+    def _write_version(self, conn: sqlite3.Connection, stock_code: str, data: Dict, fingerprint: str, created: str):
+        """写入一个总结版本并将其设为当前版本，超出保留数的旧版本删除（需在事务中调用）
+
+        公告集合指纹只记录在表字段中，不写入总结结果；空指纹表示本次总结有公告失败，下次刷新需重新总结。
+        """
+        cur = conn.execute(
+            "INSERT INTO summary_versions(stock_code, content, payload, announcement_fingerprint, created_datetime) VALUES(?,?,?,?,?)",
+            (
+                stock_code,
+                self._summary_text(data),
+                json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+                fingerprint or None,
+                created,
+            ),
+        )
+        conn.execute(
+            "INSERT INTO subscription_summaries(stock_code, summary_updated_datetime, announcement_fingerprint, latest_version_id) VALUES(?,?,?,?)\n             ON CONFLICT(stock_code) DO UPDATE SET summary_updated_datetime=excluded.summary_updated_datetime, announcement_fingerprint=excluded.announcement_fingerprint, latest_version_id=excluded.latest_version_id",
+            (stock_code, created, fingerprint or None, cur.lastrowid),
+        )
+        keep = max(1, int(settings.summary_history_keep))
+        conn.execute(
+            "DELETE FROM summary_versions WHERE stock_code=? AND id NOT IN "
+            "(SELECT id FROM summary_versions WHERE stock_code=? ORDER BY id DESC LIMIT ?)",
+            (stock_code, stock_code, keep),
+        )
+
+    def save_summaries(self, items: List[Tuple[str, Dict, str]]):
+        """批量保存 (代码, 总结, 公告集合指纹)：正文版本、更新时间与指纹在单个事务中原子写入"""
+        if not items:
+            return
+        now = self._now_iso()
+        with self._db.transaction() as conn:
+            for stock_code, data, fingerprint in items:
+                self._write_version(conn, stock_code, data, fingerprint, now)
+        codes = [stock_code for stock_code, _, _ in items]
+        self._text_cache.invalidate(codes)
+        self._timestamp_cache.invalidate(codes)
+
+    def touch_summary(self, stock_code: str):
+        """公告集合未变化时仅更新 summary 更新时间"""
+        self.touch_summaries([stock_code])
+
+    def touch_summaries(self, stock_codes: List[str]):
+        if not stock_codes:
+            return
+        now = self._now_iso()
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "UPDATE subscription_summaries SET summary_updated_datetime=? WHERE stock_code=?",
+                [(now, stock_code) for stock_code in stock_codes],
             )
-            conn.commit()
+        self._timestamp_cache.invalidate(stock_codes)
+
+    def get_summary_fingerprint(self, stock_code: str) -> str:
+        """当前总结所依据的公告集合指纹；无记录返回空串"""
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT announcement_fingerprint FROM subscription_summaries WHERE stock_code=?",
+                (stock_code,),
+            ).fetchone()
+            return (row[0] or "") if row else ""
 
     def load_summary_text(self, stock_code: str) -> str:
-        path = self.summary_path(stock_code)
-        if not os.path.exists(path):
-            return ""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                obj = json.load(f)
-            # 兼容不同字段名
-            return obj.get("content") or obj.get("summary") or json.dumps(obj, ensure_ascii=False)
-        except Exception:
-            return ""
+        return self._text_cache.get_or_load(stock_code, lambda: self._read_summary_text(stock_code))
+
+    def _read_summary_text(self, stock_code: str) -> str:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT v.content FROM subscription_summaries s JOIN summary_versions v ON v.id = s.latest_version_id "
+                "WHERE s.stock_code=?",
+                (stock_code,),
+            ).fetchone()
+            return row[0] if row else ""
+
+    def get_summary(self, stock_code: str) -> Optional[Dict]:
+        """当前版本的完整总结结果"""
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT v.payload FROM subscription_summaries s JOIN summary_versions v ON v.id = s.latest_version_id "
+                "WHERE s.stock_code=?",
+                (stock_code,),
+            ).fetchone()
+            return self._load_payload(row[0]) if row else None
+
+    def summary_history(self, stock_code: str, limit: int = 10) -> List[Dict]:
+        """历史总结版本（新到旧），每项含 created_datetime 与 data"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "SELECT created_datetime, payload FROM summary_versions WHERE stock_code=? ORDER BY id DESC LIMIT ?",
+                (stock_code, limit),
+            )
+            return [
+                {"created_datetime": created, "data": self._load_payload(payload)} for created, payload in cur.fetchall()
+            ]
 
     def get_summary_timestamps(self, codes: List[str]) -> Dict[str, str]:
         if not codes:
             return {}
+        cached = self._timestamp_cache.get_many_or_load(codes, self._read_summary_timestamps)
+        return {code: ts for code, ts in cached.items() if ts is not None}
+
+    def _read_summary_timestamps(self, codes: List[str]) -> Dict[str, Optional[str]]:
+        """读取更新时间；无记录的代码为 None（同样缓存，避免反复查询未刷新过的代码）"""
         placeholders = ",".join(["?"] * len(codes))
+        mapping: Dict[str, Optional[str]] = {code: None for code in codes}
         with self._conn() as conn:
             cur = conn.execute(
                 f"SELECT stock_code, summary_updated_datetime FROM subscription_summaries WHERE stock_code IN ({placeholders})",
                 codes,
             )
-            mapping = {}
             for sc, ts in cur.fetchall():
                 mapping[sc] = ts or ""
-            return mapping
+        return mapping
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "summary_text": self._text_cache.stats(),
+            "summary_timestamp": self._timestamp_cache.stats(),
+            "user_codes": self._user_codes_cache.stats(),
+        }
 
 
 subscription_service = SubscriptionService()
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from .announcement_archive import ANNOUNCEMENT_DB_PATH
+
+
+class SummaryCache:
+    """单条公告LLM总结的持久化缓存
+
+    键为 (公告标识, 正文哈希, 模型, 提示词版本)：正文、模型或提示词任一变化都会重新总结，
+    否则在多次刷新之间复用，刷新时只需为新公告调用LLM。
+    """
+
+    def __init__(self, db_path: str = ANNOUNCEMENT_DB_PATH):
+        self.db_path = db_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _init_db(self):
+        """首次访问时建表；导入模块与创建实例时不触碰数据库文件"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS announcement_summaries (
+                        announcement_key TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        prompt_version TEXT NOT NULL,
+                        summary TEXT NOT NULL,
+                        created_datetime TEXT,
+                        PRIMARY KEY (announcement_key, content_hash, model, prompt_version)
+                    )
+                    """
+                )
+                conn.commit()
+            self._initialized = True
+
+    @contextmanager
+    def _conn(self):
+        self._init_db()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, announcement_key: str, content_hash: str, model: str, prompt_version: str) -> Optional[str]:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT summary FROM announcement_summaries\n                 WHERE announcement_key=? AND content_hash=? AND model=? AND prompt_version=?",
+                (announcement_key, content_hash, model, prompt_version),
+            ).fetchone()
+            return row[0] if row else None
+
+    def put(self, announcement_key: str, content_hash: str, model: str, prompt_version: str, summary: str):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO announcement_summaries(announcement_key, content_hash, model, prompt_version, summary, created_datetime)\n                 VALUES(?,?,?,?,?,?)\n                 ON CONFLICT(announcement_key, content_hash, model, prompt_version) DO UPDATE SET summary=excluded.summary, created_datetime=excluded.created_datetime",
+                (announcement_key, content_hash, model, prompt_version, summary,
+                 datetime.now(timezone.utc).isoformat()),
+            )
+            conn.commit()
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from ..core.config import settings
+from .announcement_service import announcement_service
+from .subscription_service import subscription_service
+from .wechat_push import wechat_push
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class SummaryJob(BaseModel):
+    """公告总结后台任务"""
+    job_id: str
+    stock_code: str
+    status: str = JOB_QUEUED
+    created_datetime: str
+    started_datetime: Optional[str] = None
+    finished_datetime: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+    notify_users: List[str] = Field(default_factory=list)
+
+
+class SummaryJobManager:
+    """公告总结任务管理
+
+    - submit 立即返回任务ID，总结在后台协程中执行
+    - 同一股票代码已有排队/执行中的任务时直接返回该任务（合并重复提交）
+    - 后台并发数受 summary_job_concurrency 限制
+    - 成功结果写入 SubscriptionService.save_summary 缓存；任务记录在内存中保留 summary_job_retention_seconds 秒
+    - 提交时指定 notify_user 的用户在任务结束后通过客服消息收到结果（合并提交时累加）
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, retention_seconds: Optional[float] = None):
+        self.concurrency = max(1, int(concurrency if concurrency is not None else settings.summary_job_concurrency))
+        self.retention_seconds = float(
+            retention_seconds if retention_seconds is not None else settings.summary_job_retention_seconds
+        )
+        self._jobs: Dict[str, SummaryJob] = {}
+        self._finished_ts: Dict[str, float] = {}
+        self._active: Dict[str, str] = {}  # stock_code -> job_id
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def submit(self, stock_code: str, notify_user: Optional[str] = None) -> Tuple[SummaryJob, bool]:
+        """提交总结任务，返回 (任务, 是否新建)；需在事件循环中调用"""
+        self._prune()
+        job_id = self._active.get(stock_code)
+        if job_id is not None:
+            job = self._jobs[job_id]
+            if notify_user and notify_user not in job.notify_users:
+                job.notify_users.append(notify_user)
+            return job, False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        job = SummaryJob(
+            job_id=uuid.uuid4().hex,
+            stock_code=stock_code,
+            created_datetime=self._now_iso(),
+            notify_users=[notify_user] if notify_user else [],
+        )
+        self._jobs[job.job_id] = job
+        self._active[stock_code] = job.job_id
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"总结任务已提交: {stock_code}, job_id={job.job_id}")
+        return job, True
+
+    def get(self, job_id: str) -> Optional[SummaryJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[SummaryJob]:
+        """等待任务结束（测试与同步调用方使用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in (JOB_SUCCEEDED, JOB_FAILED):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(0.05)
+
+    async def _run(self, job: SummaryJob):
+        try:
+            async with self._semaphore:
+                job.status = JOB_RUNNING
+                job.started_datetime = self._now_iso()
+                result, fingerprint = await announcement_service.summarize_with_fingerprint(job.stock_code)
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None, subscription_service.save_summary, job.stock_code, result, fingerprint
+                )
+                job.result = result
+                job.status = JOB_SUCCEEDED
+                logger.info(f"总结任务完成: {job.stock_code}, job_id={job.job_id}")
+        except asyncio.CancelledError:
+            job.status = JOB_FAILED
+            job.error = "任务已取消"
+            raise
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = getattr(e, "message", None) or str(e)
+            logger.error(f"总结任务失败: {job.stock_code}, job_id={job.job_id}, 错误: {job.error}")
+        finally:
+            job.finished_datetime = self._now_iso()
+            self._finished_ts[job.job_id] = time.monotonic()
+            if self._active.get(job.stock_code) == job.job_id:
+                del self._active[job.stock_code]
+        await self._notify(job)
+
+    async def _notify(self, job: SummaryJob):
+        """将任务结果写入客服消息发件箱，由推送服务异步投递"""
+        if not job.notify_users:
+            return
+        if job.status == JOB_SUCCEEDED:
+            text = (job.result or {}).get("content") or (job.result or {}).get("summary") or ""
+            content = f"{job.stock_code} 公告总结已更新\n\n{text}"
+        else:
+            content = f"{job.stock_code} 刷新失败: {job.error}"
+        loop = asyncio.get_running_loop()
+        for user in job.notify_users:
+            try:
+                await loop.run_in_executor(
+                    None, wechat_push.enqueue, user, content, f"job:{job.job_id}:{user}"
+                )
+            except Exception as e:
+                logger.error(f"写入推送发件箱失败: {user}, job_id={job.job_id}, 错误: {str(e)}")
+
+    def _prune(self):
+        """清理超过保留期的已结束任务"""
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id, finished in list(self._finished_ts.items()):
+            if finished < cutoff:
+                self._finished_ts.pop(job_id, None)
+                self._jobs.pop(job_id, None)
+
+    async def shutdown(self):
+        """取消所有进行中的任务"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+summary_job_manager = SummaryJobManager()
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from ..core.config import settings
+from ..core.exceptions import StockAPIException
+from ..core.ratelimit import TokenBucket
+from .sqlite_pool import SQLiteConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = settings.data_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "data")
+OUTBOX_DB_PATH = os.path.abspath(os.path.join(DATA_DIR, "wechat_outbox.db"))
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+# access_token 失效/过期：清除缓存后重新获取
+_TOKEN_ERRCODES = {40001, 40014, 42001}
+# 重试无意义的错误：openid 无效、用户超过48小时未互动、用户拒收
+_PERMANENT_ERRCODES = {40003, 45015, 45047, 43004}
+
+
+class WeChatAPIError(StockAPIException):
+    """微信接口调用失败"""
+
+    def __init__(self, message: str, errcode: Optional[int] = None):
+        self.errcode = errcode
+        super().__init__(message, "WECHAT_API_ERROR")
+
+
+class WeChatPushService:
+    """微信客服消息推送
+
+    - 待发送消息写入 SQLite 发件箱（独立于 subscriptions.db），进程重启后继续投递
+    - dedupe_key 唯一：同一业务消息重复入队只保留一条
+    - access_token 缓存，到期前 wechat_token_refresh_margin_seconds 秒或接口报告失效时重新获取
+    - 全局按 wechat_push_qps 令牌桶限流；同一用户两条消息间隔不少于 wechat_push_user_interval_seconds
+    - 发送失败（含非预期异常）按指数退避重试，最多 wechat_push_max_attempts 次；openid 无效等错误不重试
+    - 领取以 status='pending' 为条件逐条更新，多个投递进程不会领取同一条消息
+    - 发送中（sending）的消息超过 wechat_push_lease_seconds 未确认时（进程中途退出）计一次尝试并重新排期，
+      启动时及每轮投递前检查；极少数情况下可能重复推送一次
+    - 已发送/已失败消息保留 wechat_push_retention_seconds 秒后清理（启动后首轮即执行，之后每小时一次）
+    """
+
+    def __init__(self, db_path: str = OUTBOX_DB_PATH, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.db_path = db_path
+        # 首次访问发件箱时才建表
+        self._db = SQLiteConnectionPool(self.db_path, setup=self._init_db)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._qps_bucket = TokenBucket(rate=settings.wechat_push_qps, capacity=max(1.0, settings.wechat_push_qps))
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._user_next_ts: Dict[str, float] = {}
+        self._last_prune: Optional[float] = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.deferred = 0
+        self.token_refreshes = 0
+
+    @staticmethod
+    def _init_db(conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS wechat_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedupe_key TEXT UNIQUE,
+                to_user TEXT NOT NULL,
+                content TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_ts REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_datetime TEXT NOT NULL,
+                updated_datetime TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_wechat_outbox_due ON wechat_outbox(status, next_attempt_ts)"
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.wechat_push_enabled and settings.wechat_app_id and settings.wechat_app_secret)
+
+    @staticmethod
+    def _now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.wechat_api_base_url,
+                timeout=httpx.Timeout(float(settings.wechat_push_timeout_seconds)),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._db.close_all()
+
+    # ---- 发件箱 ----
+
+    def transaction(self):
+        """发件箱数据库事务，供调用方在同一事务中写入消息与自身状态"""
+        return self._db.transaction()
+
+    def insert_messages(self, conn: sqlite3.Connection, items: Iterable[Tuple[str, str, Optional[str]]]) -> int:
+        """在给定事务中写入 (用户, 内容, dedupe_key)，返回新增条数（dedupe_key 已存在的忽略）"""
+        now_iso = self._now_iso()
+        now = time.time()
+        max_chars = settings.wechat_push_max_chars
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO wechat_outbox(dedupe_key, to_user, content, next_attempt_ts, created_datetime, updated_datetime) "
+            "VALUES(?,?,?,?,?,?)",
+            [(key, to_user, content[:max_chars], now, now_iso, now_iso) for to_user, content, key in items],
+        )
+        return conn.total_changes - before
+
+    def enqueue(self, to_user: str, content: str, dedupe_key: Optional[str] = None) -> bool:
+        """写入发件箱，返回是否新增（dedupe_key 已存在时忽略）"""
+        with self._db.transaction() as conn:
+            return self.insert_messages(conn, [(to_user, content, dedupe_key)]) == 1
+
+    def _claim_due(self, limit: int) -> List[Tuple[int, str, str, int]]:
+        """领取到期的待发送消息并标记为发送中；只返回本次确实由 pending 改为 sending 的消息"""
+        now_iso = self._now_iso()
+        with self._db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, to_user, content, attempts FROM wechat_outbox WHERE status=? AND next_attempt_ts<=? "
+                "ORDER BY next_attempt_ts, id LIMIT ?",
+                (OUTBOX_PENDING, time.time(), limit),
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                cur = conn.execute(
+                    "UPDATE wechat_outbox SET status=?, updated_datetime=? WHERE id=? AND status=?",
+                    (OUTBOX_SENDING, now_iso, row[0], OUTBOX_PENDING),
+                )
+                if cur.rowcount == 1:
+                    claimed.append(row)
+            return claimed
+
+    def _reclaim_stale(self) -> int:
+        """发送中超过租约仍未确认的消息计一次尝试后重新排期（超出最大次数则标记失败），返回处理条数"""
+        cutoff = datetime.fromtimestamp(
+            time.time() - float(settings.wechat_push_lease_seconds), tz=timezone.utc
+        ).isoformat()
+        max_attempts = max(1, int(settings.wechat_push_max_attempts))
+        with self._db.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE wechat_outbox SET status=CASE WHEN attempts+1>=? THEN ? ELSE ? END, attempts=attempts+1, "
+                "next_attempt_ts=?, last_error=?, updated_datetime=? WHERE status=? AND updated_datetime<?",
+                (max_attempts, OUTBOX_FAILED, OUTBOX_PENDING, time.time(), "发送未确认（租约超时）",
+                 self._now_iso(), OUTBOX_SENDING, cutoff),
+            )
+            return cur.rowcount
+
+    def _mark_sent(self, outbox_id: int, attempts: int):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE wechat_outbox SET status=?, attempts=?, last_error=NULL, updated_datetime=? WHERE id=?",
+                (OUTBOX_SENT, attempts, self._now_iso(), outbox_id),
+            )
+
+    def _mark_retry(self, outbox_id: int, attempts: int, error: str, permanent: bool) -> bool:
+        """记录失败；可重试时按退避重新排期并返回 True，否则标记为失败"""
+        retry = not permanent and attempts < max(1, int(settings.wechat_push_max_attempts))
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE wechat_outbox SET status=?, attempts=?, next_attempt_ts=?, last_error=?, updated_datetime=? WHERE id=?",
+                (
+                    OUTBOX_PENDING if retry else OUTBOX_FAILED,
+                    attempts,
+                    time.time() + self._backoff(attempts) if retry else 0,
+                    error[:500],
+                    self._now_iso(),
+                    outbox_id,
+                ),
+            )
+        return retry
+
+    def _defer(self, outbox_id: int, delay: float):
+        """用户频控：延后发送，不计入尝试次数"""
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE wechat_outbox SET status=?, next_attempt_ts=?, updated_datetime=? WHERE id=?",
+                (OUTBOX_PENDING, time.time() + delay, self._now_iso(), outbox_id),
+            )
+
+    def _prune(self):
+        """清理超过保留期的已发送/已失败消息"""
+        cutoff = datetime.fromtimestamp(
+            time.time() - float(settings.wechat_push_retention_seconds), tz=timezone.utc
+        ).isoformat()
+        with self._db.transaction() as conn:
+            conn.execute(
+                "DELETE FROM wechat_outbox WHERE status IN (?, ?) AND updated_datetime<?",
+                (OUTBOX_SENT, OUTBOX_FAILED, cutoff),
+            )
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._db.connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM wechat_outbox GROUP BY status").fetchall())
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        base = float(settings.wechat_push_retry_base_seconds)
+        return min(600.0, base * (2 ** (attempts - 1))) + random.uniform(0, base)
+
+    # ---- 微信接口 ----
+
+    def _parse(self, response: httpx.Response) -> Dict:
+        if response.status_code != 200:
+            raise WeChatAPIError(f"微信接口 HTTP {response.status_code}: {response.text[:200]}")
+        data = response.json()
+        errcode = int(data.get("errcode") or 0)
+        if errcode:
+            if errcode in _TOKEN_ERRCODES:
+                self._token = None
+            raise WeChatAPIError(f"微信接口错误 {errcode}: {data.get('errmsg', '')}", errcode)
+        return data
+
+    async def _access_token(self) -> str:
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires:
+                return self._token
+            response = await self._get_client().get(
+                "token",
+                params={
+                    "grant_type": "client_credential",
+                    "appid": settings.wechat_app_id,
+                    "secret": settings.wechat_app_secret,
+                },
+            )
+            data = self._parse(response)
+            expires_in = int(data.get("expires_in") or 7200)
+            margin = float(settings.wechat_token_refresh_margin_seconds)
+            self._token = data["access_token"]
+            self._token_expires = time.monotonic() + max(60.0, expires_in - margin)
+            self.token_refreshes += 1
+            logger.info(f"微信 access_token 已刷新，有效期 {expires_in}s")
+            return self._token
+
+    async def send_text(self, to_user: str, content: str):
+        """立即发送一条客服文本消息（不经发件箱）"""
+        await self._qps_bucket.acquire()
+        try:
+            token = await self._access_token()
+            payload = {"touser": to_user, "msgtype": "text", "text": {"content": content}}
+            response = await self._get_client().post(
+                "message/custom/send",
+                params={"access_token": token},
+                # 中文不转义，避免部分客户端显示 \uXXXX
+                content=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                headers={"Content-Type": "application/json; charset=utf-8"},
+            )
+        except httpx.HTTPError as e:
+            raise WeChatAPIError(f"微信接口连接错误: {e}")
+        self._parse(response)
+
+    # ---- 投递 ----
+
+    def _reserve_user_slot(self, to_user: str) -> float:
+        """占用用户发送名额；返回需等待的秒数（0 表示可立即发送）"""
+        now = time.monotonic()
+        interval = float(settings.wechat_push_user_interval_seconds)
+        next_ts = self._user_next_ts.get(to_user, 0.0)
+        if next_ts > now:
+            return next_ts - now
+        self._user_next_ts[to_user] = now + interval
+        return 0.0
+
+    async def _deliver(self, outbox_id: int, to_user: str, content: str, attempts: int):
+        loop = asyncio.get_running_loop()
+        attempts += 1
+        try:
+            await self.send_text(to_user, content)
+        except Exception as e:
+            # 非微信接口错误（如 token 响应格式异常）同样按可重试处理，不让消息停留在发送中
+            message = e.message if isinstance(e, WeChatAPIError) else f"{type(e).__name__}: {e}"
+            permanent = isinstance(e, WeChatAPIError) and e.errcode in _PERMANENT_ERRCODES
+            retry = await loop.run_in_executor(None, self._mark_retry, outbox_id, attempts, message, permanent)
+            if retry:
+                self.retried += 1
+                logger.warning(f"客服消息发送失败，稍后重试({attempts}次): {to_user}, {message}")
+            else:
+                self.failed += 1
+                logger.error(f"客服消息发送失败({attempts}次)，不再重试: {to_user}, {message}")
+            return
+        await loop.run_in_executor(None, self._mark_sent, outbox_id, attempts)
+        self.sent += 1
+
+    async def deliver_once(self) -> int:
+        """领取一批到期消息并发送，返回实际尝试发送的条数"""
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(
+            None, self._claim_due, max(1, int(settings.wechat_push_batch_size))
+        )
+        tasks = []
+        for outbox_id, to_user, content, attempts in rows:
+            wait = self._reserve_user_slot(to_user)
+            if wait > 0:
+                self.deferred += 1
+                await loop.run_in_executor(None, self._defer, outbox_id, wait)
+                continue
+            tasks.append(self._deliver(outbox_id, to_user, content, attempts))
+        await asyncio.gather(*tasks)
+        # 频控记录只保留仍在间隔内的用户
+        now = time.monotonic()
+        self._user_next_ts = {u: ts for u, ts in self._user_next_ts.items() if ts > now}
+        return len(tasks)
+
+    async def maintain(self):
+        """回收租约超时的发送中消息；首次调用及此后每小时清理过期记录"""
+        loop = asyncio.get_running_loop()
+        reclaimed = await loop.run_in_executor(None, self._reclaim_stale)
+        if reclaimed:
+            logger.warning(f"回收发送未确认的客服消息 {reclaimed} 条")
+        if self._last_prune is None or time.monotonic() - self._last_prune > 3600:
+            self._last_prune = time.monotonic()
+            await loop.run_in_executor(None, self._prune)
+
+    async def run(self):
+        """后台投递任务：有消息时连续发送，空闲时按 wechat_push_poll_seconds 轮询；每轮投递前先做维护"""
+        while True:
+            try:
+                await self.maintain()
+                delivered = await self.deliver_once()
+            except Exception as e:
+                logger.exception(f"客服消息投递异常: {e}")
+                delivered = 0
+            if not delivered:
+                await asyncio.sleep(max(0.1, float(settings.wechat_push_poll_seconds)))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": self.enabled,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "token_refreshes": self.token_refreshes,
+        }
+
+
+wechat_push = WeChatPushService()
@@ -0,0 +1,72 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# 在导入应用模块之前指定临时数据目录：各模块级单例的数据库都落在这里，测试不会写入仓库下的 data/
+_DATA_DIR = tempfile.mkdtemp(prefix="quoted-com-insight-tests-")
+os.environ["DATA_DIR"] = _DATA_DIR
+atexit.register(shutil.rmtree, _DATA_DIR, ignore_errors=True)
+
+import pytest
+
+from app.models import Announcement, AnnouncementList
+from app.services import announcement_service as mod_ann
+from app.services.announcement_archive import AnnouncementArchive
+from app.services.announcement_service import AnnouncementService
+from app.services.content_cache import ContentCache
+from app.services.summary_cache import SummaryCache
+
+
+class FakeLLM:
+    """以函数模拟LLM：complete/chat 均返回 fn(最后一条用户消息)"""
+    model = "qwen-plus"
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def complete(self, content):
+        return self.fn(content)
+
+    async def chat(self, messages):
+        return self.fn(messages[-1]["content"]), None
+
+
+def _ann(i):
+    return Announcement(id=f"600000_{i}_2024-01-0{i}", stock_code="600000", stock_name="浦发银行",
+                        title=f"公告{i}", publish_date=f"2024-01-0{i}", category="其他", url=f"u{i}")
+
+
+@pytest.fixture
+def make_ann():
+    """按序号构造浦发银行的测试公告（URL 为 u{序号}）"""
+    return _ann
+
+
+@pytest.fixture
+def svc(tmp_path):
+    """归档、正文缓存与总结缓存都落在临时库的公告服务"""
+    db = str(tmp_path / "announcements.db")
+    return AnnouncementService(archive=AnnouncementArchive(db), contents=ContentCache(db),
+                               summaries=SummaryCache(db))
+
+
+@pytest.fixture
+def serve_window(monkeypatch, svc):
+    """让 svc 的公告窗口返回给定列表（按调用时的内容，测试中追加公告即生效）"""
+    def serve(anns, complete=True):
+        async def fake_get(code):
+            return AnnouncementList(announcements=list(anns), total=len(anns)), complete
+
+        monkeypatch.setattr(svc, "get_window_announcements", fake_get)
+    return serve
+
+
+@pytest.fixture
+def install_llm(monkeypatch):
+    """以 FakeLLM(fn) 替换公告服务使用的LLM客户端"""
+    def install(fn):
+        llm = FakeLLM(fn)
+        monkeypatch.setattr(mod_ann, "llm_client", llm)
+        return llm
+    return install
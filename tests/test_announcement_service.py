@@ -0,0 +1,184 @@
+import time
+
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import StockAPIException
+from app.services import announcement_service as mod_ann
+from app.services.announcement_archive import AnnouncementArchive
+from app.services.announcement_service import AnnouncementService
+from app.services.notice_cache import NoticeDaySnapshot, NoticeSnapshotCache
+
+
+def _row(seq, code, title, url, date):
+    iso = f"{date[:4]}-{date[4:6]}-{date[6:8]}"
+    return {"序号": seq, "代码": code, "名称": "名称", "公告标题": title,
+            "公告类型": "其他", "公告日期": iso, "网址": url}
+
+
+class FakeSnapshotCache:
+    def __init__(self, loader):
+        self.loader = loader
+        self.calls = []
+
+    def get(self, date):
+        self.calls.append(date)
+        return NoticeDaySnapshot(date, pd.DataFrame(self.loader(date)))
+
+
+@pytest.fixture
+def svc(tmp_path):
+    return AnnouncementService(archive=AnnouncementArchive(str(tmp_path / "announcements.db")))
+
+
+@pytest.mark.asyncio
+async def test_get_announcements_fetches_dates_concurrently(monkeypatch, svc):
+    monkeypatch.setattr(settings, "announcement_time_range_days", 4)
+    monkeypatch.setattr(settings, "notice_fetch_timeout_seconds", 0.5)
+    dates = svc._window_dates(4)
+
+    def loader(date):
+        if date == dates[1]:
+            raise RuntimeError("boom")
+        if date == dates[2]:
+            time.sleep(1.0)  # 超时日期不应拖慢其他日期
+            return [_row(9, "600000", "slow", "u-slow", date)]
+        # 最早一天与今天返回相同公告，验证去重
+        return [_row(1, "600000", "same", "u-same", date),
+                _row(2, "600000", f"t-{date}", f"u-{date}", date),
+                _row(3, "000001", "other", f"o-{date}", date)]
+
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", FakeSnapshotCache(loader))
+
+    start = time.monotonic()
+    assert await svc.sync_archive(dates) == 4
+    elapsed = time.monotonic() - start
+    result = await svc.get_announcements("600000")
+
+    assert elapsed < 0.9
+    titles = [a.title for a in result.announcements]
+    assert titles == ["same", f"t-{dates[0]}", f"t-{dates[3]}"]
+    assert result.total == 3
+    await svc._gap_fill_task
+
+
+@pytest.mark.asyncio
+async def test_archive_freezes_past_days_and_survives_outage(monkeypatch, svc):
+    monkeypatch.setattr(settings, "announcement_time_range_days", 3)
+    monkeypatch.setattr(settings, "notice_snapshot_today_ttl_seconds", 3600)
+    dates = svc._window_dates(3)
+    cache = FakeSnapshotCache(lambda d: [_row(1, "600000", f"t-{d}", f"u-{d}", d)])
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", cache)
+
+    await svc.sync_archive(dates)
+    first = await svc.get_announcements("600000")
+    assert [a.title for a in first.announcements] == [f"t-{d}" for d in dates]
+    assert sorted(cache.calls) == sorted(dates)
+
+    # 历史日期已冻结、当天在TTL内：再次查询不访问数据源
+    await svc.get_announcements("600000")
+    await svc._gap_fill_task
+    assert len(cache.calls) == 3
+
+    # 当天过期且数据源不可用时，仍返回归档数据
+    def down(date):
+        raise RuntimeError("akshare down")
+
+    monkeypatch.setattr(settings, "notice_snapshot_today_ttl_seconds", 0)
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", FakeSnapshotCache(down))
+    again = await svc.get_announcements("600000")
+    assert again.total == 3
+    await svc._gap_fill_task
+
+
+@pytest.mark.asyncio
+async def test_query_does_not_wait_for_source_and_failed_dates_back_off(monkeypatch, svc):
+    monkeypatch.setattr(settings, "announcement_time_range_days", 2)
+    monkeypatch.setattr(settings, "notice_fetch_timeout_seconds", 0.3)
+    dates = svc._window_dates(2)
+
+    def hang(date):
+        time.sleep(0.5)
+        raise RuntimeError("akshare down")
+
+    cache = FakeSnapshotCache(hang)
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", cache)
+
+    start = time.monotonic()
+    result = await svc.get_announcements("600000")
+    assert time.monotonic() - start < 0.2
+    assert result.total == 0
+
+    # 后台补齐失败后进入退避期：再次查询与同步都不再访问数据源
+    await svc._gap_fill_task
+    assert len(cache.calls) == 2
+    await svc.get_announcements("600000")
+    await svc._gap_fill_task
+    assert await svc.sync_archive(dates) == 0
+    assert len(cache.calls) == 2
+
+
+def test_same_notice_is_kept_for_each_stock(tmp_path):
+    archive = AnnouncementArchive(str(tmp_path / "announcements.db"))
+    date = "20240102"
+    rows = [_row(1, "600000", "联合公告", "u-joint", date), _row(2, "000001", "联合公告", "u-joint", date)]
+    svc = AnnouncementService(archive=archive)
+    anns = [a for code in ("600000", "000001") for a in svc._convert_rows_to_announcements(
+        [r for r in rows if r["代码"] == code], code)]
+    assert archive.ingest_day(date, anns, frozen=True) == 2
+    assert [a.stock_code for a in archive.query("000001", "2024-01-01", "2024-01-03")] == ["000001"]
+    assert [a.stock_code for a in archive.query("600000", "2024-01-01", "2024-01-03")] == ["600000"]
+
+
+@pytest.mark.asyncio
+async def test_summary_waits_for_sync_and_skips_fingerprint_for_incomplete_window(monkeypatch, svc):
+    monkeypatch.setattr(settings, "announcement_time_range_days", 2)
+    today, yesterday = svc._window_dates(2)
+
+    def loader(date):
+        if date == yesterday:
+            raise RuntimeError("akshare down")
+        return [_row(1, "600000", "当日公告", "u-today", date)]
+
+    cache = FakeSnapshotCache(loader)
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", cache)
+
+    async def fake_items(announcements, on_item=None):
+        return [f"总结:{a.title}" for a in announcements]
+
+    class FakeLLM:
+        model = "fake"
+
+        async def complete(self, text):
+            return text
+
+    monkeypatch.setattr(svc, "_summarize_items", fake_items)
+    monkeypatch.setattr(mod_ann, "llm_client", FakeLLM())
+
+    # 总结路径等待窗口同步；昨日同步失败，窗口不完整，不记录指纹
+    result, fingerprint = await svc.summarize_with_fingerprint("600000")
+    assert sorted(cache.calls) == sorted([today, yesterday])
+    assert "当日公告" in result["content"]
+    assert fingerprint == ""
+
+    # 窗口不完整且查不到公告：不生成“无公告”总结
+    with pytest.raises(StockAPIException):
+        await svc.summarize_with_fingerprint("000001")
+
+
+@pytest.mark.asyncio
+async def test_sync_day_refetches_today_within_snapshot_ttl(monkeypatch, svc):
+    today = svc._window_dates(1)[0]
+    fetched = []
+
+    def fetcher(date):
+        fetched.append(date)
+        n = len(fetched)
+        return NoticeDaySnapshot(date, pd.DataFrame([_row(n, "600000", f"公告{n}", f"u{n}", date)]))
+
+    monkeypatch.setattr(mod_ann, "notice_snapshot_cache", NoticeSnapshotCache(fetcher, today_ttl_seconds=3600))
+    assert await svc.sync_day(today)
+    assert await svc.sync_day(today)
+    assert fetched == [today, today]
+    assert set(svc.day_notice_keys(today)["600000"]) == {"u2"}
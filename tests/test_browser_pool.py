@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from app.services.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        ctx = FakeContext(self)
+        self.contexts.append(ctx)
+        return ctx
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class Launcher:
+    def __init__(self):
+        self.browsers = []
+
+    async def __call__(self):
+        b = FakeBrowser()
+        self.browsers.append(b)
+        return b
+
+
+@pytest.mark.asyncio
+async def test_pages_reuse_browser_and_close_contexts():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_pages=2, recycle_pages=100, launch=launcher)
+    await pool.start()
+    for _ in range(3):
+        async with pool.page():
+            pass
+    assert len(launcher.browsers) == 1
+    assert all(ctx.closed for ctx in launcher.browsers[0].contexts)
+    await pool.close()
+    assert launcher.browsers[0].closed
+
+
+@pytest.mark.asyncio
+async def test_recycles_after_n_pages_and_after_crash():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_pages=2, recycle_pages=2, launch=launcher)
+    await pool.start()
+    for _ in range(3):
+        async with pool.page():
+            pass
+    assert len(launcher.browsers) == 2
+    assert launcher.browsers[0].closed
+
+    launcher.browsers[1].connected = False
+    async with pool.page():
+        pass
+    assert len(launcher.browsers) == 3
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_and_retired_browser_waits_for_pages():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_pages=2, recycle_pages=1, launch=launcher)
+    await pool.start()
+    active = 0
+    peak = 0
+
+    async def use():
+        nonlocal active, peak
+        async with pool.page():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+
+    await asyncio.gather(*(use() for _ in range(5)))
+    assert peak == 2
+    # 每个页面后都回收：除最后一个实例外均已关闭
+    assert all(b.closed for b in launcher.browsers[:-1])
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_borrowed_pages_and_rejects_new_ones():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_pages=2, recycle_pages=100, launch=launcher)
+    await pool.start()
+    borrowed = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def use():
+        async with pool.page():
+            borrowed.set()
+            await finish.wait()
+            assert not launcher.browsers[0].closed
+
+    task = asyncio.create_task(use())
+    await borrowed.wait()
+    closing = asyncio.create_task(pool.close(timeout=5))
+    await asyncio.sleep(0.01)
+    with pytest.raises(RuntimeError):
+        async with pool.page():
+            pass
+    assert not closing.done()
+
+    finish.set()
+    await task
+    await closing
+    assert launcher.browsers[0].closed
+
+
+@pytest.mark.asyncio
+async def test_release_after_forced_close_does_not_crash():
+    launcher = Launcher()
+    pool = BrowserPool(size=1, max_pages=1, recycle_pages=100, launch=launcher)
+    await pool.start()
+    borrowed = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def use():
+        async with pool.page():
+            borrowed.set()
+            await finish.wait()
+
+    task = asyncio.create_task(use())
+    await borrowed.wait()
+    await pool.close(timeout=0.01)
+    assert launcher.browsers[0].closed
+    finish.set()
+    await task
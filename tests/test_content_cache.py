@@ -0,0 +1,65 @@
+import pytest
+
+from app.core.config import settings
+from app.services.announcement_archive import AnnouncementArchive
+from app.services.announcement_service import AnnouncementService
+from app.services.content_cache import ContentCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ContentCache(str(tmp_path / "announcements.db"), max_bytes=10_000)
+
+
+def test_get_by_announcement_or_pdf_url(cache):
+    entry = cache.put("https://notice/1", "pdf", "正文内容", source_url="https://pdf/1.pdf")
+    assert cache.get("https://notice/1").content_hash == entry.content_hash
+    assert cache.get("https://pdf/1.pdf").content == "正文内容"
+    assert cache.get("https://notice/2") is None
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ContentCache(str(tmp_path / "announcements.db"), max_bytes=25)
+    cache.put("a", "html", "x" * 10)
+    cache.put("b", "html", "y" * 10)
+    cache.get("a")  # a 最近访问，b 成为最久未访问
+    cache.put("c", "html", "z" * 10)
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_running_total_tracks_replacements_and_restart(tmp_path):
+    path = str(tmp_path / "announcements.db")
+    cache = ContentCache(path, max_bytes=25)
+    cache.put("a", "html", "x" * 10)
+    cache.put("a", "html", "x" * 12)  # 覆盖写入只计差值
+    cache.put("b", "html", "y" * 10)
+    assert cache._total_bytes == 22
+
+    # 重启后首次写入从库中统计一次总量
+    reopened = ContentCache(path, max_bytes=25)
+    reopened.put("c", "html", "z" * 10)
+    assert reopened.get("a") is None
+    assert reopened._total_bytes == 20
+
+
+@pytest.mark.asyncio
+async def test_extract_uses_cache_and_truncates_on_read(monkeypatch, tmp_path, cache):
+    svc = AnnouncementService(
+        archive=AnnouncementArchive(str(tmp_path / "announcements.db")), contents=cache
+    )
+    calls = []
+
+    async def fake_fetch(url):
+        calls.append(url)
+        return cache.put(url, "pdf", "一二三四五六", source_url=url + ".pdf")
+
+    monkeypatch.setattr(svc, "_fetch_content_entry", fake_fetch)
+    monkeypatch.setattr(settings, "pdf_content_max_chars", 3)
+    assert await svc._extract_announcement_content("u1") == "一二三"
+
+    # 调整截断长度无需重新下载
+    monkeypatch.setattr(settings, "pdf_content_max_chars", 5)
+    assert await svc._extract_announcement_content("u1") == "一二三四五"
+    assert calls == ["u1"]
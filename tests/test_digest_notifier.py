@@ -0,0 +1,95 @@
+import pytest
+
+from app.services import digest_notifier as mod_digest
+from app.services import subscription_service as mod_sub
+from app.services.digest_notifier import DigestNotifier
+from app.services.refresh_scheduler import CodeRefreshResult, RefreshReport
+from app.services.subscription_service import SubscriptionService
+from app.services.wechat_push import WeChatPushService
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(tmp_path / "summaries"))
+    subs = SubscriptionService(str(tmp_path / "subscriptions.db"))
+    monkeypatch.setattr(mod_digest, "subscription_service", subs)
+    push = WeChatPushService(str(tmp_path / "outbox.db"))
+    for user, codes in {
+        "u1": ["600000", "000001", "300750"],
+        "u2": ["600000"],
+        "u3": ["300750"],
+        "u4": ["000001", "600000"],
+        "u5": ["000001"],
+    }.items():
+        for code in codes:
+            subs.add_code(user, code)
+    subs.save_summaries([("600000", {"content": "浦发总结"}, ""), ("000001", {"content": "平安总结"}, "")])
+    yield subs, push
+    push._db.close_all()
+    subs.close()
+
+
+def outbox(push):
+    with push.transaction() as conn:
+        return conn.execute("SELECT to_user, content, dedupe_key FROM wechat_outbox ORDER BY to_user").fetchall()
+
+
+@pytest.mark.asyncio
+async def test_one_digest_per_user_across_pages(env):
+    subs, push = env
+    notifier = DigestNotifier(push, page_size=2)
+    report = RefreshReport(started_datetime="run1", results=[
+        CodeRefreshResult(stock_code="600000", subscribers=3, status="refreshed"),
+        CodeRefreshResult(stock_code="000001", subscribers=3, status="refreshed"),
+        CodeRefreshResult(stock_code="300750", subscribers=2, status="unchanged"),
+    ])
+    assert await notifier.notify_report(report) == 4
+
+    rows = outbox(push)
+    assert [r[0] for r in rows] == ["u1", "u2", "u4", "u5"]
+    assert rows[0][1] == "订阅公告总结已更新（2只）\n\n【000001】平安总结\n\n【600000】浦发总结"
+    assert rows[1][1] == "订阅公告总结已更新（1只）\n\n【600000】浦发总结"
+    assert rows[0][2] == "digest:run1:u1"
+
+    # 同一运行重复触发不会重复生成
+    assert await notifier.notify_report(report) == 0
+    assert len(outbox(push)) == 4
+
+
+@pytest.mark.asyncio
+async def test_resume_after_crash_does_not_double_send(env, monkeypatch):
+    subs, push = env
+    notifier = DigestNotifier(push, page_size=2)
+    original = DigestNotifier._commit_page
+    calls = []
+
+    def crash_on_third_page(self, *args):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError("crash")
+        return original(self, *args)
+
+    monkeypatch.setattr(DigestNotifier, "_commit_page", crash_on_third_page)
+    with pytest.raises(RuntimeError):
+        await notifier.notify("run2", ["600000", "000001"])
+    monkeypatch.setattr(DigestNotifier, "_commit_page", original)
+    # 崩溃前已提交的页：u1 的订阅跨页，在第二页与 u2 一起写入
+    assert [r[0] for r in outbox(push)] == ["u1", "u2"]
+
+    restarted = DigestNotifier(push, page_size=2)
+    assert restarted.unfinished_runs() == ["run2"]
+    await restarted.resume()
+    rows = outbox(push)
+    assert [r[0] for r in rows] == ["u1", "u2", "u4", "u5"]
+    assert restarted.unfinished_runs() == []
+
+
+def test_digest_truncates_long_code_lists(monkeypatch):
+    monkeypatch.setattr(mod_digest.settings, "wechat_push_max_chars", 120)
+    monkeypatch.setattr(mod_digest.settings, "digest_item_max_chars", 20)
+    codes = [f"60000{i}" for i in range(8)]
+    text = DigestNotifier.format_digest(codes, {code: "长" * 50 for code in codes})
+    assert len(text) <= 120
+    assert text.startswith("订阅公告总结已更新（8只）")
+    assert "发送代码查看详情" in text
+    assert "长" * 20 + "…" in text
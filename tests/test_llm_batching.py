@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm import BATCH_PROMPT_VERSION, PROMPT_VERSION, parse_batch_summaries
+
+
+def _batch_reply(content):
+    """按批量请求中的编号返回JSON数组"""
+    ids = [int(part.split("】")[0]) for part in content.split("【公告")[1:]]
+    return json.dumps([{"id": n, "summary": f"批量摘要{n}"} for n in ids], ensure_ascii=False)
+
+
+@pytest.mark.asyncio
+async def test_batched_summaries_fill_per_item_cache(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(i) for i in range(1, 6)]
+    calls = []
+
+    async def fake_extract(url):
+        return f"正文-{url}"
+
+    def fake_llm(content):
+        calls.append(content)
+        return _batch_reply(content) if content.startswith("【公告") else "汇总"
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", True)
+    monkeypatch.setattr(settings, "llm_batch_max_items", 3)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(fake_llm)
+
+    await svc.summarize_announcements("600000")
+    assert len(calls) == 3  # 2 批（3+2 条）+ 1 次汇总
+    # 批次按正文提取完成顺序装填，批内编号与公告的对应关系不固定
+    assert sorted(calls[-1].splitlines()) == sorted(["批量摘要1", "批量摘要2", "批量摘要3", "批量摘要1", "批量摘要2"])
+
+    # 单条缓存已逐条写入：再次刷新只需汇总
+    calls.clear()
+    await svc.summarize_announcements("600000")
+    assert len(calls) == 1
+
+    # 批量结果以批量提示词版本入缓存，不冒充单条提示词的结果
+    content_hash = svc._summary_cache.content_hash("正文-u1")
+    assert svc._summary_cache.get("u1", content_hash, "qwen-plus", BATCH_PROMPT_VERSION).startswith("批量摘要")
+    assert svc._summary_cache.get("u1", content_hash, "qwen-plus", PROMPT_VERSION) is None
+
+
+@pytest.mark.asyncio
+async def test_batch_parse_failure_falls_back_to_single_calls(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(1), make_ann(2), make_ann(3)]
+    calls = []
+
+    async def fake_extract(url):
+        return f"正文-{url}"
+
+    def fake_llm(content):
+        calls.append(content)
+        if content.startswith("【公告"):
+            # 只返回部分编号
+            return '```json\n[{"id": 2, "summary": "批量摘要2"}]\n```'
+        if content.startswith("正文-"):
+            return f"摘要-{content[3:]}"
+        return content
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", True)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(fake_llm)
+
+    result = await svc.summarize_announcements("600000")
+    assert result["content"] == "摘要-u1\n批量摘要2\n摘要-u3\n"
+    assert sorted(c for c in calls if c.startswith("正文-")) == ["正文-u1", "正文-u3"]
+
+
+def test_parse_batch_summaries_rejects_malformed_output():
+    assert parse_batch_summaries("无法总结", [1, 2]) is None
+    assert parse_batch_summaries('[{"id": "x"}]', [1]) is None
+    assert parse_batch_summaries('[{"id": 1, "summary": "a"}, {"id": 9, "summary": "b"}]', [1, 2]) == {1: "a"}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_before_slow_extractions_finish(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(1), make_ann(2), make_ann(3)]
+    release = asyncio.Event()
+    calls = []
+
+    async def fake_extract(url):
+        if url == "u3":
+            await release.wait()
+        return f"正文-{url}"
+
+    def fake_llm(content):
+        calls.append(content)
+        if content.startswith("【公告"):
+            release.set()  # 首个批次发出时第三条公告仍在提取
+            return _batch_reply(content)
+        if content.startswith("正文-"):
+            return f"摘要-{content[3:]}"
+        return content
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", True)
+    monkeypatch.setattr(settings, "llm_batch_max_items", 2)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(fake_llm)
+
+    result = await asyncio.wait_for(svc.summarize_announcements("600000"), 5)
+    assert result["content"] == "批量摘要1\n批量摘要2\n摘要-u3\n"
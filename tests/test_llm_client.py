@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.ratelimit import TokenBucket
+from app.services.llm import LLMClient, LLMError
+
+
+def _ok(text="摘要", input_tokens=10, output_tokens=5):
+    return httpx.Response(200, json={
+        "request_id": "r1",
+        "output": {"choices": [{"message": {"role": "assistant", "content": text}}]},
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    })
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_base_seconds", 0.01)
+    monkeypatch.setattr(settings, "llm_api_key", "sk-test")
+
+
+@pytest.mark.asyncio
+async def test_complete_posts_to_configured_endpoint_and_records_usage(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return _ok()
+
+    monkeypatch.setattr(settings, "llm_model", "qwen-max")
+    client = LLMClient(transport=httpx.MockTransport(handler))
+    assert await client.complete("公告正文") == "摘要"
+    assert await client.complete("公告正文2") == "摘要"
+
+    request = requests[0]
+    assert str(request.url) == "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+    assert request.headers["Authorization"] == "Bearer sk-test"
+    assert b'"qwen-max"' in request.content
+    assert client.stats() == {"model": "qwen-max", "calls": 2, "failures": 0,
+                              "prompt_tokens": 20, "completion_tokens": 10}
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retries_on_throttling_and_server_errors():
+    responses = [httpx.Response(429, json={"code": "Throttling"}), httpx.Response(503), _ok("好")]
+
+    client = LLMClient(transport=httpx.MockTransport(lambda r: responses.pop(0)))
+    text, usage = await client.chat([{"role": "user", "content": "x"}])
+    assert text == "好"
+    assert usage.attempts == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_error_raises_without_retry(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(400, json={"code": "InvalidParameter"})
+
+    client = LLMClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(LLMError) as exc:
+        await client.complete("x")
+    assert exc.value.status_code == 400
+    assert len(calls) == 1
+
+    monkeypatch.setattr(settings, "llm_max_retries", 1)
+    client = LLMClient(transport=httpx.MockTransport(lambda r: httpx.Response(500)))
+    with pytest.raises(LLMError):
+        await client.complete("x")
+    assert client.stats()["failures"] == 1
+
+
+
+@pytest.mark.asyncio
+async def test_non_json_response_raises_llm_error():
+    client = LLMClient(transport=httpx.MockTransport(
+        lambda r: httpx.Response(200, text="<html>bad gateway</html>", headers={"content-type": "text/html"})))
+    with pytest.raises(LLMError, match="bad gateway") as exc:
+        await client.complete("x")
+    assert exc.value.status_code == 200
+    assert client.stats()["failures"] == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+    # 2 个突发 + 2 个按 20/s 补充
+    assert time.monotonic() - start >= 0.09
+
+    bucket.consume(10)
+    assert bucket.available < 0
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pandas as pd
+
+from app.services.notice_cache import NoticeDaySnapshot, NoticeSnapshotCache
+
+
+def _frame(date: str) -> pd.DataFrame:
+    return pd.DataFrame([{"代码": "600000", "公告日期": date}])
+
+
+class CountingFetcher:
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, date: str) -> pd.DataFrame:
+        with self._lock:
+            self.calls.append(date)
+        if self.delay:
+            time.sleep(self.delay)
+        return _frame(date)
+
+
+def test_past_date_never_expires():
+    fetcher = CountingFetcher()
+    cache = NoticeSnapshotCache(fetcher=fetcher, today_ttl_seconds=0, max_days=10)
+    for _ in range(3):
+        df = cache.get("20200101")
+    assert fetcher.calls == ["20200101"]
+    assert df.iloc[0]["公告日期"] == "20200101"
+    assert cache.stats()["hits"] == 2
+
+
+def test_today_entry_respects_ttl(monkeypatch):
+    fetcher = CountingFetcher()
+    cache = NoticeSnapshotCache(fetcher=fetcher, today_ttl_seconds=0, max_days=10)
+    today = cache._today()
+    cache.get(today)
+    cache.get(today)
+    assert fetcher.calls == [today, today]
+
+    fetcher2 = CountingFetcher()
+    cache2 = NoticeSnapshotCache(fetcher=fetcher2, today_ttl_seconds=3600, max_days=10)
+    cache2.get(today)
+    cache2.get(today)
+    assert fetcher2.calls == [today]
+
+
+def test_concurrent_callers_share_inflight_fetch():
+    fetcher = CountingFetcher(delay=0.2)
+    cache = NoticeSnapshotCache(fetcher=fetcher, today_ttl_seconds=0, max_days=10)
+    threads = [threading.Thread(target=cache.get, args=("20200102",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetcher.calls == ["20200102"]
+
+
+def test_failed_fetch_is_not_cached():
+    calls = []
+
+    def flaky(date):
+        calls.append(date)
+        if len(calls) == 1:
+            raise RuntimeError("network down")
+        return _frame(date)
+
+    cache = NoticeSnapshotCache(fetcher=flaky, today_ttl_seconds=0, max_days=10)
+    try:
+        cache.get("20200103")
+    except RuntimeError:
+        pass
+    assert not cache.get("20200103").empty
+    assert len(calls) == 2
+
+
+def test_capacity_evicts_oldest():
+    fetcher = CountingFetcher()
+    cache = NoticeSnapshotCache(fetcher=fetcher, today_ttl_seconds=0, max_days=2)
+    for d in ("20200101", "20200102", "20200103"):
+        cache.get(d)
+    cache.get("20200101")
+    assert fetcher.calls.count("20200101") == 2
+
+
+def test_day_snapshot_indexes_rows_by_code():
+    df = pd.DataFrame(
+        [
+            {"序号": 1, "代码": "600000", "名称": "浦发银行", "公告标题": "A", "网址": "u1"},
+            {"序号": 2, "代码": "000001", "名称": "平安银行", "公告标题": "B", "网址": "u2"},
+            {"序号": 3, "代码": "600000", "名称": "浦发银行", "公告标题": "C", "网址": "u3"},
+        ]
+    )
+    snapshot = NoticeDaySnapshot("20200101", df)
+    assert len(snapshot) == 3
+    assert sorted(snapshot.codes()) == ["000001", "600000"]
+    assert [r["公告标题"] for r in snapshot.rows("600000")] == ["A", "C"]
+    assert snapshot.rows("999999") == []
+    assert NoticeDaySnapshot("20200101", pd.DataFrame()).rows("600000") == []
+
+
+def test_convert_rows_to_announcements_batch():
+    from app.services.announcement_service import AnnouncementService
+
+    rows = [
+        {"序号": 7, "代码": "600000", "名称": "浦发银行", "公告标题": "A", "公告类型": float("nan"),
+         "公告日期": "2020-01-01", "网址": "u1"},
+    ]
+    anns = AnnouncementService()._convert_rows_to_announcements(rows, "600000")
+    assert anns[0].id == "600000_7_2020-01-01"
+    assert anns[0].category == "其他"
+    assert anns[0].publish_date == "2020-01-01"
@@ -0,0 +1,54 @@
+import httpx
+import pytest
+
+from app.services import notice_resolver as mod_resolver
+from app.services.notice_resolver import NoticeHttpResolver
+
+
+PDF_PAGE = """<html><body>
+<div class="detail"><a class="btn pdf-link" href="//pdf.dfcfw.com/pdf/H2_AN1_1.pdf?1.pdf">下载</a></div>
+</body></html>"""
+
+TEXT_PAGE = """<html><body>
+<div id="notice_content"><p>第一段<br/>内容</p><div>第二段</div></div>
+<div id="footer">页脚</div>
+</body></html>"""
+
+JS_PAGE = """<html><body><div id="app"></div><script src="app.js"></script></body></html>"""
+
+
+def test_parse_pdf_link_resolves_relative_and_strips_query():
+    result = NoticeHttpResolver.parse(PDF_PAGE, "https://data.eastmoney.com/notices/detail/600000/AN1.html")
+    assert result.pdf_url == "https://pdf.dfcfw.com/pdf/H2_AN1_1.pdf"
+
+
+def test_parse_notice_content_text():
+    result = NoticeHttpResolver.parse(TEXT_PAGE, "https://example.com/n")
+    assert result.pdf_url == ""
+    assert "第一段" in result.text and "第二段" in result.text
+    assert "页脚" not in result.text
+
+
+def test_parse_js_page_is_miss():
+    assert NoticeHttpResolver.parse(JS_PAGE, "https://example.com/n") is None
+
+
+@pytest.mark.asyncio
+async def test_resolve_counts_hits_and_misses(monkeypatch):
+    pages = {"/pdf": PDF_PAGE, "/js": JS_PAGE}
+
+    def handler(request):
+        if request.url.path == "/boom":
+            return httpx.Response(500)
+        return httpx.Response(200, text=pages[request.url.path])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(mod_resolver, "get_http_client", lambda: client)
+    resolver = NoticeHttpResolver()
+    assert (await resolver.resolve("https://example.com/pdf")).pdf_url.endswith(".pdf")
+    assert await resolver.resolve("https://example.com/js") is None
+    assert await resolver.resolve("https://example.com/boom") is None
+    stats = resolver.stats()
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (1, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+    await client.aclose()
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.models import Announcement, AnnouncementList
+from app.services import notice_watcher as mod_watch
+from app.services.announcement_service import AnnouncementService
+from app.services.notice_watcher import NoticeWatcher
+
+
+class FakeAnnouncements:
+    def __init__(self):
+        self.keys = {}
+        self.synced = []
+        self.sync_ok = True
+
+    async def sync_day(self, date_str):
+        self.synced.append(date_str)
+        return self.sync_ok
+
+    def day_notice_keys(self, date_str):
+        return {code: set(keys) for code, keys in self.keys.items()}
+
+    async def get_window_announcements(self, code):
+        anns = [Announcement(id=k, stock_code=code, stock_name="", title=k, publish_date="2024-01-01",
+                             category="其他", url=k) for k in sorted(self.keys.get(code, ()))]
+        return AnnouncementList(announcements=anns, total=len(anns)), True
+
+    def announcement_fingerprint(self, announcements):
+        return AnnouncementService.announcement_fingerprint(announcements)
+
+
+class FakeSubscriptions:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fingerprints = {}
+
+    def subscriber_counts(self, codes=None):
+        counts = {}
+        for _, user_codes in self.rows:
+            for code in user_codes:
+                if codes is None or code in codes:
+                    counts[code] = counts.get(code, 0) + 1
+        return counts
+
+    def get_summary_fingerprint(self, code):
+        return self.fingerprints.get(code, "")
+
+
+@pytest.fixture
+def env(monkeypatch):
+    anns = FakeAnnouncements()
+    subs = FakeSubscriptions([("u1", ["600000", "000001"]), ("u2", ["600000", "300750"])])
+    monkeypatch.setattr(mod_watch, "announcement_service", anns)
+    monkeypatch.setattr(mod_watch, "subscription_service", subs)
+    return anns, subs
+
+
+@pytest.mark.asyncio
+async def test_only_subscribed_codes_with_new_notices_are_enqueued(env):
+    anns, _ = env
+    watcher = NoticeWatcher(cooldown_seconds=0, queue_size=10)
+    anns.keys = {"600000": {"a"}, "000001": {"b"}, "999999": {"c"}}
+    assert await watcher.poll_once() == ["000001", "600000"]
+    assert anns.synced == [watcher._today()]
+
+    # 已在队列中的股票不重复入队；未变化的股票不入队
+    anns.keys["600000"] = {"a", "d"}
+    assert await watcher.poll_once() == []
+
+    watcher._queued.clear()
+    anns.keys["000001"] = {"b", "e"}
+    anns.keys["300750"] = {"f"}
+    assert await watcher.poll_once() == ["000001", "300750"]
+
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_skips_comparison(env):
+    anns, _ = env
+    watcher = NoticeWatcher(cooldown_seconds=0, queue_size=10)
+    anns.keys = {"600000": {"a"}}
+    anns.sync_ok = False
+    assert await watcher.poll_once() == []
+    assert watcher._seen == {}
+
+    anns.sync_ok = True
+    assert await watcher.poll_once() == ["600000"]
+
+@pytest.mark.asyncio
+async def test_cooldown_and_full_queue_defer_codes_to_next_poll(env):
+    anns, _ = env
+    watcher = NoticeWatcher(cooldown_seconds=0.2, queue_size=1)
+    anns.keys = {"600000": {"a"}, "000001": {"b"}}
+    assert await watcher.poll_once() == ["000001"]
+    assert watcher.stats()["deferred"] == 1  # 队列已满
+
+    watcher._get_queue().get_nowait()
+    watcher._queued.clear()
+    anns.keys["000001"] = {"b", "c"}
+    # 000001 处于冷却期，延后；600000 入队
+    assert await watcher.poll_once() == ["600000"]
+    assert watcher._deferred == {"000001"}
+
+    watcher._get_queue().get_nowait()
+    watcher._queued.clear()
+    await asyncio.sleep(0.25)
+    assert await watcher.poll_once() == ["000001"]
+
+
+@pytest.mark.asyncio
+async def test_worker_submits_job_only_when_fingerprint_changed(env, monkeypatch):
+    anns, subs = env
+    submitted = []
+
+    class FakeJobs:
+        def submit(self, code):
+            submitted.append(code)
+            return type("Job", (), {"job_id": code})(), True
+
+        async def wait(self, job_id, timeout=None):
+            return None
+
+    monkeypatch.setattr(mod_watch, "summary_job_manager", FakeJobs())
+    anns.keys = {"600000": {"a"}, "000001": {"b"}}
+    subs.fingerprints["000001"] = AnnouncementService.announcement_fingerprint(
+        (await anns.get_window_announcements("000001"))[0].announcements)
+
+    watcher = NoticeWatcher(cooldown_seconds=0)
+    await watcher.poll_once()
+    task = asyncio.create_task(watcher._worker())
+    await asyncio.wait_for(watcher._get_queue().join(), timeout=1)
+    task.cancel()
+    assert submitted == ["600000"]
+    assert watcher.stats()["unchanged"] == 1
@@ -0,0 +1,165 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import announcement_service as mod_ann
+from app.services.announcement_archive import AnnouncementArchive
+from app.services.announcement_service import AnnouncementService
+from app.services.content_cache import ContentCache
+from app.services.pdf_engine import PdfExtractionEngine, extract_pdf_text
+
+
+def make_pdf(pages):
+    """构造每页一行英文文本的最小PDF"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+PDF = make_pdf(["Page one text", "Page two text", "Page three text"])
+
+
+def test_parse_pdf_stops_once_budget_is_collected():
+    data = extract_pdf_text(PDF, 5, 50)
+    assert data["text"] == "Pageonetext"
+    assert data["complete"] is False
+    assert (data["pages_parsed"], data["total_pages"]) == (1, 3)
+
+    data = extract_pdf_text(PDF, 10_000, 50)
+    assert data["text"] == "PageonetextPagetwotextPagethreetext"
+    assert data["complete"] is True
+
+    data = extract_pdf_text(PDF, 10_000, 2)
+    assert data["text"] == "PageonetextPagetwotext"
+    assert data["complete"] is False
+
+
+@pytest.mark.asyncio
+async def test_process_pool_engine_returns_text_and_stats():
+    engine = PdfExtractionEngine(workers=1, timeout_seconds=60, max_pages=50, max_tasks_per_child=1)
+    try:
+        for _ in range(2):  # 每个工作进程处理 1 个文档后重启
+            result = await engine.extract(PDF, 10_000)
+            assert result.text == "PageonetextPagetwotextPagethreetext"
+            assert result.pages_parsed == 3
+            assert result.elapsed_ms >= result.parse_ms > 0
+        assert engine.stats()["documents"] == 2
+    finally:
+        engine.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_engine_timeout_rebuilds_pool(monkeypatch):
+    import time as _time
+    from app.services import pdf_engine as mod_engine
+
+    engine = PdfExtractionEngine(workers=0, timeout_seconds=0.1)
+    monkeypatch.setattr(mod_engine, "extract_pdf_text", lambda *a: _time.sleep(0.5))
+    with pytest.raises(asyncio.TimeoutError):
+        await engine.extract(PDF, 10)
+    assert engine.stats()["timeouts"] == 1
+    assert engine._executor is None
+
+
+@pytest.mark.asyncio
+async def test_engine_timeout_does_not_cancel_healthy_extractions(monkeypatch):
+    import time as _time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import pdf_engine as mod_engine
+
+    def fake_extract(pdf_bytes, max_chars, max_pages):
+        _time.sleep(float(pdf_bytes))  # 以“字节”内容作为解析耗时
+        return {"text": pdf_bytes.decode()}
+
+    engine = PdfExtractionEngine(workers=0, timeout_seconds=1.0)
+    monkeypatch.setattr(mod_engine, "extract_pdf_text", fake_extract)
+    old = engine._executor = ThreadPoolExecutor(max_workers=2)
+
+    async def submit(delay, pdf):
+        await asyncio.sleep(delay)
+        return await engine.extract(pdf, 10)
+
+    # 卡住的文档占用一个线程；超时发生时一个正常文档在运行、另一个在排队
+    stuck, running, queued = await asyncio.gather(
+        submit(0, b"1.5"), submit(0.8, b"0.4"), submit(0.85, b"0.1"), return_exceptions=True
+    )
+    assert isinstance(stuck, asyncio.TimeoutError)
+    assert running.text == "0.4"
+    assert queued.text == "0.1"
+    assert engine._executor is not old
+
+    # 退役的旧线程池在剩余任务结束后被关闭
+    await asyncio.wait_for(asyncio.gather(*engine._retiring.values()), 3)
+    assert old not in engine._pending
+    engine.shutdown()
+
+
+@pytest.fixture
+def svc(tmp_path):
+    db = str(tmp_path / "announcements.db")
+    return AnnouncementService(archive=AnnouncementArchive(db), contents=ContentCache(db))
+
+
+@pytest.mark.asyncio
+async def test_pdf_entry_downloads_async_and_reparses_when_truncation_grows(monkeypatch, svc):
+    downloads = []
+
+    def handler(request):
+        downloads.append(str(request.url))
+        return httpx.Response(200, content=PDF)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(mod_ann, "get_http_client", lambda: client)
+    monkeypatch.setattr(mod_ann, "pdf_engine", PdfExtractionEngine(workers=0))
+    monkeypatch.setattr(settings, "pdf_parse_max_chars", 5)
+    monkeypatch.setattr(settings, "pdf_content_max_chars", 5)
+
+    entry = await svc._get_pdf_entry("https://notice/1", "https://pdf/1.pdf?x=1")
+    assert entry.content == "Pageonetext" and entry.complete is False
+    assert downloads == ["https://pdf/1.pdf"]
+
+    # 截断长度仍在已解析范围内：命中缓存
+    monkeypatch.setattr(settings, "pdf_content_max_chars", 8)
+    await svc._get_pdf_entry("https://notice/1", "https://pdf/1.pdf")
+    assert len(downloads) == 1
+
+    # 超出提前终止的解析长度：重新解析
+    monkeypatch.setattr(settings, "pdf_content_max_chars", 50)
+    entry = await svc._get_pdf_entry("https://notice/1", "https://pdf/1.pdf")
+    assert entry.complete is True
+    assert len(downloads) == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pdf_download_size_limit(monkeypatch, svc):
+    sizes = {"/small.pdf": 2048, "/big.pdf": 1024 * 1024 + 1}
+    client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda r: httpx.Response(200, content=b"x" * sizes[r.url.path])))
+    monkeypatch.setattr(mod_ann, "get_http_client", lambda: client)
+    monkeypatch.setattr(settings, "pdf_max_download_mb", 1)
+    assert await svc._download_pdf("https://pdf/small.pdf") == b"x" * 2048
+    assert await svc._download_pdf("https://pdf/big.pdf") is None
+    await client.aclose()
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Announcement, AnnouncementList
+from app.services import refresh_scheduler as mod_sched
+from app.services.announcement_service import AnnouncementService
+from app.services.refresh_scheduler import RefreshScheduler
+
+
+class FakeSubscriptions:
+    def __init__(self, rows, timestamps=None, fingerprints=None):
+        self.rows = rows
+        self.timestamps = timestamps or {}
+        self.fingerprints = fingerprints or {}
+        self.saved = []
+        self.touched = []
+        self.batches = []
+
+    def subscriber_counts(self, codes=None):
+        counts = {}
+        for _, user_codes in self.rows:
+            for code in set(user_codes):
+                counts[code] = counts.get(code, 0) + 1
+        return counts
+
+    def get_summary_timestamps(self, codes):
+        return {c: self.timestamps[c] for c in codes if c in self.timestamps}
+
+    def save_summary(self, code, data, fingerprint=""):
+        self.saved.append(code)
+        self.fingerprints[code] = fingerprint
+
+    def save_summaries(self, items):
+        self.batches.append(len(items))
+        for code, data, fingerprint in items:
+            self.save_summary(code, data, fingerprint)
+
+    def touch_summaries(self, codes):
+        self.touched.extend(codes)
+
+    def get_summary_fingerprint(self, code):
+        return self.fingerprints.get(code, "")
+
+    def touch_summary(self, code):
+        self.touched.append(code)
+
+
+def _anns(*urls):
+    return AnnouncementList(
+        announcements=[Announcement(id=u, stock_code="600000", stock_name="", title=u, publish_date="2024-01-01",
+                                    category="其他", url=u) for u in urls],
+        total=len(urls),
+    )
+
+
+async def _fake_get(code):
+    return _anns(f"{code}-1"), True
+
+
+def test_plan_orders_by_subscriber_count():
+    counts = {"600000": 1, "000001": 3, "300750": 1}
+    assert RefreshScheduler.plan(counts) == [("000001", 3), ("300750", 1), ("600000", 1)]
+
+
+@pytest.mark.asyncio
+async def test_run_refreshes_each_code_once_concurrently_and_reports(monkeypatch):
+    recent = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    stale = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    subs = FakeSubscriptions(
+        rows=[("u1", ["000001", "600000", "300750"]), ("u2", ["000001", "000002"]), ("u3", ["000001"])],
+        timestamps={"300750": recent, "600000": stale},
+    )
+    calls = []
+
+    async def fake_summarize(code):
+        calls.append(code)
+        await asyncio.sleep(0.2)
+        if code == "000002":
+            raise RuntimeError("boom")
+        return {"content": code}, code
+
+    monkeypatch.setattr(mod_sched, "subscription_service", subs)
+    monkeypatch.setattr(mod_sched.announcement_service, "get_window_announcements", _fake_get)
+    monkeypatch.setattr(mod_sched.announcement_service, "summarize_with_fingerprint", fake_summarize)
+
+    start = time.monotonic()
+    report = await RefreshScheduler(concurrency=3, fresh_seconds=3600).run()
+    assert time.monotonic() - start < 0.35
+
+    assert calls[0] == "000001"  # 订阅人数最多的先处理
+    assert sorted(calls) == ["000001", "000002", "600000"]
+    assert sorted(subs.saved) == ["000001", "600000"]
+    assert (report.total, report.refreshed, report.skipped, report.failed) == (4, 2, 1, 1)
+    by_code = {r.stock_code: r for r in report.results}
+    assert by_code["300750"].status == "skipped"
+    assert by_code["000002"].error == "boom"
+    assert by_code["000001"].subscribers == 3 and by_code["000001"].duration_ms >= 150
+    assert report.wall_ms > 0
+
+
+@pytest.mark.asyncio
+async def test_unchanged_announcement_set_only_bumps_timestamp(monkeypatch):
+    current = {"600000": _anns("a", "b"), "000001": _anns("c")}
+    subs = FakeSubscriptions(
+        rows=[("u1", ["600000", "000001"])],
+        fingerprints={
+            # 顺序不同但集合相同
+            "600000": AnnouncementService.announcement_fingerprint(_anns("b", "a").announcements),
+            "000001": AnnouncementService.announcement_fingerprint(_anns("x").announcements),
+        },
+    )
+    calls = []
+
+    async def fake_get(code):
+        return current[code], True
+
+    async def fake_summarize(code):
+        calls.append(code)
+        return {"content": code}, AnnouncementService.announcement_fingerprint(current[code].announcements)
+
+    monkeypatch.setattr(mod_sched, "subscription_service", subs)
+    monkeypatch.setattr(mod_sched.announcement_service, "get_window_announcements", fake_get)
+    monkeypatch.setattr(mod_sched.announcement_service, "summarize_with_fingerprint", fake_summarize)
+
+    report = await RefreshScheduler(fresh_seconds=0).run()
+    assert calls == ["000001"]
+    assert subs.touched == ["600000"]
+    assert (report.refreshed, report.unchanged) == (1, 1)
+
+    # 第二次运行：两个代码都无变化，不调用LLM
+    calls.clear()
+    report = await RefreshScheduler(fresh_seconds=0).run()
+    assert calls == []
+    assert report.unchanged == 2
+
+
+def test_save_summary_records_fingerprint_and_migrates_old_db(tmp_path, monkeypatch):
+    import sqlite3
+    from app.services import subscription_service as mod_sub
+
+    db = str(tmp_path / "subscriptions.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, from_user TEXT NOT NULL UNIQUE, "
+                 "stock_code_list TEXT NOT NULL DEFAULT '[]', updated_datetime TEXT)")
+    conn.execute("CREATE TABLE subscription_summaries (stock_code TEXT PRIMARY KEY, summary_updated_datetime TEXT)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(tmp_path / "summaries"))
+    svc = mod_sub.SubscriptionService(db)
+    assert svc.get_summary_fingerprint("600000") == ""
+    svc.save_summary("600000", {"content": "x"}, "fp1")
+    assert svc.get_summary_fingerprint("600000") == "fp1"
+    before = svc.get_summary_timestamps(["600000"])["600000"]
+    svc.touch_summary("600000")
+    assert svc.get_summary_timestamps(["600000"])["600000"] >= before
+    assert svc.get_summary_fingerprint("600000") == "fp1"
+
+
+@pytest.mark.asyncio
+async def test_summary_writes_are_batched(monkeypatch):
+    from app.core.config import settings
+
+    subs = FakeSubscriptions(rows=[("u1", [f"60000{i}" for i in range(5)])])
+
+    async def fake_summarize(code):
+        return {"content": code}, code
+
+    monkeypatch.setattr(settings, "subscription_write_batch_size", 2)
+    monkeypatch.setattr(mod_sched, "subscription_service", subs)
+    monkeypatch.setattr(mod_sched.announcement_service, "get_window_announcements", _fake_get)
+    monkeypatch.setattr(mod_sched.announcement_service, "summarize_with_fingerprint", fake_summarize)
+
+    report = await RefreshScheduler(concurrency=1, fresh_seconds=0).run()
+    assert report.refreshed == 5
+    assert subs.batches == [2, 2, 1]
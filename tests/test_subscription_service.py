@@ -0,0 +1,212 @@
+import json
+import sqlite3
+
+import pytest
+
+from app.services import subscription_service as mod_sub
+from app.services.subscription_service import SubscriptionService
+
+
+@pytest.fixture
+def svc(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(tmp_path / "summaries"))
+    return SubscriptionService(str(tmp_path / "subscriptions.db"))
+
+
+def test_database_is_created_on_first_use_not_on_construction(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(tmp_path / "summaries"))
+    db = tmp_path / "nested" / "subscriptions.db"
+    svc = SubscriptionService(str(db))
+    assert not db.exists()
+    assert svc.list_codes("u1") == []
+    assert db.exists()
+
+
+def test_noop_writes_do_not_hold_the_write_lock(svc, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(mod_sub.settings, "sqlite_busy_timeout_seconds", 0.2)
+    svc.add_code("u1", "600000")
+    assert svc.add_code("u1", "600000") == (True, "600000 已在订阅列表")
+    assert svc.del_code("u1", "000001") == (True, "000001 不在订阅列表")
+    # 未提交就退出的连接同样回滚
+    with svc._db.connect() as conn:
+        conn.execute("UPDATE subscriptions SET updated_datetime='x'")
+    assert not svc._db.connection().in_transaction
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(svc.add_code, "u2", "600000").result() == (True, "已订阅 600000")
+        assert pool.submit(svc.del_code, "u1", "600000").result() == (True, "已取消订阅 600000")
+    assert svc.subscribers_of("600000") == ["u2"]
+
+
+def test_add_del_and_reverse_index(svc):
+    assert svc.add_code("u1", "600000") == (True, "已订阅 600000")
+    assert svc.add_code("u1", "600000") == (True, "600000 已在订阅列表")
+    svc.add_code("u1", "000001")
+    svc.add_code("u2", "600000")
+    svc.add_code("u3", "600000")
+    assert svc.add_code("u1", "abc")[0] is False
+
+    assert svc.list_codes("u1") == ["000001", "600000"]
+    assert svc.subscriber_counts() == {"000001": 1, "600000": 3}
+    assert svc.subscriber_counts(["600000", "300750"]) == {"600000": 3}
+    assert svc.subscribers_of("600000") == ["u1", "u2", "u3"]
+    assert svc.subscribers_of("600000", after="u1", limit=1) == ["u2"]
+    assert svc.all_rows() == [("u1", ["000001", "600000"]), ("u2", ["600000"]), ("u3", ["600000"])]
+
+    page = svc.list_subscriptions(limit=2)
+    assert page == [("u1", "000001"), ("u1", "600000")]
+    assert svc.list_subscriptions(after=page[-1], limit=10) == [("u2", "600000"), ("u3", "600000")]
+
+    assert svc.del_code("u2", "600000") == (True, "已取消订阅 600000")
+    assert svc.del_code("u2", "600000") == (True, "600000 不在订阅列表")
+    assert svc.subscribers_of("600000") == ["u1", "u3"]
+
+
+def test_migrates_json_subscription_lists_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(tmp_path / "summaries"))
+    db = str(tmp_path / "subscriptions.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, from_user TEXT NOT NULL UNIQUE, "
+                 "stock_code_list TEXT NOT NULL DEFAULT '[]', updated_datetime TEXT)")
+    conn.execute("CREATE TABLE subscription_summaries (stock_code TEXT PRIMARY KEY, summary_updated_datetime TEXT)")
+    conn.executemany("INSERT INTO subscriptions(from_user, stock_code_list) VALUES(?,?)", [
+        ("u1", json.dumps(["600000", "000001"])),
+        ("u2", json.dumps(["600000", "bad"])),
+        ("u3", "not json"),
+    ])
+    conn.commit()
+    conn.close()
+
+    svc = SubscriptionService(db)
+    assert svc.subscriber_counts() == {"000001": 1, "600000": 2}
+    assert svc.list_codes("u2") == ["600000"]
+    # 再次打开不会重复迁移
+    svc.add_code("u3", "300750")
+    svc = SubscriptionService(db)
+    assert svc.subscriber_counts() == {"000001": 1, "300750": 1, "600000": 2}
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 3
+
+
+def test_connections_are_reused_per_thread_in_wal_mode(svc):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with svc._conn() as a, svc._conn() as b:
+        assert a is b
+        assert a.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert a.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    # 执行器线程并发写入
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda i: svc.add_code(f"u{i}", "600000"), range(20)))
+    assert svc.subscriber_counts() == {"600000": 20}
+
+
+def test_save_summaries_writes_batch_in_one_transaction(svc):
+    svc.save_summaries([("600000", {"content": "a"}, "f1"),
+                        ("000001", {"content": "b"}, "")])
+    assert svc.load_summary_text("600000") == "a"
+    assert svc.get_summary_fingerprint("600000") == "f1"
+    assert set(svc.get_summary_timestamps(["600000", "000001"])) == {"600000", "000001"}
+
+    # 写入失败时回滚，不影响连接后续使用
+    with pytest.raises(sqlite3.Error):
+        with svc._db.transaction() as conn:
+            conn.execute("UPDATE subscription_summaries SET summary_updated_datetime='x'")
+            conn.execute("INSERT INTO missing_table VALUES (1)")
+    assert svc.get_summary_timestamps(["600000"])["600000"] != "x"
+
+
+def test_summary_versions_keep_history_and_prune(svc, monkeypatch):
+    monkeypatch.setattr(mod_sub.settings, "summary_history_keep", 3)
+    for i in range(5):
+        svc.save_summary("600000", {"content": f"v{i}"}, f"f{i}")
+    svc.save_summary("000001", {"summary": "other"})
+
+    assert svc.load_summary_text("600000") == "v4"
+    # 指纹只存于表字段，不出现在总结结果中
+    assert svc.get_summary("600000") == {"content": "v4"}
+    assert svc.get_summary_fingerprint("600000") == "f4"
+    assert svc.get_summary("300750") is None
+    history = svc.summary_history("600000")
+    assert [h["data"]["content"] for h in history] == ["v4", "v3", "v2"]
+    assert [h["data"]["content"] for h in svc.summary_history("600000", limit=1)] == ["v4"]
+    assert svc.load_summary_text("000001") == "other"
+    assert not (mod_sub.os.path.exists(mod_sub.SUMMARY_DIR) and mod_sub.os.listdir(mod_sub.SUMMARY_DIR))
+
+
+def test_migrates_summary_json_directory(tmp_path, monkeypatch):
+    summary_dir = tmp_path / "summaries"
+    summary_dir.mkdir()
+    monkeypatch.setattr(mod_sub, "SUMMARY_DIR", str(summary_dir))
+    (summary_dir / "600000.json").write_text(json.dumps({"content": "旧总结", "model_info": {"model": "m"}},
+                                                        ensure_ascii=False, indent=2), encoding="utf-8")
+    (summary_dir / "000001.json").write_text("broken", encoding="utf-8")
+    db = str(tmp_path / "subscriptions.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, from_user TEXT NOT NULL UNIQUE, "
+                 "stock_code_list TEXT NOT NULL DEFAULT '[]', updated_datetime TEXT)")
+    conn.execute("CREATE TABLE subscription_summaries (stock_code TEXT PRIMARY KEY, summary_updated_datetime TEXT)")
+    conn.execute("INSERT INTO subscription_summaries VALUES('600000', '2024-01-01T00:00:00+00:00')")
+    conn.commit()
+    conn.close()
+
+    svc = SubscriptionService(db)
+    assert svc.load_summary_text("600000") == "旧总结"
+    assert svc.get_summary("600000")["model_info"] == {"model": "m"}
+    assert svc.summary_history("600000")[0]["created_datetime"] == "2024-01-01T00:00:00+00:00"
+    assert svc.load_summary_text("000001") == ""
+    # 再次打开不会重复导入
+    svc = SubscriptionService(db)
+    assert len(svc.summary_history("600000")) == 1
+
+
+def test_read_cache_serves_hot_queries_and_invalidates_on_write(svc, monkeypatch):
+    svc.save_summary("600000", {"content": "v1"})
+    assert svc.load_summary_text("600000") == "v1"
+    ts1 = svc.get_summary_timestamps(["600000", "000001"])
+    assert set(ts1) == {"600000"}
+
+    # 命中缓存时不再读数据库
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected storage access")
+
+    with monkeypatch.context() as m:
+        m.setattr(svc, "_read_summary_text", fail)
+        m.setattr(svc, "_read_summary_timestamps", fail)
+        for _ in range(3):
+            assert svc.load_summary_text("600000") == "v1"
+            assert svc.get_summary_timestamps(["600000", "000001"]) == ts1
+
+    # 保存后精确失效
+    svc.save_summary("600000", {"content": "v2"})
+    assert svc.load_summary_text("600000") == "v2"
+    svc.touch_summary("600000")
+    assert svc.get_summary_timestamps(["600000"])["600000"] >= ts1["600000"]
+
+    svc.add_code("u1", "600000")
+    assert svc.list_codes("u1") == ["600000"]
+    svc.add_code("u1", "000001")
+    assert svc.list_codes("u1") == ["000001", "600000"]
+    svc.del_code("u1", "600000")
+    assert svc.list_codes("u1") == ["000001"]
+    assert svc.cache_stats()["summary_text"]["hits"] >= 3
+
+
+def test_lru_cache_bounds_and_ignores_stale_loads():
+    from app.services.lru import LRUCache
+
+    cache = LRUCache(2)
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_load(key, lambda k=key: k.upper())
+    assert list(cache._data) == ["a", "c"]  # b 最久未使用被淘汰
+
+    # 加载期间发生失效：结果不写入缓存
+    def loader():
+        cache.invalidate(["d"])
+        return "stale"
+
+    assert cache.get_or_load("d", loader) == "stale"
+    assert "d" not in cache._data
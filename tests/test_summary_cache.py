@@ -0,0 +1,40 @@
+import pytest
+
+from app.core.config import settings
+from app.services.summary_cache import SummaryCache
+
+
+def test_summary_cache_key_includes_hash_model_prompt(tmp_path):
+    cache = SummaryCache(str(tmp_path / "announcements.db"))
+    cache.put("u1", "h1", "qwen-plus", "v1", "总结")
+    assert cache.get("u1", "h1", "qwen-plus", "v1") == "总结"
+    assert cache.get("u1", "h2", "qwen-plus", "v1") is None
+    assert cache.get("u1", "h1", "qwen-max", "v1") is None
+    assert cache.get("u1", "h1", "qwen-plus", "v2") is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_only_summarizes_new_announcements(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(1), make_ann(2)]
+    llm_calls = []
+
+    async def fake_extract(url):
+        return f"正文-{url}"
+
+    def fake_llm(content):
+        llm_calls.append(content)
+        return f"摘要({content[:6]})"
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", False)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(fake_llm)
+
+    await svc.summarize_announcements("600000")
+    assert len(llm_calls) == 3  # 2 条单条总结 + 1 次汇总
+
+    anns.append(make_ann(3))
+    llm_calls.clear()
+    await svc.summarize_announcements("600000")
+    assert llm_calls[0] == "正文-u3"
+    assert len(llm_calls) == 2  # 仅新公告 + 汇总
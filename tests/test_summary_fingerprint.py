@@ -0,0 +1,29 @@
+import pytest
+
+from app.core.config import settings
+from app.services.announcement_service import AnnouncementService
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_only_when_every_item_succeeded(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(1), make_ann(2)]
+    failing = {"u2"}
+
+    async def fake_extract(url):
+        if url in failing:
+            raise RuntimeError("下载失败")
+        return f"正文-{url}"
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", False)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(lambda content: "摘要")
+
+    result, fingerprint = await svc.summarize_with_fingerprint("600000")
+    assert fingerprint == ""
+    assert "announcement_fingerprint" not in result
+
+    failing.clear()
+    _, fingerprint = await svc.summarize_with_fingerprint("600000")
+    assert fingerprint == AnnouncementService.announcement_fingerprint(anns)
+    assert "announcement_fingerprint" not in await svc.summarize_announcements("600000")
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.routers import announcements as mod_router
+from app.services import summary_jobs as mod_jobs
+from app.services.summary_jobs import SummaryJobManager
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    saved = {}
+    calls = []
+    gate = asyncio.Event()
+
+    async def fake_summarize(code):
+        calls.append(code)
+        await gate.wait()
+        if code == "000000":
+            raise RuntimeError("boom")
+        return {"content": f"汇总-{code}"}, f"fp-{code}"
+
+    monkeypatch.setattr(mod_jobs.announcement_service, "summarize_with_fingerprint", fake_summarize)
+    monkeypatch.setattr(mod_jobs.subscription_service, "save_summary",
+                        lambda code, data, fingerprint: saved.update({code: data}))
+    return saved, calls, gate
+
+
+@pytest.mark.asyncio
+async def test_duplicate_submissions_coalesce_and_result_is_saved(fakes):
+    saved, calls, gate = fakes
+    manager = SummaryJobManager(concurrency=2)
+    job1, created1 = manager.submit("600000")
+    job2, created2 = manager.submit("600000")
+    assert created1 is True and created2 is False
+    assert job1.job_id == job2.job_id
+
+    gate.set()
+    job = await manager.wait(job1.job_id, timeout=2)
+    assert job.status == "succeeded"
+    assert job.result == {"content": "汇总-600000"}
+    assert saved == {"600000": {"content": "汇总-600000"}}
+    assert calls == ["600000"]
+
+    # 任务结束后再次提交会新建任务
+    job3, created3 = manager.submit("600000")
+    assert created3 is True and job3.job_id != job1.job_id
+    await manager.wait(job3.job_id, timeout=2)
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(fakes):
+    saved, _, gate = fakes
+    gate.set()
+    manager = SummaryJobManager()
+    job, _ = manager.submit("000000")
+    job = await manager.wait(job.job_id, timeout=2)
+    assert job.status == "failed"
+    assert job.error == "boom"
+    assert saved == {}
+
+
+@pytest.mark.asyncio
+async def test_job_endpoints_submit_poll_and_fetch_result(monkeypatch, fakes):
+    _, _, gate = fakes
+    manager = SummaryJobManager()
+    monkeypatch.setattr(mod_router, "summary_job_manager", manager)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post("/api/v1/announcements/600000/sum/jobs")
+        assert resp.status_code == 202
+        job_id = resp.json()["data"]["job_id"]
+
+        resp = await client.get(f"/api/v1/summary-jobs/{job_id}/result")
+        assert resp.status_code == 409
+
+        gate.set()
+        await manager.wait(job_id, timeout=2)
+        status = (await client.get(f"/api/v1/summary-jobs/{job_id}")).json()["data"]
+        assert status["status"] == "succeeded"
+        resp = await client.get(f"/api/v1/summary-jobs/{job_id}/result")
+        assert resp.json()["data"] == {"content": "汇总-600000"}
+
+        assert (await client.get("/api/v1/summary-jobs/unknown")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_endpoints_do_not_expose_notify_users(monkeypatch, fakes):
+    _, _, gate = fakes
+    manager = SummaryJobManager()
+    monkeypatch.setattr(mod_router, "summary_job_manager", manager)
+    monkeypatch.setattr(mod_jobs.wechat_push, "enqueue", lambda *args: None)
+    job, _ = manager.submit("600000", notify_user="oUser1")
+    assert job.notify_users == ["oUser1"]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        submitted = (await client.post("/api/v1/announcements/600000/sum/jobs")).json()["data"]
+        status = (await client.get(f"/api/v1/summary-jobs/{job.job_id}")).json()["data"]
+    assert submitted["job_id"] == job.job_id
+    assert "notify_users" not in submitted and "notify_users" not in status
+    assert "result" not in status
+    gate.set()
+    await manager.wait(job.job_id, timeout=2)
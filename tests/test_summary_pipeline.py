@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_concurrently_and_keeps_order(monkeypatch, svc, make_ann, serve_window, install_llm):
+    anns = [make_ann(1), make_ann(2), make_ann(3), make_ann(4)]
+    delays = {"u1": 0.3, "u2": 0.1, "u3": 0.2, "u4": 0.0}
+    rollup_inputs = []
+
+    async def fake_extract(url):
+        await asyncio.sleep(delays[url])
+        if url == "u3":
+            raise RuntimeError("extract failed")
+        return f"正文-{url}"
+
+    def fake_llm(content):
+        if content.startswith("正文-"):
+            return f"摘要-{content[3:]}"
+        rollup_inputs.append(content)
+        return "汇总"
+
+    monkeypatch.setattr(settings, "summary_extract_concurrency", 4)
+    monkeypatch.setattr(settings, "llm_batch_enabled", False)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    install_llm(fake_llm)
+
+    start = time.monotonic()
+    result = await svc.summarize_announcements("600000")
+    assert time.monotonic() - start < 0.55
+    assert result["content"] == "汇总"
+    # 汇总输入按公告原顺序，与完成顺序无关；失败的公告被跳过
+    assert rollup_inputs == ["摘要-u1\n摘要-u2\n摘要-u4\n"]
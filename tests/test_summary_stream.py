@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.exceptions import StockAPIException
+from app.main import app
+from app.routers import announcements as mod_router
+from app.services import announcement_service as mod_ann
+from app.services.llm import LLMClient
+
+
+class FakeStreamLLM:
+    model = "qwen-plus"
+
+    async def complete(self, content):
+        await asyncio.sleep(0.2 if content.endswith("u1") else 0)
+        return f"摘要-{content[3:]}"
+
+    async def stream(self, content):
+        for part in ("汇总", "完成"):
+            yield part
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = block.split("\n")
+        if lines[0].startswith(":"):
+            events.append(("ping", None))
+            continue
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_items_as_completed_then_rollup_tokens(monkeypatch, svc, make_ann, serve_window):
+    anns = [make_ann(1), make_ann(2)]
+
+    async def fake_extract(url):
+        return f"正文-{url}"
+
+    monkeypatch.setattr(settings, "llm_batch_enabled", False)
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_extract_announcement_content", fake_extract)
+    monkeypatch.setattr(mod_ann, "llm_client", FakeStreamLLM())
+
+    events = [e async for e in svc.summarize_announcements_stream("600000")]
+    names = [name for name, _ in events]
+    assert names == ["progress", "item", "progress", "item", "progress", "progress", "token", "token", "done"]
+    # 先完成的公告先推送
+    assert [data["url"] for name, data in events if name == "item"] == ["u2", "u1"]
+    assert events[-1][1]["content"] == "汇总完成"
+
+
+@pytest.mark.asyncio
+async def test_stream_raises_when_item_producer_fails(monkeypatch, svc, make_ann, serve_window):
+    anns = [make_ann(1), make_ann(2)]
+
+    async def broken_items(announcements, on_item=None):
+        on_item(0, "摘要-u1")
+        await asyncio.sleep(0)
+        raise RuntimeError("pipeline crashed")
+
+    serve_window(anns)
+    monkeypatch.setattr(svc, "_summarize_items", broken_items)
+
+    events = []
+
+    async def consume():
+        async for event in svc.summarize_announcements_stream("600000"):
+            events.append(event)
+
+    with pytest.raises(StockAPIException, match="pipeline crashed"):
+        await asyncio.wait_for(consume(), 5)
+    assert [name for name, _ in events] == ["progress", "item", "progress"]
+
+
+def test_sse_endpoint_streams_events_with_heartbeat_and_error(monkeypatch):
+    async def fake_stream(code):
+        yield "progress", {"stage": "announcements", "done": 0, "total": 1}
+        await asyncio.sleep(0.25)
+        yield "done", {"content": "汇总"}
+
+    monkeypatch.setattr(settings, "sse_heartbeat_seconds", 0.1)
+    monkeypatch.setattr(mod_router.announcement_service, "summarize_announcements_stream", fake_stream)
+    client = TestClient(app)
+    response = client.post("/api/v1/announcements/600000/sum/stream")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    events = _parse_sse(response.text)
+    assert events[0][0] == "progress"
+    assert ("ping", None) in events
+    assert events[-1] == ("done", {"content": "汇总"})
+
+    async def failing_stream(code):
+        yield "progress", {"stage": "announcements", "done": 0, "total": 1}
+        raise mod_ann.StockAPIException("AI智能总结失败: boom", "SUMMARIZE_ERROR")
+
+    monkeypatch.setattr(mod_router.announcement_service, "summarize_announcements_stream", failing_stream)
+    events = _parse_sse(client.post("/api/v1/announcements/600000/sum/stream").text)
+    assert events[-1] == ("error", {"code": "SUMMARIZE_ERROR", "message": "AI智能总结失败: boom"})
+
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_disconnect_cancels_pending_event(monkeypatch):
+    closed = []
+
+    async def slow_stream():
+        try:
+            yield "progress", {"stage": "announcements", "done": 0, "total": 1}
+            await asyncio.sleep(10)
+            yield "done", {"content": "汇总"}
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(settings, "sse_heartbeat_seconds", 0.1)
+    stream = mod_router._sse_stream(slow_stream())
+    assert (await stream.__anext__()).startswith("event: progress")
+    # 心跳时 __anext__ 仍在等待下一事件，此时客户端断开
+    assert await stream.__anext__() == ": ping\n\n"
+    await asyncio.wait_for(stream.aclose(), 1)
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_llm_stream_yields_incremental_deltas(monkeypatch):
+    body = "".join(
+        f"id:{n}\nevent:result\ndata:{json.dumps(chunk, ensure_ascii=False)}\n\n"
+        for n, chunk in enumerate([
+            {"output": {"choices": [{"message": {"content": "浦发"}}]}},
+            {"output": {"choices": [{"message": {"content": "银行"}}]},
+             "usage": {"input_tokens": 7, "output_tokens": 4}},
+        ])
+    )
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setattr(settings, "llm_api_key", "sk-test")
+    client = LLMClient(transport=httpx.MockTransport(handler))
+    assert [d async for d in client.stream("正文")] == ["浦发", "银行"]
+    assert seen[0].headers["X-DashScope-SSE"] == "enable"
+    assert b'"incremental_output": true' in seen[0].content
+    assert client.stats()["completion_tokens"] == 4
+    await client.aclose()
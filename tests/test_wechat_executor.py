@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.core.executor import BoundedExecutor, ExecutorBusyError
+from app.main import app
+from app.routers import wechat as wechat_mod
+
+
+def build_text_xml(from_user: str, content: str) -> bytes:
+    return (
+        f"<xml><ToUserName><![CDATA[server]]></ToUserName><FromUserName><![CDATA[{from_user}]]></FromUserName>"
+        f"<CreateTime>{int(time.time())}</CreateTime><MsgType><![CDATA[text]]></MsgType>"
+        f"<Content><![CDATA[{content}]]></Content><MsgId>1</MsgId></xml>"
+    ).encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_rejects_when_full_and_times_out():
+    executor = BoundedExecutor(max_workers=1, max_pending=1, name="test")
+    release = threading.Event()
+    try:
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(lambda: None)
+
+        # 超时后调用方返回，但名额在线程结束前不释放
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.shield(first), 0.05)
+        assert executor.stats()["inflight"] == 2
+        release.set()
+        assert await second == "queued"
+        await first
+        assert executor.stats()["inflight"] == 0
+        assert executor.stats()["rejected"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_slow_blocking_command_gets_fallback_reply(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(wechat_mod, "_verify", lambda a, b, c: True)
+    monkeypatch.setattr(wechat_mod, "handle_query", lambda user, content: release.wait() and "late")
+    monkeypatch.setattr(wechat_mod.settings, "wechat_op_timeout_seconds", 0.2)
+    monkeypatch.setattr(wechat_mod, "wechat_executor", BoundedExecutor(1, 0, name="test"))
+    params = {"signature": "", "timestamp": "1", "nonce": "2"}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            slow = await client.post("/wechat/callback", params=params, content=build_text_xml("u1", "600000"))
+            assert wechat_mod.BUSY_REPLY in slow.text
+            assert time.perf_counter() - start < 1.0
+            # 执行器仍被慢操作占满：其它用户立即得到兜底回复，事件循环不被阻塞
+            busy = await client.post("/wechat/callback", params=params, content=build_text_xml("u2", "600001"))
+            assert wechat_mod.BUSY_REPLY in busy.text
+            # 不涉及阻塞操作的命令不受影响
+            help_resp = await client.post("/wechat/callback", params=params, content=build_text_xml("u3", "help"))
+            assert "使用说明" in help_resp.text
+    finally:
+        release.set()
+        wechat_mod.wechat_executor.shutdown()
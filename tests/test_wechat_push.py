@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import summary_jobs as mod_jobs
+from app.services import wechat_push as mod_push
+from app.services.summary_jobs import SummaryJobManager
+from app.services.wechat_push import WeChatPushService
+
+
+class FakeWeChat:
+    """本地模拟的微信 token 与客服消息接口"""
+
+    def __init__(self):
+        self.token_calls = 0
+        self.sent = []
+        self.failures = []  # 依次返回的失败结果："http502" 形式为 HTTP 状态码，整数为 errcode
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/token"):
+            self.token_calls += 1
+            return httpx.Response(200, json={"access_token": f"tok{self.token_calls}", "expires_in": 7200})
+        assert request.url.path.endswith("/message/custom/send")
+        token = request.url.params["access_token"]
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, str):
+                return httpx.Response(int(failure[4:]), text="error")
+            return httpx.Response(200, json={"errcode": failure, "errmsg": "err"})
+        body = json.loads(request.content.decode("utf-8"))
+        self.sent.append((token, body["touser"], body["text"]["content"]))
+        return httpx.Response(200, json={"errcode": 0, "errmsg": "ok"})
+
+
+@pytest.fixture
+def push(tmp_path, monkeypatch):
+    monkeypatch.setattr(mod_push.settings, "wechat_app_id", "appid")
+    monkeypatch.setattr(mod_push.settings, "wechat_app_secret", "secret")
+    monkeypatch.setattr(mod_push.settings, "wechat_push_retry_base_seconds", 0.0)
+    monkeypatch.setattr(mod_push.settings, "wechat_push_user_interval_seconds", 0.0)
+    fake = FakeWeChat()
+    service = WeChatPushService(str(tmp_path / "outbox.db"), transport=httpx.MockTransport(fake.handler))
+    yield service, fake
+    service._db.close_all()
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_with_cached_token_and_retries(push):
+    service, fake = push
+    assert service.enabled
+    assert service.enqueue("u1", "你好", dedupe_key="k1") is True
+    assert service.enqueue("u1", "你好", dedupe_key="k1") is False
+    service.enqueue("u2", "第二条")
+    assert await service.deliver_once() == 2
+    assert sorted(fake.sent) == [("tok1", "u1", "你好"), ("tok1", "u2", "第二条")]
+    assert fake.token_calls == 1
+
+    # 5xx 重试；token 失效后重新获取
+    fake.failures = ["http502", 40001]
+    service.enqueue("u3", "重试")
+    await service.deliver_once()
+    await service.deliver_once()
+    await service.deliver_once()
+    assert fake.sent[-1] == ("tok2", "u3", "重试")
+    assert fake.token_calls == 2
+    assert service.status_counts() == {"sent": 3}
+    assert service.stats()["retried"] == 2
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_per_user_rate_limit(push, monkeypatch):
+    service, fake = push
+    fake.failures = [45015]
+    service.enqueue("u1", "超过48小时")
+    await service.deliver_once()
+    assert service.status_counts() == {"failed": 1}
+
+    monkeypatch.setattr(mod_push.settings, "wechat_push_user_interval_seconds", 60.0)
+    service.enqueue("u2", "a")
+    service.enqueue("u2", "b")
+    service.enqueue("u3", "c")
+    assert await service.deliver_once() == 2
+    assert [s[2] for s in fake.sent] == ["a", "c"]
+    # 同一用户的第二条延后，不计入尝试次数
+    assert await service.deliver_once() == 0
+    assert service.status_counts() == {"failed": 1, "pending": 1, "sent": 2}
+    assert service.stats()["deferred"] == 1
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_refresh_job_pushes_result_to_requesting_users(push, monkeypatch):
+    service, fake = push
+
+    async def fake_summarize(code):
+        return {"content": f"汇总-{code}"}, f"fp-{code}"
+
+    monkeypatch.setattr(mod_jobs.announcement_service, "summarize_with_fingerprint", fake_summarize)
+    monkeypatch.setattr(mod_jobs.subscription_service, "save_summary", lambda code, data, fingerprint: None)
+    monkeypatch.setattr(mod_jobs, "wechat_push", service)
+
+    manager = SummaryJobManager()
+    job, _ = manager.submit("600000", notify_user="u1")
+    manager.submit("600000", notify_user="u2")
+    manager.submit("600000", notify_user="u1")
+    await asyncio.gather(*manager._tasks)
+    assert job.notify_users == ["u1", "u2"]
+
+    await service.deliver_once()
+    assert sorted((user, content) for _, user, content in fake.sent) == [
+        ("u1", "600000 公告总结已更新\n\n汇总-600000"),
+        ("u2", "600000 公告总结已更新\n\n汇总-600000"),
+    ]
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_send_error_is_retried_not_stuck(push, monkeypatch):
+    service, fake = push
+
+    async def broken_send(to_user, content):
+        raise ValueError("bad token payload")
+
+    service.enqueue("u1", "你好")
+    with monkeypatch.context() as m:
+        m.setattr(service, "send_text", broken_send)
+        await service.deliver_once()
+    assert service.status_counts() == {"pending": 1}
+    assert service.stats()["retried"] == 1
+
+    await service.deliver_once()
+    assert service.status_counts() == {"sent": 1}
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_sending_rows_are_reclaimed_and_old_rows_pruned(push, monkeypatch):
+    service, fake = push
+    monkeypatch.setattr(mod_push.settings, "wechat_push_max_attempts", 2)
+    service.enqueue("u1", "中途退出", dedupe_key="a")
+    service.enqueue("u2", "已发送", dedupe_key="b")
+    assert len(service._claim_due(10)) == 2
+    # 已在发送中的消息不会被再次领取
+    assert service._claim_due(10) == []
+    with service.transaction() as conn:
+        conn.execute("UPDATE wechat_outbox SET updated_datetime='2000-01-01T00:00:00+00:00' WHERE dedupe_key='a'")
+        conn.execute("UPDATE wechat_outbox SET status='sent', updated_datetime='2000-01-01T00:00:00+00:00' "
+                     "WHERE dedupe_key='b'")
+
+    # 首次维护即回收租约超时的消息并清理过期记录
+    await service.maintain()
+    assert service.status_counts() == {"pending": 1}
+    await service.deliver_once()
+    assert [s[2] for s in fake.sent] == ["中途退出"]
+
+    # 反复中途退出的消息达到最大尝试次数后标记失败
+    service.enqueue("u3", "总是卡住")
+    service._claim_due(10)
+    monkeypatch.setattr(mod_push.settings, "wechat_push_lease_seconds", -1)
+    assert service._reclaim_stale() == 1
+    service._claim_due(10)
+    assert service._reclaim_stale() == 1
+    assert service.status_counts() == {"failed": 1, "sent": 1}
+    await service.aclose()
@@ -20,15 +20,15 @@ client = TestClient(app)
 
 @pytest.mark.asyncio
 async def test_refresh_success(monkeypatch):
-    # Mock summarize_announcements
+    # Mock summarize_with_fingerprint
     async def fake_summarize(code: str):
-        return {"content": f"Summary for {code}"}
+        return {"content": f"Summary for {code}"}, ""
     from app.services import announcement_service as mod_ann
-    monkeypatch.setattr(mod_ann.announcement_service, "summarize_announcements", fake_summarize)
+    monkeypatch.setattr(mod_ann.announcement_service, "summarize_with_fingerprint", fake_summarize)
 
     # Mock save_summary to avoid filesystem writes complexity
     from app.services import subscription_service as mod_sub
-    def fake_save(code, data):
+    def fake_save(code, data, fingerprint=""):
         pass
     monkeypatch.setattr(mod_sub.subscription_service, "save_summary", fake_save)
 
@@ -40,17 +40,17 @@ async def test_refresh_success(monkeypatch):
 
     resp = client.post("/wechat/callback", params=params, data=xml_body.encode("utf-8"))
     assert resp.status_code == 200
-    # 新的返回格式：600000 已刷新，YYYY-MM-DD HH:MM
-    assert "600000 已刷新" in resp.text
+    # 刷新改为后台任务：立即回复已加入队列
+    assert "600000 已加入刷新队列" in resp.text
 
 @pytest.mark.asyncio
 async def test_refresh_rate_limit(monkeypatch):
     async def fake_summarize(code: str):
-        return {"content": f"Summary for {code}"}
+        return {"content": f"Summary for {code}"}, ""
     from app.services import announcement_service as mod_ann
-    monkeypatch.setattr(mod_ann.announcement_service, "summarize_announcements", fake_summarize)
+    monkeypatch.setattr(mod_ann.announcement_service, "summarize_with_fingerprint", fake_summarize)
     from app.services import subscription_service as mod_sub
-    monkeypatch.setattr(mod_sub.subscription_service, "save_summary", lambda c,d: None)
+    monkeypatch.setattr(mod_sub.subscription_service, "save_summary", lambda c, d, fp="": None)
     from app.routers import wechat as wechat_mod
     monkeypatch.setattr(wechat_mod, "_verify", lambda a,b,c: True)
 